@@ -6,6 +6,7 @@ from . import tasks
 from .models import (
     Contract,
     ContractCustomerNotification,
+    ContractDailyStatistic,
     ContractHandler,
     EveEntity,
     Location,
@@ -170,6 +171,22 @@ class ContractAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         return qs.prefetch_related("customer_notifications")
 
+    def delete_model(self, request, obj):
+        days = ContractDailyStatistic.objects.days_for_contracts(
+            Contract.objects.filter(pk=obj.pk)
+        )
+        super().delete_model(request, obj)
+        Contract.objects.clear_pending_count_cache()
+        if days:
+            ContractDailyStatistic.objects.update_days(days)
+
+    def delete_queryset(self, request, queryset):
+        days = ContractDailyStatistic.objects.days_for_contracts(queryset)
+        super().delete_queryset(request, queryset)
+        Contract.objects.clear_pending_count_cache()
+        if days:
+            ContractDailyStatistic.objects.update_days(days)
+
     @admin.display(boolean=True)
     def _pilots_notified(self, contract):
         if contract.pricing_id is None:
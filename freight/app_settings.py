@@ -9,6 +9,18 @@ FREIGHT_CONTRACT_SYNC_GRACE_MINUTES = clean_setting(
     "FREIGHT_CONTRACT_SYNC_GRACE_MINUTES", 30
 )
 
+# Max number of contracts processed and written to the database in one batch,
+# e.g. during sync or when updating pricing
+FREIGHT_CONTRACT_SYNC_BATCH_SIZE = clean_setting(
+    "FREIGHT_CONTRACT_SYNC_BATCH_SIZE", 500, min_value=1
+)
+
+# Delay in seconds before contracts are re-priced after a pricing has changed.
+# Changes to the same route within this delay are combined into one update.
+FREIGHT_PRICING_UPDATE_DELAY = clean_setting(
+    "FREIGHT_PRICING_UPDATE_DELAY", 5, min_value=0
+)
+
 # Webhook URL used for notifications if defined
 FREIGHT_DISCORD_WEBHOOK_URL = clean_setting(
     "FREIGHT_DISCORD_WEBHOOK_URL", None, required_type=str
@@ -85,5 +97,14 @@ FREIGHT_DISCORDPROXY_PORT = clean_setting("FREIGHT_DISCORDPROXY_PORT", 50051)
 # Send discord notifications about every contract, even if no pricing defined
 FREIGHT_NOTIFY_ALL_CONTRACTS = clean_setting("FREIGHT_NOTIFY_ALL_CONTRACTS", False)
 
+# Combine pilot notifications for many contracts into digests
+# with up to 10 contracts per message
+FREIGHT_DISCORD_PILOT_DIGEST = clean_setting("FREIGHT_DISCORD_PILOT_DIGEST", False)
+
+# Max number of Discord channels that notifications are sent to in parallel
+FREIGHT_NOTIFICATIONS_MAX_WORKERS = clean_setting(
+    "FREIGHT_NOTIFICATIONS_MAX_WORKERS", 5, min_value=1
+)
+
 # Collateral zero
-FREIGHT_COLLATERAL_ZERO = clean_setting("FREIGHT_COLLATERAL_ZERO", False)
\ No newline at end of file
+FREIGHT_COLLATERAL_ZERO = clean_setting("FREIGHT_COLLATERAL_ZERO", False)
@@ -7,3 +7,6 @@ class FreightConfig(AppConfig):
     name = "freight"
     label = "freight"
     verbose_name = f"Freight v{__version__}"
+
+    def ready(self) -> None:
+        from . import signals  # noqa: F401
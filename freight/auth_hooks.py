@@ -22,7 +22,7 @@ class ExampleMenuItem(MenuItemHook):
     def render(self, request):
         if request.user.has_perm("freight.basic_access"):
             if request.user.has_perm("freight.view_contracts"):
-                app_count = Contract.objects.all().pending_count()
+                app_count = Contract.objects.pending_count_cached()
                 self.count = app_count if app_count and app_count > 0 else None
 
             return MenuItemHook.render(self, request)
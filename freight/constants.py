@@ -3,3 +3,15 @@ CONTRACT_LIST_ACTIVE = "active"
 CONTRACT_LIST_ALL = "all"
 
 AVATAR_SIZE = 128
+
+# max number of cargos that can be quoted with one request
+CALCULATOR_MAX_QUOTES = 1000
+
+# max number of IDs ESI accepts in one bulk request, e.g. to post_universe_names
+ESI_MAX_IDS_PER_REQUEST = 1000
+
+# max number of contracts returned for one page of the contract list
+CONTRACT_LIST_MAX_PAGE_LENGTH = 1000
+
+# number of contracts fetched from the database at once when streaming the contract list
+CONTRACT_LIST_STREAM_CHUNK_SIZE = 500
@@ -1,15 +1,22 @@
+import hashlib
 import json
-from datetime import datetime
-from time import sleep
-from typing import Tuple
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from time import monotonic
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from uuid import uuid4
 
 from bravado.exception import HTTPForbidden, HTTPUnauthorized
 
 from django.contrib.auth.models import User
-from django.db import models, transaction
-from django.utils.timezone import now
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, models, transaction
+from django.db.models.functions import TruncDate
+from django.utils.timezone import localdate, make_aware, now
 from esi.models import Token
 
+from allianceauth.authentication.models import CharacterOwnership
 from allianceauth.eveonline.models import EveCharacter, EveCorporationInfo
 from allianceauth.eveonline.providers import ObjectNotFound
 from allianceauth.services.hooks import get_extension_logger
@@ -17,17 +24,46 @@ from app_utils.logging import LoggerAddTag
 
 from . import __title__, constants
 from .app_settings import (
-    FREIGHT_DISCORD_SIEGE_GREEN_WEBHOOK_URL,
+    FREIGHT_CONTRACT_SYNC_BATCH_SIZE,
     FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL,
+    FREIGHT_DISCORD_PILOT_DIGEST,
+    FREIGHT_DISCORD_SIEGE_GREEN_WEBHOOK_URL,
     FREIGHT_DISCORD_WEBHOOK_URL,
     FREIGHT_DISCORDPROXY_ENABLED,
     FREIGHT_NOTIFY_ALL_CONTRACTS,
 )
+from .notifications import NotificationDispatcher
 from .providers import esi
 
 logger = LoggerAddTag(get_extension_logger(__name__), __title__)
 
 
+def _user_character_pks(user: User) -> List[int]:
+    """returns PKs of all characters owned by given user
+
+    The result is cached on the user object, i.e. for the current request.
+    """
+    try:
+        return user._freight_character_pks
+    except AttributeError:
+        character_pks = list(
+            CharacterOwnership.objects.filter(user=user).values_list(
+                "character_id", flat=True
+            )
+        )
+        user._freight_character_pks = character_pks
+        return character_pks
+
+
+def _pilot_digest_content() -> Optional[Callable[[int], str]]:
+    """returns function for creating contents of pilot digests
+    or None if digests are disabled
+    """
+    from .models import Contract
+
+    return Contract.pilot_digest_content if FREIGHT_DISCORD_PILOT_DIGEST else None
+
+
 class PricingManager(models.Manager):
     def get_queryset(self) -> models.QuerySet:
         return super().get_queryset().select_related("start_location", "end_location")
@@ -143,28 +179,137 @@ class EveEntityManager(models.Manager):
             },
         )
 
+    def bulk_get_or_create_esi(self, *, ids: Iterable[int]) -> Dict[int, models.Model]:
+        """gets or creates entity objects in bulk with data fetched from ESI
+
+        Unknown IDs are resolved with one ESI request per chunk of IDs.
+        IDs which can not be resolved are not included in the result.
+
+        Returns entity objects by ID.
+        """
+        ids = {int(id) for id in ids}
+        entities = self.in_bulk(ids)
+        missing_ids = sorted(ids - entities.keys())
+        new_entities = list()
+        for start in range(0, len(missing_ids), constants.ESI_MAX_IDS_PER_REQUEST):
+            chunk = missing_ids[start : start + constants.ESI_MAX_IDS_PER_REQUEST]
+            try:
+                response = esi.client.Universe.post_universe_names(ids=chunk).results()
+            except Exception:
+                # ESI rejects the whole request if one of the IDs is invalid,
+                # so we try to resolve the IDs of this chunk one by one instead
+                logger.warning(
+                    "Failed to resolve %d IDs in bulk. Trying one by one.",
+                    len(chunk),
+                    exc_info=True,
+                )
+                for id in chunk:
+                    try:
+                        entities[id], _ = self.update_or_create_esi(id=id)
+                    except Exception:
+                        logger.exception("Failed to resolve ID %s", id)
+            else:
+                new_entities += [
+                    self.model(
+                        id=entity_data["id"],
+                        name=entity_data["name"],
+                        category=entity_data["category"],
+                    )
+                    for entity_data in response
+                ]
+
+        self.bulk_create(new_entities, ignore_conflicts=True)
+        entities.update({obj.id: obj for obj in new_entities})
+        return entities
+
+
+class ContractHandlerManager(models.Manager):
+    # max age of the cached handler in seconds,
+    # so changes made by other processes are picked up eventually
+    CACHE_MAX_AGE = 60
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._cached_handler = None
+
+    def get_cached(self) -> Optional[models.Model]:
+        """returns the contract handler incl. organization or None if there is none
+
+        The handler is cached in this process.
+        The cache is cleared whenever a contract handler is saved or deleted.
+        """
+        if (
+            self._cached_handler is None
+            or monotonic() - self._cached_handler[1] > self.CACHE_MAX_AGE
+        ):
+            handler = self.select_related("organization").first()
+            self._cached_handler = (handler, monotonic())
+        return self._cached_handler[0]
+
+    def clear_cache(self) -> None:
+        """clears the cached contract handler"""
+        self._cached_handler = None
+
+
+class _ContractEntities(NamedTuple):
+    """Eve objects referenced by contracts, mapped by their Eve IDs"""
+
+    entities: Dict[int, models.Model]
+    characters: Dict[int, EveCharacter]
+    corporations: Dict[int, EveCorporationInfo]
+    locations: Dict[int, models.Model]
+
+
+class CustomerNotificationState(NamedTuple):
+    """State needed for deciding about customer notifications of contracts"""
+
+    # statuses already reported to customers by contract PK
+    notified_statuses: Dict[int, set]
+    # users owning the issuers by character PK
+    issuer_users: Dict[int, User]
+    # Discord UIDs by user PK
+    discord_uids: Dict[int, int]
+
 
 class ContractQuerySet(models.QuerySet):
     def pending_count(self) -> int:
         """returns the number of pending contacts for this QS"""
-        return (
-            self.filter(status=self.model.Status.OUTSTANDING)
-            .exclude(date_expired__lt=now())
-            .count()
-        )
+        return self.filter(
+            status=self.model.Status.OUTSTANDING, date_expired__gte=now()
+        ).count()
 
     def filter_not_completed(self):
         return self.exclude(status__in=self.model.Status.completed)
 
+    def filter_route(self, location_id_1: int, location_id_2: int):
+        """returns QS of contracts on given route in either direction"""
+        return self.filter(
+            models.Q(start_location_id=location_id_1, end_location_id=location_id_2)
+            | models.Q(start_location_id=location_id_2, end_location_id=location_id_1)
+        )
+
     def issued_by_user(self, user: User) -> models.QuerySet:
         """returns QS of contracts issued by a character owned by given user"""
-        return self.filter(
-            issuer__in=EveCharacter.objects.filter(character_ownership__user=user)
+        return self.filter(issuer_id__in=_user_character_pks(user))
+
+    def update_pricing(self, batch_size: int = FREIGHT_CONTRACT_SYNC_BATCH_SIZE) -> int:
+        """Updates contracts with matching pricing
+
+        Only contracts which pricing or issues have changed are written.
+
+        Notifications for contracts that received a pricing
+        are added to the outbox.
+
+        Returns the number of updated contracts.
+        """
+        from .models import (
+            ContractDailyStatistic,
+            ContractHandler,
+            OutboxNotification,
+            Pricing,
         )
 
-    def update_pricing(self) -> int:
-        """Updates contracts with matching pricing"""
-        from .models import Pricing
+        ContractHandler.objects.clear_cache()
 
         def _make_key(location_id_1: int, location_id_2: int) -> str:
             return "{}x{}".format(int(location_id_1), int(location_id_2))
@@ -175,61 +320,162 @@ class ContractQuerySet(models.QuerySet):
             if obj.is_bidirectional:
                 pricings[_make_key(obj.end_location_id, obj.start_location_id)] = obj
 
-        update_count = 0
-        for contract in self.all():
-            with transaction.atomic():
-                route_key = _make_key(
-                    contract.start_location_id, contract.end_location_id
-                )
-                if route_key in pricings:
-                    pricing = pricings[route_key]
-                    issues_list = contract.get_price_check_issues(pricing)
-                    if issues_list:
-                        issues = json.dumps(issues_list)
-                    else:
-                        issues = None
-                else:
-                    pricing = None
-                    issues = None
-                contract.pricing = pricing
-                contract.issues = issues
-                contract.save()
-                update_count += 1
-        return update_count
+        contracts = self.only(
+            "start_location_id",
+            "end_location_id",
+            "volume",
+            "collateral",
+            "reward",
+            "pricing_id",
+            "issues",
+            "issue_values",
+            "status",
+            "date_completed",
+        )
+        changed_contracts = list()
+        newly_priced_pks = list()
+        contracts_by_pricing = defaultdict(list)
+        for contract in contracts.iterator(chunk_size=batch_size):
+            route_key = _make_key(contract.start_location_id, contract.end_location_id)
+            pricing = pricings.get(route_key)
+            if pricing:
+                contracts_by_pricing[pricing].append(contract)
+            elif contract.pricing_id is not None or contract.issues:
+                contract.pricing = None
+                contract.issues = 0
+                contract.issue_values = {}
+                changed_contracts.append(contract)
+
+        for pricing, pricing_contracts in contracts_by_pricing.items():
+            prices, issues_list = pricing.get_contract_price_checks(
+                volumes=[obj.volume for obj in pricing_contracts],
+                collaterals=[obj.collateral for obj in pricing_contracts],
+                rewards=[obj.reward for obj in pricing_contracts],
+            )
+            for contract, price, issues in zip(pricing_contracts, prices, issues_list):
+                issue_values = pricing.issue_values(issues, price)
+                if (
+                    contract.pricing_id != pricing.id
+                    or contract.issues != issues
+                    or contract.issue_values != issue_values
+                ):
+                    if contract.pricing_id is None:
+                        newly_priced_pks.append(contract.pk)
+                    contract.pricing = pricing
+                    contract.issues = issues
+                    contract.issue_values = issue_values
+                    changed_contracts.append(contract)
+
+        self.model.objects.bulk_update(
+            changed_contracts,
+            fields=["pricing", "issues", "issue_values"],
+            batch_size=batch_size,
+        )
+        finished_days = {
+            localdate(contract.date_completed)
+            for contract in changed_contracts
+            if contract.status == self.model.Status.FINISHED and contract.date_completed
+        }
+        if finished_days:
+            ContractDailyStatistic.objects.update_days(finished_days)
+        if newly_priced_pks:
+            OutboxNotification.objects.enqueue_for_contracts(
+                self.model.objects.filter(pk__in=newly_priced_pks)
+            )
+        return len(changed_contracts)
 
     def sent_pilot_notifications(self, rate_limited: bool) -> None:
-        """Send all pilot notifications for these contracts."""
+        """Send all pilot notifications for these contracts.
+
+        Notifications are sent in parallel to different webhooks and
+        respect the rate limits reported by Discord when rate_limited is set.
+        """
         logger.info("Trying to send pilot notifications for %d contracts", self.count())
+        dispatcher = NotificationDispatcher(
+            rate_limited=rate_limited, digest_content=_pilot_digest_content()
+        )
         for contract in self:
             if not contract.has_expired:
                 try:
-                    contract.send_pilot_notification()
+                    message = contract.pilot_notification()
                 except Exception as ex:
                     logger.error(
                         "Failed to send pilot notification for contract %d: %s",
                         contract.contract_id,
                         ex,
                     )
-                if rate_limited:
-                    sleep(1)
+                else:
+                    if message:
+                        dispatcher.add(contract.pk, message, digest=True)
             else:
                 logger.debug("contract %s has expired", contract.contract_id)
 
+        sent_pks = dispatcher.run()
+        if sent_pks:
+            self.model.objects.filter(pk__in=sent_pks).update(date_notified=now())
+
     def sent_customer_notifications(self, rate_limited: bool, force_sent: bool) -> None:
-        """Send customer notifications for these contracts."""
+        """Send customer notifications for these contracts.
+
+        Notifications are sent in parallel to different Discord channels and
+        respect the rate limits reported by Discord when rate_limited is set.
+        """
+        from .models import ContractCustomerNotification
+
         logger.debug(
             "Checking %d contracts if customer notifications need to be sent",
             self.count(),
         )
+        dispatcher = NotificationDispatcher(rate_limited=rate_limited)
+        state = self.customer_notification_state()
         for contract in self:
             if contract.has_expired:
                 logger.debug("contract %d has expired", contract.contract_id)
             elif contract.has_stale_status:
                 logger.debug("contract %d has stale status", contract.contract_id)
             else:
-                contract.send_customer_notification(force_sent)
-                if rate_limited:
-                    sleep(1)
+                notification = contract.customer_notification(force_sent, state)
+                if notification:
+                    status, message = notification
+                    dispatcher.add((contract.pk, status), message)
+
+        for contract_pk, status in dispatcher.run():
+            ContractCustomerNotification.objects.update_or_create(
+                contract_id=contract_pk,
+                status=status,
+                defaults={"date_notified": now()},
+            )
+
+    def customer_notification_state(self) -> CustomerNotificationState:
+        """loads the state for customer notifications of these contracts in bulk"""
+        from .models import ContractCustomerNotification, DiscordUser
+
+        notified_statuses = defaultdict(set)
+        for contract_pk, status in ContractCustomerNotification.objects.filter(
+            contract__in=self
+        ).values_list("contract_id", "status"):
+            notified_statuses[contract_pk].add(status)
+
+        issuer_users = {
+            ownership.character_id: ownership.user
+            for ownership in CharacterOwnership.objects.filter(
+                character_id__in=self.values("issuer_id")
+            ).select_related("user")
+        }
+        if DiscordUser and issuer_users:
+            discord_uids = dict(
+                DiscordUser.objects.filter(
+                    user_id__in={user.pk for user in issuer_users.values()}
+                ).values_list("user_id", "uid")
+            )
+        else:
+            discord_uids = dict()
+
+        return CustomerNotificationState(
+            notified_statuses=dict(notified_statuses),
+            issuer_users=issuer_users,
+            discord_uids=discord_uids,
+        )
 
     def contract_list_filter(self, category: str, user: User) -> models.QuerySet:
         """Filter contracts by category and user permission for contract list view."""
@@ -261,17 +507,335 @@ class ContractQuerySet(models.QuerySet):
 
 
 class ContractManagerBase(models.Manager):
+    # fields of a contract that are set from ESI data
+    ESI_FIELDS = [
+        "acceptor",
+        "acceptor_corporation",
+        "collateral",
+        "date_accepted",
+        "date_completed",
+        "date_expired",
+        "date_issued",
+        "days_to_complete",
+        "end_location",
+        "for_corporation",
+        "issuer_corporation",
+        "issuer",
+        "reward",
+        "start_location",
+        "status",
+        "title",
+        "volume",
+        "pricing",
+        "issues",
+        "issue_values",
+        "version_hash",
+    ]
+    # properties of contracts from ESI with IDs of related objects
+    ID_PROPERTIES = [
+        "acceptor_id",
+        "issuer_id",
+        "issuer_corporation_id",
+        "start_location_id",
+        "end_location_id",
+    ]
+    # max age of cached pending counts in seconds
+    PENDING_COUNT_CACHE_TIMEOUT = 300
+    PENDING_COUNT_CACHE_VERSION_KEY = "freight_contracts_pending_count_version"
+
+    def pending_count_cached(self, user: User = None) -> int:
+        """returns the number of pending contracts from cache
+
+        Counts only contracts issued by given user if a user is given.
+        """
+        version = cache.get_or_set(
+            self.PENDING_COUNT_CACHE_VERSION_KEY, uuid4().hex, timeout=None
+        )
+        key = "freight_contracts_pending_count_{}_{}".format(
+            version, user.pk if user else "all"
+        )
+        count = cache.get(key)
+        if count is None:
+            contracts_qs = self.issued_by_user(user) if user else self.all()
+            count = contracts_qs.pending_count()
+            cache.set(key, count, timeout=self.PENDING_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def clear_pending_count_cache(self) -> None:
+        """invalidates all cached pending counts"""
+        cache.set(self.PENDING_COUNT_CACHE_VERSION_KEY, uuid4().hex, timeout=None)
+
     def update_or_create_from_dict(
         self, handler: object, contract: dict, token: Token
     ) -> Tuple[models.Model, bool]:
         """updates or creates a contract from given dict"""
+        result = self.update_or_create(
+            handler=handler,
+            contract_id=contract["contract_id"],
+            defaults=self._defaults_from_dict(
+                contract, self._resolve_entities([contract], token)
+            ),
+        )
+        self.clear_pending_count_cache()
+        return result
+
+    def bulk_update_or_create_from_dicts(
+        self,
+        handler: object,
+        contracts: List[dict],
+        token: Token,
+        batch_size: int = FREIGHT_CONTRACT_SYNC_BATCH_SIZE,
+    ) -> bool:
+        """updates or creates contracts from given dicts in bulk
+
+        Everything needed from ESI is fetched first. Contracts are then written
+        in short transactions with at most batch_size contracts each,
+        so no transaction stays open during requests to ESI.
+
+        Contracts which can not be loaded or stored are logged and skipped.
+        When writing a batch fails its contracts are retried one by one,
+        so one bad contract does not prevent storing the others.
+
+        Notifications for contracts with a new status are added to the outbox.
+
+        Returns True if all contracts were stored without errors, else False.
+        """
+        existing = {
+            contract_id: (pk, status)
+            for contract_id, pk, status in self.filter(handler=handler).values_list(
+                "contract_id", "pk", "status"
+            )
+        }
+        no_errors = True
+        valid_contracts = list()
+        for contract in contracts:
+            try:
+                self._ensure_valid_ids(contract)
+            except (KeyError, TypeError, ValueError):
+                logger.exception(
+                    "%s: Ignoring contract %s with invalid IDs",
+                    handler,
+                    contract.get("contract_id", "Unknown"),
+                )
+                no_errors = False
+            else:
+                valid_contracts.append(contract)
+
+        resolved = self._resolve_entities(valid_contracts, token)
+        objs = dict()
+        status_changed_ids = set()
+        for contract in valid_contracts:
+            try:
+                obj = self.model(
+                    handler=handler,
+                    contract_id=contract["contract_id"],
+                    **self._defaults_from_dict(contract, resolved),
+                )
+            except Exception:
+                logger.exception(
+                    "%s: An unexpected error ocurred while trying to load contract %s",
+                    handler,
+                    contract["contract_id"] if "contract_id" in contract else "Unknown",
+                    exc_info=True,
+                )
+                no_errors = False
+            else:
+                obj.pk, old_status = existing.get(obj.contract_id, (None, None))
+                if obj.status != old_status:
+                    status_changed_ids.add(obj.contract_id)
+                objs[obj.contract_id] = obj
+
+        objs = list(objs.values())
+        created_count = 0
+        updated_count = 0
+        for start in range(0, len(objs), batch_size):
+            batch = objs[start : start + batch_size]
+            try:
+                created, updated = self._write_contracts(
+                    handler, batch, status_changed_ids
+                )
+            except DatabaseError:
+                logger.warning(
+                    "%s: Failed to write batch of %d contracts. "
+                    "Retrying contracts one by one",
+                    handler,
+                    len(batch),
+                    exc_info=True,
+                )
+                created, updated = 0, 0
+                for obj in batch:
+                    try:
+                        obj_created, obj_updated = self._write_contracts(
+                            handler, [obj], status_changed_ids
+                        )
+                    except DatabaseError:
+                        logger.exception(
+                            "%s: Failed to store contract %s",
+                            handler,
+                            obj.contract_id,
+                        )
+                        no_errors = False
+                    else:
+                        created += obj_created
+                        updated += obj_updated
+
+            created_count += created
+            updated_count += updated
+
+        if objs:
+            self.clear_pending_count_cache()
+        logger.info(
+            "%s: Created %d and updated %d contracts",
+            handler,
+            created_count,
+            updated_count,
+        )
+        return no_errors
+
+    def _write_contracts(
+        self, handler: object, objs: List[models.Model], status_changed_ids: Set[int]
+    ) -> Tuple[int, int]:
+        """writes given contracts in one transaction
+        and adds notifications for those with a new status to the outbox
+
+        Raises DatabaseError when the transaction was rolled back.
+
+        Returns number of created and updated contracts.
+        """
+        from .models import OutboxNotification
+
+        new_objs = [obj for obj in objs if obj.pk is None]
+        changed_objs = [obj for obj in objs if obj.pk is not None]
+        notify_ids = [
+            obj.contract_id for obj in objs if obj.contract_id in status_changed_ids
+        ]
+        try:
+            with transaction.atomic():
+                if changed_objs:
+                    # lock only the rows of the contracts in this batch
+                    list(
+                        self.select_for_update()
+                        .filter(pk__in=[obj.pk for obj in changed_objs])
+                        .values_list("pk", flat=True)
+                    )
+                self.bulk_create(new_objs)
+                self.bulk_update(changed_objs, fields=self.ESI_FIELDS)
+                if notify_ids:
+                    OutboxNotification.objects.enqueue_for_contracts(
+                        self.filter(handler=handler, contract_id__in=notify_ids)
+                    )
+        except DatabaseError:
+            # the inserts were rolled back, so the new contracts need to be
+            # created again when retried
+            for obj in new_objs:
+                obj.pk = None
+                obj._state.adding = True
+            raise
+
+        return len(new_objs), len(changed_objs)
+
+    @staticmethod
+    def calc_version_hash(contract: dict) -> str:
+        """returns hash to identify changes to given contract dict from ESI"""
+        return hashlib.md5(
+            json.dumps(contract, cls=DjangoJSONEncoder, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    def _resolve_entities(
+        self, contracts: List[dict], token: Token
+    ) -> _ContractEntities:
+        """resolves all characters, corporations and locations
+        referenced by given contracts
+
+        Objects are fetched in bulk and unknown objects created once per ID,
+        so contracts can be loaded with lookups only.
+        """
+        from .models import EveEntity, Location
+
+        acceptor_ids = {
+            int(contract["acceptor_id"])
+            for contract in contracts
+            if contract.get("acceptor_id")
+        }
+        entities = EveEntity.objects.bulk_get_or_create_esi(ids=acceptor_ids)
+        acceptor_character_ids = {
+            obj.id for obj in entities.values() if obj.is_character
+        }
+        character_ids = acceptor_character_ids | {
+            int(contract["issuer_id"])
+            for contract in contracts
+            if contract.get("issuer_id")
+        }
+        characters = self._get_or_create_eve_objects(
+            EveCharacter,
+            "character_id",
+            character_ids,
+            lambda id: EveCharacter.objects.create_character(character_id=id),
+        )
+        corporation_ids = {
+            int(contract["issuer_corporation_id"])
+            for contract in contracts
+            if contract.get("issuer_corporation_id")
+        }
+        corporation_ids |= {obj.id for obj in entities.values() if obj.is_corporation}
+        corporation_ids |= {
+            int(characters[id].corporation_id)
+            for id in acceptor_character_ids
+            if id in characters
+        }
+        corporations = self._get_or_create_eve_objects(
+            EveCorporationInfo,
+            "corporation_id",
+            corporation_ids,
+            lambda id: EveCorporationInfo.objects.create_corporation(corp_id=id),
+        )
+        location_ids = {
+            int(contract[key])
+            for contract in contracts
+            for key in ("start_location_id", "end_location_id")
+            if contract.get(key)
+        }
+        locations = self._get_or_create_eve_objects(
+            Location,
+            "id",
+            location_ids,
+            lambda id: Location.objects.get_or_create_esi(token, id)[0],
+        )
+        return _ContractEntities(
+            entities=entities,
+            characters=characters,
+            corporations=corporations,
+            locations=locations,
+        )
+
+    @staticmethod
+    def _get_or_create_eve_objects(
+        model: type, id_field: str, ids: set, create_func: Callable
+    ) -> dict:
+        """returns objects of given Eve model by ID and tries to create missing"""
+        objs = {
+            getattr(obj, id_field): obj
+            for obj in model.objects.filter(**{f"{id_field}__in": ids})
+        }
+        for id in sorted(ids - objs.keys()):
+            try:
+                objs[id] = create_func(id)
+            except Exception:
+                logger.exception("Failed to create %s for ID %s", model.__name__, id)
+        return objs
+
+    def _defaults_from_dict(self, contract: dict, resolved: _ContractEntities) -> dict:
+        """returns field values for a contract from given dict"""
+        version_hash = self.calc_version_hash(contract)
         # validate types
         self._ensure_datetime_type_or_none(contract, "date_accepted")
         self._ensure_datetime_type_or_none(contract, "date_completed")
         self._ensure_datetime_type_or_none(contract, "date_expired")
         self._ensure_datetime_type_or_none(contract, "date_issued")
-        acceptor, acceptor_corporation = self._identify_contracts_acceptor(contract)
-        issuer_corporation, issuer = self._identify_contracts_issuer(contract)
+        acceptor, acceptor_corporation = self._identify_contracts_acceptor(
+            contract, resolved
+        )
+        issuer_corporation, issuer = self._identify_contracts_issuer(contract, resolved)
         date_accepted = (
             contract["date_accepted"] if "date_accepted" in contract else None
         )
@@ -279,32 +843,37 @@ class ContractManagerBase(models.Manager):
             contract["date_completed"] if "date_completed" in contract else None
         )
         title = contract["title"] if "title" in contract else None
-        start_location, end_location = self._identify_locations(contract, token)
-        return self.update_or_create(
-            handler=handler,
-            contract_id=contract["contract_id"],
-            defaults={
-                "acceptor": acceptor,
-                "acceptor_corporation": acceptor_corporation,
-                "collateral": contract["collateral"],
-                "date_accepted": date_accepted,
-                "date_completed": date_completed,
-                "date_expired": contract["date_expired"],
-                "date_issued": contract["date_issued"],
-                "days_to_complete": contract["days_to_complete"],
-                "end_location": end_location,
-                "for_corporation": contract["for_corporation"],
-                "issuer_corporation": issuer_corporation,
-                "issuer": issuer,
-                "reward": contract["reward"],
-                "start_location": start_location,
-                "status": contract["status"],
-                "title": title,
-                "volume": contract["volume"],
-                "pricing": None,
-                "issues": None,
-            },
-        )
+        start_location, end_location = self._identify_locations(contract, resolved)
+        return {
+            "acceptor": acceptor,
+            "acceptor_corporation": acceptor_corporation,
+            "collateral": contract["collateral"],
+            "date_accepted": date_accepted,
+            "date_completed": date_completed,
+            "date_expired": contract["date_expired"],
+            "date_issued": contract["date_issued"],
+            "days_to_complete": contract["days_to_complete"],
+            "end_location": end_location,
+            "for_corporation": contract["for_corporation"],
+            "issuer_corporation": issuer_corporation,
+            "issuer": issuer,
+            "reward": contract["reward"],
+            "start_location": start_location,
+            "status": contract["status"],
+            "title": title,
+            "volume": contract["volume"],
+            "pricing": None,
+            "issues": 0,
+            "issue_values": {},
+            "version_hash": version_hash,
+        }
+
+    @classmethod
+    def _ensure_valid_ids(cls, contract: dict):
+        """raises an exception if an ID of given contract is not an integer"""
+        for property_name in cls.ID_PROPERTIES:
+            if contract.get(property_name):
+                int(contract[property_name])
 
     @staticmethod
     def _ensure_datetime_type_or_none(contract: dict, property_name: str):
@@ -313,54 +882,30 @@ class ContractManagerBase(models.Manager):
         ):
             raise TypeError("%s must be of type datetime" % property_name)
 
-    def _identify_locations(self, contract: dict, token: Token) -> tuple:
-        from .models import Location
-
-        start_location, _ = Location.objects.get_or_create_esi(
-            token, contract["start_location_id"]
-        )
-        end_location, _ = Location.objects.get_or_create_esi(
-            token, contract["end_location_id"]
-        )
+    @staticmethod
+    def _identify_locations(contract: dict, resolved: _ContractEntities) -> tuple:
+        try:
+            start_location = resolved.locations[int(contract["start_location_id"])]
+            end_location = resolved.locations[int(contract["end_location_id"])]
+        except KeyError as ex:
+            raise ValueError("Unknown location: {}".format(ex.args[0])) from None
         return start_location, end_location
 
-    def _identify_contracts_acceptor(self, contract: dict) -> tuple:
-        from .models import EveEntity
-
+    @staticmethod
+    def _identify_contracts_acceptor(
+        contract: dict, resolved: _ContractEntities
+    ) -> tuple:
         if int(contract["acceptor_id"]) != 0:
             try:
-                entity, _ = EveEntity.objects.get_or_create_esi(
-                    id=contract["acceptor_id"]
-                )
+                entity = resolved.entities[int(contract["acceptor_id"])]
                 if entity.is_character:
-                    try:
-                        acceptor = EveCharacter.objects.get(character_id=entity.id)
-                    except EveCharacter.DoesNotExist:
-                        acceptor = EveCharacter.objects.create_character(
-                            character_id=entity.id
-                        )
-                    try:
-                        acceptor_corporation = EveCorporationInfo.objects.get(
-                            corporation_id=acceptor.corporation_id
-                        )
-                    except EveCorporationInfo.DoesNotExist:
-                        acceptor_corporation = (
-                            EveCorporationInfo.objects.create_corporation(
-                                corp_id=acceptor.corporation_id
-                            )
-                        )
+                    acceptor = resolved.characters[entity.id]
+                    acceptor_corporation = resolved.corporations[
+                        int(acceptor.corporation_id)
+                    ]
                 elif entity.is_corporation:
                     acceptor = None
-                    try:
-                        acceptor_corporation = EveCorporationInfo.objects.get(
-                            corporation_id=entity.id
-                        )
-                    except EveCorporationInfo.DoesNotExist:
-                        acceptor_corporation = (
-                            EveCorporationInfo.objects.create_corporation(
-                                corp_id=entity.id
-                            )
-                        )
+                    acceptor_corporation = resolved.corporations[entity.id]
                 else:
                     raise ValueError(
                         "Acceptor has invalid category: {}".format(entity.category)
@@ -379,21 +924,26 @@ class ContractManagerBase(models.Manager):
             acceptor_corporation = None
         return acceptor, acceptor_corporation
 
-    def _identify_contracts_issuer(self, contract) -> tuple:
+    @staticmethod
+    def _identify_contracts_issuer(
+        contract: dict, resolved: _ContractEntities
+    ) -> tuple:
         try:
-            issuer = EveCharacter.objects.get(character_id=contract["issuer_id"])
-        except EveCharacter.DoesNotExist:
-            issuer = EveCharacter.objects.create_character(
-                character_id=contract["issuer_id"]
-            )
+            issuer = resolved.characters[int(contract["issuer_id"])]
+        except KeyError:
+            raise ValueError(
+                "Unknown issuer: {}".format(contract["issuer_id"])
+            ) from None
         try:
-            issuer_corporation = EveCorporationInfo.objects.get(
-                corporation_id=contract["issuer_corporation_id"]
-            )
-        except EveCorporationInfo.DoesNotExist:
-            issuer_corporation = EveCorporationInfo.objects.create_corporation(
-                corp_id=contract["issuer_corporation_id"]
-            )
+            issuer_corporation = resolved.corporations[
+                int(contract["issuer_corporation_id"])
+            ]
+        except KeyError:
+            raise ValueError(
+                "Unknown issuer corporation: {}".format(
+                    contract["issuer_corporation_id"]
+                )
+            ) from None
         return issuer_corporation, issuer
 
     def send_notifications(
@@ -430,7 +980,9 @@ class ContractManagerBase(models.Manager):
             else:
                 logger.debug("No new pilot notifications.")
         else:
-            logger.debug("FREIGHT_DISCORD_WEBHOOK_URL or FREIGHT_DISCORD_SIEGE_GREEN_WEBHOOK_URL not configured")
+            logger.debug(
+                "FREIGHT_DISCORD_WEBHOOK_URL or FREIGHT_DISCORD_SIEGE_GREEN_WEBHOOK_URL not configured"
+            )
 
     def _sent_customer_notifications(
         self, force_sent: bool, rate_limited: bool
@@ -456,3 +1008,255 @@ class ContractManagerBase(models.Manager):
 
 
 ContractManager = ContractManagerBase.from_queryset(ContractQuerySet)
+
+
+class ContractDailyStatisticManager(models.Manager):
+    # max age of cached statistics in seconds
+    CACHE_TIMEOUT = 3600
+    CACHE_VERSION_KEY = "freight_contract_statistics_version"
+
+    def cache_key(self, *args) -> str:
+        """returns key for caching statistics identified by given args
+
+        All keys become invalid when the statistics are updated.
+        """
+        version = cache.get_or_set(self.CACHE_VERSION_KEY, uuid4().hex, timeout=None)
+        return "freight_contract_statistics_{}_{}".format(
+            version, "_".join(str(arg) for arg in args)
+        )
+
+    def clear_cache(self) -> None:
+        """invalidates all cached statistics"""
+        cache.set(self.CACHE_VERSION_KEY, uuid4().hex, timeout=None)
+
+    def days_for_contracts(self, contracts_qs: models.QuerySet) -> Set[date]:
+        """returns all days on which given contracts were finished"""
+        from .models import Contract
+
+        return set(
+            contracts_qs.filter(
+                status=Contract.Status.FINISHED, date_completed__isnull=False
+            )
+            .annotate(day=TruncDate("date_completed"))
+            .order_by()
+            .values_list("day", flat=True)
+            .distinct()
+        )
+
+    def update_for_contracts(self, contracts_qs: models.QuerySet) -> None:
+        """updates statistics for all days on which given contracts were finished"""
+        days = self.days_for_contracts(contracts_qs)
+        if days:
+            self.update_days(days)
+
+    def update_days(
+        self,
+        days: Iterable[date],
+        batch_size: int = FREIGHT_CONTRACT_SYNC_BATCH_SIZE,
+    ) -> None:
+        """re-calculates statistics for given days from finished contracts"""
+        from .models import Contract
+
+        days = set(days)
+        totals = (
+            Contract.objects.filter(
+                status=Contract.Status.FINISHED,
+                date_completed__gte=make_aware(datetime.combine(min(days), time.min)),
+                date_completed__lt=make_aware(
+                    datetime.combine(max(days) + timedelta(days=1), time.min)
+                ),
+            )
+            .annotate(day=TruncDate("date_completed"))
+            .filter(day__in=days)
+            .order_by()
+            .values(
+                "day",
+                "handler_id",
+                "pricing_id",
+                "acceptor_id",
+                "acceptor_corporation_id",
+                "issuer_id",
+            )
+            .annotate(
+                contracts=models.Count("id"),
+                rewards=models.Sum("reward"),
+                collaterals=models.Sum("collateral"),
+                volume=models.Sum("volume"),
+            )
+        )
+        objs = [self.model(**row) for row in totals]
+        with transaction.atomic():
+            self.filter(day__in=days).delete()
+            self.bulk_create(objs, batch_size=batch_size)
+        self.clear_cache()
+        logger.info("Updated contract statistics for %d days", len(days))
+
+
+class OutboxNotificationManager(models.Manager):
+    # max number of attempts for sending a notification before it is dropped
+    MAX_ATTEMPTS = 8
+    # delay in seconds before the first retry, which doubles with every attempt
+    RETRY_BASE_DELAY = 60
+
+    def enqueue_for_contracts(self, contracts_qs: models.QuerySet) -> int:
+        """adds notifications for the current status of given contracts to the outbox
+
+        Whether a contract has a valid pricing is checked when sending,
+        since pricing is updated after contracts are stored.
+
+        Returns the number of notifications added.
+        """
+        from .models import Contract
+
+        pilot_enabled = bool(
+            FREIGHT_DISCORD_WEBHOOK_URL or FREIGHT_DISCORD_SIEGE_GREEN_WEBHOOK_URL
+        )
+        customer_enabled = bool(
+            FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL or FREIGHT_DISCORDPROXY_ENABLED
+        )
+        if not pilot_enabled and not customer_enabled:
+            return 0
+
+        next_attempt_at = now()
+        contracts = contracts_qs.filter(date_expired__gte=next_attempt_at).values_list(
+            "pk", "status", "date_notified"
+        )
+        objs = []
+        for contract_pk, status, date_notified in contracts:
+            if (
+                pilot_enabled
+                and status == Contract.Status.OUTSTANDING
+                and not date_notified
+            ):
+                objs.append(
+                    self.model(
+                        contract_id=contract_pk,
+                        channel=self.model.Channel.PILOT,
+                        status=status,
+                        next_attempt_at=next_attempt_at,
+                    )
+                )
+            if customer_enabled and status in Contract.Status.for_customer_notification:
+                objs.append(
+                    self.model(
+                        contract_id=contract_pk,
+                        channel=self.model.Channel.CUSTOMER,
+                        status=status,
+                        next_attempt_at=next_attempt_at,
+                    )
+                )
+        self.bulk_create(objs, ignore_conflicts=True)
+        if objs:
+            logger.info("Added %d notifications to the outbox", len(objs))
+        return len(objs)
+
+    def send_pending(self, rate_limited: bool = True) -> int:
+        """sends all notifications in the outbox that are due
+
+        Notifications that are no longer valid are dropped.
+        Failed notifications are retried later with exponential backoff.
+
+        Returns the number of notifications sent.
+        """
+        from .models import Contract, ContractCustomerNotification
+
+        entries = list(self.filter(next_attempt_at__lte=now()))
+        if not entries:
+            logger.debug("No pending notifications in the outbox")
+            return 0
+
+        logger.info("Trying to send %d notifications from the outbox", len(entries))
+        contracts = Contract.objects.select_related().in_bulk(
+            {entry.contract_id for entry in entries}
+        )
+        customer_state = Contract.objects.filter(
+            pk__in={
+                entry.contract_id
+                for entry in entries
+                if entry.channel == self.model.Channel.CUSTOMER
+            }
+        ).customer_notification_state()
+        dispatcher = NotificationDispatcher(
+            rate_limited=rate_limited, digest_content=_pilot_digest_content()
+        )
+        entries_by_pk = dict()
+        obsolete_pks = []
+        for entry in entries:
+            try:
+                message = self._message_for_entry(
+                    entry, contracts[entry.contract_id], customer_state
+                )
+            except Exception as ex:
+                logger.error(
+                    "Failed to create notification %s from the outbox: %s", entry, ex
+                )
+                entries_by_pk[entry.pk] = entry
+                continue
+            if message is None:
+                obsolete_pks.append(entry.pk)
+            else:
+                entries_by_pk[entry.pk] = entry
+                dispatcher.add(
+                    entry.pk,
+                    message,
+                    digest=entry.channel == self.model.Channel.PILOT,
+                )
+
+        sent_pks = dispatcher.run()
+        sent_entries = [entries_by_pk[pk] for pk in sent_pks]
+        date_notified = now()
+        pilot_contract_pks = [
+            entry.contract_id
+            for entry in sent_entries
+            if entry.channel == self.model.Channel.PILOT
+        ]
+        if pilot_contract_pks:
+            Contract.objects.filter(pk__in=pilot_contract_pks).update(
+                date_notified=date_notified
+            )
+        for entry in sent_entries:
+            if entry.channel == self.model.Channel.CUSTOMER:
+                ContractCustomerNotification.objects.update_or_create(
+                    contract_id=entry.contract_id,
+                    status=entry.status,
+                    defaults={"date_notified": date_notified},
+                )
+
+        failed_entries = [
+            entry for pk, entry in entries_by_pk.items() if pk not in sent_pks
+        ]
+        for entry in failed_entries:
+            entry.attempts += 1
+            entry.next_attempt_at = date_notified + timedelta(
+                seconds=self.RETRY_BASE_DELAY * 2 ** (entry.attempts - 1)
+            )
+        retry_entries = [
+            entry for entry in failed_entries if entry.attempts < self.MAX_ATTEMPTS
+        ]
+        dropped_pks = [
+            entry.pk for entry in failed_entries if entry.attempts >= self.MAX_ATTEMPTS
+        ]
+        if dropped_pks:
+            logger.warning(
+                "Dropped %d notifications from the outbox after %d failed attempts",
+                len(dropped_pks),
+                self.MAX_ATTEMPTS,
+            )
+        self.bulk_update(retry_entries, fields=["attempts", "next_attempt_at"])
+        self.filter(pk__in=[*sent_pks, *obsolete_pks, *dropped_pks]).delete()
+        return len(sent_pks)
+
+    def _message_for_entry(self, entry, contract, customer_state):
+        """returns message for an outbox entry or None if it is no longer valid"""
+        if contract.status != entry.status or contract.has_expired:
+            return None
+        if not contract.pricing_id and not FREIGHT_NOTIFY_ALL_CONTRACTS:
+            return None
+        if entry.channel == self.model.Channel.PILOT:
+            if contract.date_notified:
+                return None
+            return contract.pilot_notification()
+        if contract.has_stale_status:
+            return None
+        notification = contract.customer_notification(state=customer_state)
+        return notification[1] if notification else None
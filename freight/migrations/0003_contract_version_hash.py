@@ -0,0 +1,23 @@
+# Generated by Django 4.0.10 on 2026-10-18 16:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("freight", "0002_alter_contracthandler_last_error"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contract",
+            name="version_hash",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="hash to identify changes to this contract",
+                max_length=32,
+            ),
+        ),
+    ]
@@ -0,0 +1,90 @@
+import json
+import re
+
+from django.db import migrations, models
+
+# maps beginnings of issue messages to the respective issue flags
+# and the keys of the values shown in those messages
+ISSUE_FLAGS = {
+    "below the minimum required volume": (1, "volume_min"),
+    "exceeds the maximum allowed volume": (2, "volume_max"),
+    "exceeds the maximum allowed collateral": (4, "collateral_max"),
+    "below the minimum required collateral": (8, "collateral_min"),
+    "reward is below the calculated price": (16, "price"),
+}
+
+ISSUE_VALUE_PATTERN = re.compile(r" of ([\d,.]+) ")
+
+
+def convert_issues_to_flags(apps, schema_editor):
+    Contract = apps.get_model("freight", "Contract")
+    contracts = list()
+    for contract in Contract.objects.exclude(issues__isnull=True).only("issues"):
+        try:
+            messages = json.loads(contract.issues)
+        except ValueError:
+            continue
+        flags = 0
+        values = dict()
+        for message in messages:
+            for prefix, (flag, key) in ISSUE_FLAGS.items():
+                if not str(message).startswith(prefix):
+                    continue
+                match = ISSUE_VALUE_PATTERN.search(str(message))
+                if match:
+                    flags |= flag
+                    values[key] = float(match.group(1).replace(",", ""))
+        if flags:
+            contract.issue_flags = flags
+            contract.issue_values = values
+            contracts.append(contract)
+    Contract.objects.bulk_update(
+        contracts, fields=["issue_flags", "issue_values"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("freight", "0003_contract_version_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contract",
+            name="issue_flags",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="contract",
+            name="issue_values",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                help_text=(
+                    "Values shown in the messages of price check issues "
+                    "as they were at the time of the check"
+                ),
+            ),
+        ),
+        migrations.RunPython(convert_issues_to_flags, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="contract",
+            name="issues",
+        ),
+        migrations.RenameField(
+            model_name="contract",
+            old_name="issue_flags",
+            new_name="issues",
+        ),
+        migrations.AlterField(
+            model_name="contract",
+            name="issues",
+            field=models.PositiveSmallIntegerField(
+                db_index=True,
+                default=0,
+                help_text=(
+                    "Price check issues as bit flags (see Pricing.ISSUE_*) or 0 if ok"
+                ),
+            ),
+        ),
+    ]
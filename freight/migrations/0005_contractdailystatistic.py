@@ -0,0 +1,109 @@
+# Generated by Django 4.0.10 on 2026-10-18 17:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def create_statistics_from_contracts(apps, schema_editor):
+    Contract = apps.get_model("freight", "Contract")
+    ContractDailyStatistic = apps.get_model("freight", "ContractDailyStatistic")
+    totals = (
+        Contract.objects.filter(status="finished", date_completed__isnull=False)
+        .annotate(day=TruncDate("date_completed"))
+        .order_by()
+        .values(
+            "day", "pricing_id", "acceptor_id", "acceptor_corporation_id", "issuer_id"
+        )
+        .annotate(
+            contracts=models.Count("id"),
+            rewards=models.Sum("reward"),
+            collaterals=models.Sum("collateral"),
+            volume=models.Sum("volume"),
+        )
+    )
+    ContractDailyStatistic.objects.bulk_create(
+        [ContractDailyStatistic(**row) for row in totals], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eveonline", "0017_alliance_and_corp_names_are_not_unique"),
+        ("freight", "0004_contract_issues_as_flags"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContractDailyStatistic",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "day",
+                    models.DateField(
+                        db_index=True, help_text="day the contracts were finished"
+                    ),
+                ),
+                ("contracts", models.PositiveIntegerField()),
+                ("rewards", models.FloatField()),
+                ("collaterals", models.FloatField()),
+                ("volume", models.FloatField()),
+                (
+                    "acceptor",
+                    models.ForeignKey(
+                        blank=True,
+                        default=None,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="eveonline.evecharacter",
+                    ),
+                ),
+                (
+                    "acceptor_corporation",
+                    models.ForeignKey(
+                        blank=True,
+                        default=None,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="eveonline.evecorporationinfo",
+                    ),
+                ),
+                (
+                    "issuer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="eveonline.evecharacter",
+                    ),
+                ),
+                (
+                    "pricing",
+                    models.ForeignKey(
+                        blank=True,
+                        default=None,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="freight.pricing",
+                    ),
+                ),
+            ],
+            options={
+                "default_permissions": (),
+            },
+        ),
+        migrations.RunPython(
+            create_statistics_from_contracts, migrations.RunPython.noop
+        ),
+    ]
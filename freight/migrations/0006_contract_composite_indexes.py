@@ -0,0 +1,39 @@
+# Generated by Django 4.0.10 on 2026-10-18 17:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("freight", "0005_contractdailystatistic"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="contract",
+            index=models.Index(
+                fields=["status", "date_expired"], name="freight_contract_pending_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contract",
+            index=models.Index(
+                fields=["status", "date_notified", "pricing"],
+                name="freight_contract_notify_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contract",
+            index=models.Index(
+                fields=["status", "date_completed"],
+                name="freight_contract_completed_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contract",
+            index=models.Index(
+                fields=["issuer", "status"], name="freight_contract_issuer_idx"
+            ),
+        ),
+    ]
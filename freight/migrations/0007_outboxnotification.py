@@ -0,0 +1,116 @@
+# Generated by Django 4.0.10 on 2026-10-18 17:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.timezone import now
+
+
+def add_pending_notifications_to_outbox(apps, schema_editor):
+    """adds notifications that have not yet been sent for active contracts"""
+    Contract = apps.get_model("freight", "Contract")
+    OutboxNotification = apps.get_model("freight", "OutboxNotification")
+    next_attempt_at = now()
+    contracts_qs = Contract.objects.filter(date_expired__gte=next_attempt_at)
+    objs = [
+        OutboxNotification(
+            contract_id=contract_pk,
+            channel="pilot",
+            status="outstanding",
+            next_attempt_at=next_attempt_at,
+        )
+        for contract_pk in contracts_qs.filter(
+            status="outstanding", date_notified__isnull=True
+        ).values_list("pk", flat=True)
+    ]
+    customer_qs = contracts_qs.filter(
+        status__in=["outstanding", "in_progress", "finished", "failed"]
+    ).exclude(customer_notifications__status=models.F("status"))
+    objs += [
+        OutboxNotification(
+            contract_id=contract_pk,
+            channel="customer",
+            status=status,
+            next_attempt_at=next_attempt_at,
+        )
+        for contract_pk, status in customer_qs.values_list("pk", "status")
+    ]
+    OutboxNotification.objects.bulk_create(objs, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("freight", "0006_contract_composite_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboxNotification",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "channel",
+                    models.CharField(
+                        choices=[("pilot", "pilot"), ("customer", "customer")],
+                        max_length=16,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("outstanding", "outstanding"),
+                            ("in_progress", "in progress"),
+                            ("finished_issuer", "finished issuer"),
+                            ("finished_contractor", "finished contractor"),
+                            ("finished", "finished"),
+                            ("canceled", "canceled"),
+                            ("rejected", "rejected"),
+                            ("failed", "failed"),
+                            ("deleted", "deleted"),
+                            ("reversed", "reversed"),
+                        ],
+                        help_text="status of the contract this notification is about",
+                        max_length=32,
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="number of failed attempts to send this notification",
+                    ),
+                ),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(
+                        db_index=True,
+                        help_text="earliest time for the next attempt to send",
+                    ),
+                ),
+                (
+                    "contract",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="outbox_notifications",
+                        to="freight.contract",
+                    ),
+                ),
+            ],
+            options={
+                "default_permissions": (),
+                "unique_together": {("contract", "channel", "status")},
+            },
+        ),
+        migrations.RunPython(
+            add_pending_notifications_to_outbox, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.0.10 on 2026-10-18 18:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def recreate_statistics_with_handler(apps, schema_editor):
+    Contract = apps.get_model("freight", "Contract")
+    ContractDailyStatistic = apps.get_model("freight", "ContractDailyStatistic")
+    totals = (
+        Contract.objects.filter(status="finished", date_completed__isnull=False)
+        .annotate(day=TruncDate("date_completed"))
+        .order_by()
+        .values(
+            "day",
+            "handler_id",
+            "pricing_id",
+            "acceptor_id",
+            "acceptor_corporation_id",
+            "issuer_id",
+        )
+        .annotate(
+            contracts=models.Count("id"),
+            rewards=models.Sum("reward"),
+            collaterals=models.Sum("collateral"),
+            volume=models.Sum("volume"),
+        )
+    )
+    ContractDailyStatistic.objects.all().delete()
+    ContractDailyStatistic.objects.bulk_create(
+        [ContractDailyStatistic(**row) for row in totals], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("freight", "0007_outboxnotification"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contractdailystatistic",
+            name="handler",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="freight.contracthandler",
+            ),
+        ),
+        migrations.RunPython(
+            recreate_statistics_with_handler, migrations.RunPython.noop
+        ),
+        migrations.AlterField(
+            model_name="contractdailystatistic",
+            name="handler",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="freight.contracthandler",
+            ),
+        ),
+    ]
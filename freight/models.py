@@ -1,6 +1,7 @@
 import hashlib
 import json
 from datetime import timedelta
+from typing import List, Optional, Sequence, Set, Tuple
 from urllib.parse import urljoin
 
 import dhooks_lite
@@ -9,14 +10,14 @@ from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
-from django.db import models, transaction
+from django.db import models
 from django.urls import reverse
 from django.utils.functional import classproperty
 from django.utils.timezone import now
 from esi.errors import TokenExpiredError, TokenInvalidError
 from esi.models import Token
 
-from allianceauth.authentication.models import CharacterOwnership, User
+from allianceauth.authentication.models import CharacterOwnership
 from allianceauth.eveonline.models import (
     EveAllianceInfo,
     EveCharacter,
@@ -50,8 +51,23 @@ from .app_settings import (
     FREIGHT_OPERATION_MODE_MY_CORPORATION,
     FREIGHT_OPERATION_MODES,
 )
-from .constants import AVATAR_SIZE
-from .managers import ContractManager, EveEntityManager, LocationManager, PricingManager
+from .constants import AVATAR_SIZE, ESI_MAX_IDS_PER_REQUEST
+from .managers import (
+    ContractDailyStatisticManager,
+    ContractHandlerManager,
+    ContractManager,
+    CustomerNotificationState,
+    EveEntityManager,
+    LocationManager,
+    OutboxNotificationManager,
+    PricingManager,
+)
+from .notifications import (
+    DirectMessage,
+    NotificationDispatcher,
+    RenderCache,
+    WebhookMessage,
+)
 from .providers import esi
 
 if "discord" in app_labels():
@@ -60,15 +76,18 @@ else:
     DiscordUser = None
 
 try:
-    from discordproxy.client import DiscordClient
     from discordproxy.discord_api_pb2 import Embed
-    from discordproxy.exceptions import DiscordProxyException
     from google.protobuf import json_format
 except ImportError:
-    DiscordClient = None
+    Embed = None
 
 logger = LoggerAddTag(get_extension_logger(__name__), __title__)
 
+# max number of rendered embeds kept in memory
+EMBED_CACHE_SIZE = 1000
+
+_embed_cache = RenderCache(max_size=EMBED_CACHE_SIZE)
+
 
 class Freight(models.Model):
     """Meta model for global app permissions"""
@@ -163,6 +182,13 @@ class Location(models.Model):
 class Pricing(models.Model):
     """Pricing for a courier route"""
 
+    # price check issues of contracts as bit flags
+    ISSUE_VOLUME_BELOW_MIN = 1
+    ISSUE_VOLUME_ABOVE_MAX = 2
+    ISSUE_COLLATERAL_ABOVE_MAX = 4
+    ISSUE_COLLATERAL_BELOW_MIN = 8
+    ISSUE_REWARD_BELOW_PRICE = 16
+
     start_location = models.ForeignKey(
         Location,
         on_delete=models.CASCADE,
@@ -277,14 +303,33 @@ class Pricing(models.Model):
         unique_together = (("start_location", "end_location"),)
 
     def save(self, update_contracts=True, *args, **kwargs) -> None:
+        if update_contracts and self.pk:
+            previous_route = (
+                Pricing.objects.filter(pk=self.pk)
+                .values_list("start_location_id", "end_location_id")
+                .first()
+            )
+        else:
+            previous_route = None
         super().save(*args, **kwargs)
         if update_contracts:
-            self._update_contracts()
+            self._update_contracts(previous_route)
+
+    def _update_contracts(self, previous_route: tuple = None):
+        """Schedules updating the pricing of contracts on the route of this pricing.
 
-    def _update_contracts(self):
-        from .tasks import update_contracts_pricing
+        Will also update contracts on the previous route of this pricing if given.
+        """
+        from .tasks import schedule_update_contracts_pricing_for_route
 
-        update_contracts_pricing.delay()
+        schedule_update_contracts_pricing_for_route(
+            self.start_location_id, self.end_location_id
+        )
+        if previous_route and set(previous_route) != {
+            self.start_location_id,
+            self.end_location_id,
+        }:
+            schedule_update_contracts_pricing_for_route(*previous_route)
 
     def __str__(self) -> str:
         return self.name
@@ -364,7 +409,7 @@ class Pricing(models.Model):
             modifier = None
 
         else:
-            handler = ContractHandler.objects.first()
+            handler = ContractHandler.objects.get_cached()
             if handler:
                 modifier = handler.price_per_volume_modifier
 
@@ -411,99 +456,149 @@ class Pricing(models.Model):
 
     def get_calculated_price(self, volume: float, collateral: float) -> float:
         """returns the calculated price for the given parameters"""
+        return self.get_calculated_prices([volume], [collateral])[0]
 
-        if not volume:
-            volume = 0
-
-        if not collateral:
-            collateral = 0
-
-        if volume < 0:
-            raise ValueError("volume can not be negative")
-        if collateral < 0:
-            raise ValueError("collateral can not be negative")
-
-        volume = float(volume)
-        collateral = float(collateral)
+    def get_calculated_prices(
+        self, volumes: Sequence[float], collaterals: Sequence[float]
+    ) -> List[float]:
+        """returns the calculated prices for many pairs of volume and collateral
 
+        Same result as calling get_calculated_price() for each pair,
+        but the effective parameters of this pricing are only determined once.
+        """
         price_base = 0 if not self.price_base else self.price_base
         price_min = 0 if not self.price_min else self.price_min
-
         price_per_volume_eff = self.price_per_volume_eff()
-        if not price_per_volume_eff:
-            price_per_volume = 0
-        else:
-            price_per_volume = price_per_volume_eff
-
-        price_per_collateral_percent = (
+        price_per_volume = 0 if not price_per_volume_eff else price_per_volume_eff
+        collateral_factor = (
             0
             if not self.price_per_collateral_percent
             else self.price_per_collateral_percent
-        )
-
-        return max(
-            price_min,
-            (
-                price_base
-                + volume * price_per_volume
-                + collateral * (price_per_collateral_percent / 100)
-            ),
-        )
+        ) / 100
+
+        prices = list()
+        for volume, collateral in zip(volumes, collaterals):
+            volume = float(volume) if volume else 0.0
+            collateral = float(collateral) if collateral else 0.0
+            if volume < 0:
+                raise ValueError("volume can not be negative")
+            if collateral < 0:
+                raise ValueError("collateral can not be negative")
+
+            prices.append(
+                max(
+                    price_min,
+                    price_base
+                    + volume * price_per_volume
+                    + collateral * collateral_factor,
+                )
+            )
+        return prices
 
     def get_contract_price_check_issues(
         self, volume: float, collateral: float, reward: float = None
     ) -> list:
         """returns list of validation error messages or none if ok"""
-        if volume and volume < 0:
-            raise ValueError("volume can not be negative")
-        if collateral and collateral < 0:
-            raise ValueError("collateral can not be negative")
-        if reward and reward < 0:
-            raise ValueError("reward can not be negative")
-        issues = list()
-        if volume is not None and self.volume_min and volume < self.volume_min:
-            issues.append(
+        prices, issues = self.get_contract_price_checks(
+            [volume], [collateral], [reward]
+        )
+        return self.issue_messages(issues[0], prices[0]) or None
+
+    def get_contract_price_checks(
+        self,
+        volumes: Sequence[float],
+        collaterals: Sequence[float],
+        rewards: Sequence[float] = None,
+    ) -> Tuple[List[float], List[int]]:
+        """checks many contracts against this pricing
+
+        Volumes, collaterals and rewards can contain None to skip the related checks.
+        Rewards are not checked if no rewards are given.
+
+        Returns calculated prices and price check issues as bit flags
+        (see Pricing.ISSUE_*) in the order of the given contracts.
+        """
+        if rewards is None:
+            rewards = [None] * len(volumes)
+        prices = self.get_calculated_prices(volumes, collaterals)
+        issues_list = list()
+        for volume, collateral, reward, price in zip(
+            volumes, collaterals, rewards, prices
+        ):
+            if reward and reward < 0:
+                raise ValueError("reward can not be negative")
+            issues = 0
+            if volume is not None:
+                if self.volume_min and volume < self.volume_min:
+                    issues |= self.ISSUE_VOLUME_BELOW_MIN
+                if self.volume_max and volume > self.volume_max:
+                    issues |= self.ISSUE_VOLUME_ABOVE_MAX
+            if collateral is not None:
+                if self.collateral_max and collateral > self.collateral_max:
+                    issues |= self.ISSUE_COLLATERAL_ABOVE_MAX
+                if self.collateral_min and collateral < self.collateral_min:
+                    issues |= self.ISSUE_COLLATERAL_BELOW_MIN
+            if reward is not None and reward < price:
+                issues |= self.ISSUE_REWARD_BELOW_PRICE
+            issues_list.append(issues)
+        return prices, issues_list
+
+    def issue_messages(self, issues: int, calculated_price: float = None) -> List[str]:
+        """returns messages for the given price check issues of this pricing"""
+        return self.format_issue_messages(
+            issues, self.issue_values(issues, calculated_price)
+        )
+
+    def issue_values(self, issues: int, calculated_price: float = None) -> dict:
+        """returns the values shown in the messages for given price check issues"""
+        values = dict()
+        if issues & self.ISSUE_VOLUME_BELOW_MIN:
+            values["volume_min"] = self.volume_min
+        if issues & self.ISSUE_VOLUME_ABOVE_MAX:
+            values["volume_max"] = self.volume_max
+        if issues & self.ISSUE_COLLATERAL_ABOVE_MAX:
+            values["collateral_max"] = self.collateral_max
+        if issues & self.ISSUE_COLLATERAL_BELOW_MIN:
+            values["collateral_min"] = self.collateral_min
+        if issues & self.ISSUE_REWARD_BELOW_PRICE:
+            values["price"] = calculated_price
+        return values
+
+    @classmethod
+    def format_issue_messages(cls, issues: int, values: dict) -> List[str]:
+        """returns messages for given price check issues and their values"""
+        messages = list()
+        if issues & cls.ISSUE_VOLUME_BELOW_MIN:
+            messages.append(
                 "below the minimum required volume of {:,.0f} m3".format(
-                    self.volume_min
+                    values["volume_min"]
                 )
             )
-        if volume is not None and self.volume_max and volume > self.volume_max:
-            issues.append(
+        if issues & cls.ISSUE_VOLUME_ABOVE_MAX:
+            messages.append(
                 "exceeds the maximum allowed volume of {:,.0f} m3".format(
-                    self.volume_max
+                    values["volume_max"]
                 )
             )
-        if (
-            collateral is not None
-            and self.collateral_max
-            and collateral > self.collateral_max
-        ):
-            issues.append(
+        if issues & cls.ISSUE_COLLATERAL_ABOVE_MAX:
+            messages.append(
                 "exceeds the maximum allowed collateral of {:,.0f} ISK".format(
-                    self.collateral_max
+                    values["collateral_max"]
                 )
             )
-        if (
-            collateral is not None
-            and self.collateral_min
-            and collateral < self.collateral_min
-        ):
-            issues.append(
+        if issues & cls.ISSUE_COLLATERAL_BELOW_MIN:
+            messages.append(
                 "below the minimum required collateral of {:,.0f} ISK".format(
-                    self.collateral_min
+                    values["collateral_min"]
                 )
             )
-        if reward is not None:
-            calculated_price = self.get_calculated_price(volume, collateral)
-            if reward < calculated_price:
-                issues.append(
-                    "reward is below the calculated price of {:,.0f} ISK".format(
-                        calculated_price
-                    )
+        if issues & cls.ISSUE_REWARD_BELOW_PRICE:
+            messages.append(
+                "reward is below the calculated price of {:,.0f} ISK".format(
+                    values["price"]
                 )
-        if len(issues) == 0:
-            return None
-        return issues
+            )
+        return messages
 
 
 class EveEntity(models.Model):
@@ -623,6 +718,8 @@ class ContractHandler(models.Model):
         help_text="error that occurred at the last sync attempt (if any)",
     )
 
+    objects = ContractHandlerManager()
+
     def __str__(self):
         return str(self.organization.name)
 
@@ -798,19 +895,31 @@ class ContractHandler(models.Model):
         ]
 
         # 2nd filter: remove contracts not in scope due to operation mode
+        if self.operation_mode != FREIGHT_OPERATION_MODE_CORP_PUBLIC:
+            affiliations = self._fetch_character_affiliations(
+                {int(contract["issuer_id"]) for contract in contracts_courier}
+            )
+            handler_alliance_id = self.character.character.alliance_id
         contracts = list()
         for contract in contracts_courier:
+            if self.operation_mode == FREIGHT_OPERATION_MODE_CORP_PUBLIC:
+                contracts.append(contract)
+                continue
+
             try:
-                issuer = EveCharacter.objects.get(character_id=contract["issuer_id"])
-            except EveCharacter.DoesNotExist:
-                issuer = EveCharacter.objects.create_character(
-                    character_id=contract["issuer_id"]
+                issuer_corporation_id, issuer_alliance_id = affiliations[
+                    int(contract["issuer_id"])
+                ]
+            except KeyError:
+                logger.warning(
+                    "%s: Ignoring contract %s with unknown issuer %s",
+                    self,
+                    contract["contract_id"],
+                    contract["issuer_id"],
                 )
+                continue
 
             assignee_id = int(contract["assignee_id"])
-            issuer_corporation_id = int(issuer.corporation_id)
-            issuer_alliance_id = int(issuer.alliance_id) if issuer.alliance_id else None
-
             if self.operation_mode == FREIGHT_OPERATION_MODE_MY_ALLIANCE:
                 in_scope = issuer_alliance_id == assignee_id
 
@@ -818,12 +927,7 @@ class ContractHandler(models.Model):
                 in_scope = assignee_id == issuer_corporation_id
 
             elif self.operation_mode == FREIGHT_OPERATION_MODE_CORP_IN_ALLIANCE:
-                in_scope = issuer_alliance_id == int(
-                    self.character.character.alliance_id
-                )
-
-            elif self.operation_mode == FREIGHT_OPERATION_MODE_CORP_PUBLIC:
-                in_scope = True
+                in_scope = issuer_alliance_id == int(handler_alliance_id)
 
             else:
                 raise NotImplementedError(
@@ -832,49 +936,116 @@ class ContractHandler(models.Model):
             if in_scope:
                 contracts.append(contract)
 
-        # determine if contracts have changed by comparing their hashes
+        contract_hashes = {
+            contract["contract_id"]: Contract.objects.calc_version_hash(contract)
+            for contract in contracts
+        }
         new_version_hash = hashlib.md5(
-            json.dumps(contracts, cls=DjangoJSONEncoder).encode("utf-8")
+            "".join(sorted(contract_hashes.values())).encode("utf-8")
         ).hexdigest()
-        if force_sync or new_version_hash != self.version_hash:
-            self._store_contract_from_esi(contracts, new_version_hash, token)
+        # contracts with an acceptor that could not be resolved are always updated
+        accepted_ids = [
+            contract["contract_id"]
+            for contract in contracts
+            if int(contract.get("acceptor_id") or 0)
+        ]
+        unresolved_ids = (
+            set(
+                self.contracts.filter(
+                    contract_id__in=accepted_ids,
+                    acceptor__isnull=True,
+                    acceptor_corporation__isnull=True,
+                ).values_list("contract_id", flat=True)
+            )
+            if accepted_ids
+            else set()
+        )
+        if (
+            not force_sync
+            and not unresolved_ids
+            and new_version_hash == self.version_hash
+            and self.contracts.filter(contract_id__in=contract_hashes.keys()).count()
+            == len(contract_hashes)
+        ):
+            logger.info("%s: Contracts are unchanged.", self)
+            self.set_sync_status(ContractHandler.ERROR_NONE)
+            return
+
+        # determine which contracts have changed by comparing their hashes
+        known_hashes = dict(self.contracts.values_list("contract_id", "version_hash"))
+        changed_contracts = [
+            contract
+            for contract in contracts
+            if force_sync
+            or contract["contract_id"] in unresolved_ids
+            or known_hashes.get(contract["contract_id"])
+            != contract_hashes[contract["contract_id"]]
+        ]
+        vanished_ids = known_hashes.keys() - contract_hashes.keys()
+        if vanished_ids:
+            logger.info(
+                "%s: %d contracts are no longer reported by ESI",
+                self,
+                len(vanished_ids),
+            )
+        if changed_contracts:
+            self._store_contract_from_esi(changed_contracts, new_version_hash, token)
 
         else:
             logger.info("%s: Contracts are unchanged.", self)
+            self.version_hash = new_version_hash
             self.set_sync_status(ContractHandler.ERROR_NONE)
 
+    @staticmethod
+    def _fetch_character_affiliations(character_ids: Set[int]) -> dict:
+        """returns corporation and alliance ID for each given character ID
+
+        Known characters are taken from the database,
+        all others are fetched from ESI in bulk.
+        """
+        affiliations = dict()
+        for character_id, corporation_id, alliance_id in EveCharacter.objects.filter(
+            character_id__in=character_ids
+        ).values_list("character_id", "corporation_id", "alliance_id"):
+            affiliations[int(character_id)] = (
+                int(corporation_id),
+                int(alliance_id) if alliance_id else None,
+            )
+        missing_ids = sorted(character_ids - affiliations.keys())
+        for start in range(0, len(missing_ids), ESI_MAX_IDS_PER_REQUEST):
+            chunk = missing_ids[start : start + ESI_MAX_IDS_PER_REQUEST]
+            for obj in esi.client.Character.post_characters_affiliation(
+                characters=chunk
+            ).results():
+                alliance_id = obj.get("alliance_id")
+                affiliations[int(obj["character_id"])] = (
+                    int(obj["corporation_id"]),
+                    int(alliance_id) if alliance_id else None,
+                )
+        return affiliations
+
     def _store_contract_from_esi(
         self, contracts: list, new_version_hash: str, token: Token
     ) -> None:
         logger.info("%s: Storing update with %d contracts", self, len(contracts))
         # update contracts in local DB
-        with transaction.atomic():
+        no_errors = Contract.objects.bulk_update_or_create_from_dicts(
+            handler=self, contracts=contracts, token=token
+        )
+        if no_errors:
             self.version_hash = new_version_hash
-            no_errors = True
-            for contract in contracts:
-                try:
-                    Contract.objects.update_or_create_from_dict(
-                        handler=self, contract=contract, token=token
-                    )
-                except Exception:
-                    logger.exception(
-                        "%s: An unexpected error ocurred while trying to load contract "
-                        "%s",
-                        self,
-                        contract["contract_id"]
-                        if "contract_id" in contract
-                        else "Unknown",
-                        exc_info=True,
-                    )
-                    no_errors = False
-
-            if no_errors:
-                last_error = self.ERROR_NONE
-            else:
-                last_error = self.ERROR_UNKNOWN
-            self.set_sync_status(last_error)
+            last_error = self.ERROR_NONE
+        else:
+            # contracts that failed must not be skipped in the next sync
+            self.version_hash = None
+            last_error = self.ERROR_UNKNOWN
+        self.set_sync_status(last_error)
 
-        Contract.objects.update_pricing()
+        contracts_qs = Contract.objects.filter(
+            handler=self, contract_id__in=[obj["contract_id"] for obj in contracts]
+        )
+        contracts_qs.update_pricing()
+        ContractDailyStatistic.objects.update_for_contracts(contracts_qs)
 
     def _report_to_user(self, user, success, error_code):
         try:
@@ -988,11 +1159,18 @@ class Contract(models.Model):
     issuer = models.ForeignKey(
         EveCharacter, on_delete=models.CASCADE, related_name="contracts_issuer"
     )
-    issues = models.TextField(
-        default=None,
-        null=True,
+    issues = models.PositiveSmallIntegerField(
+        default=0,
+        db_index=True,
+        help_text="Price check issues as bit flags (see Pricing.ISSUE_*) or 0 if ok",
+    )
+    issue_values = models.JSONField(
+        default=dict,
         blank=True,
-        help_text="List or price check issues as JSON array of strings or None",
+        help_text=(
+            "Values shown in the messages of price check issues "
+            "as they were at the time of the check"
+        ),
     )
     pricing = models.ForeignKey(
         Pricing,
@@ -1008,6 +1186,12 @@ class Contract(models.Model):
     )
     status = models.CharField(max_length=32, choices=Status.choices, db_index=True)
     title = models.CharField(max_length=100, default=None, null=True, blank=True)
+    version_hash = models.CharField(
+        max_length=32,
+        default="",
+        blank=True,
+        help_text="hash to identify changes to this contract",
+    )
     volume = models.FloatField()
 
     objects = ContractManager()
@@ -1016,6 +1200,20 @@ class Contract(models.Model):
         unique_together = (("handler", "contract_id"),)
         indexes = [
             models.Index(fields=["status"]),
+            models.Index(
+                fields=["status", "date_expired"], name="freight_contract_pending_idx"
+            ),
+            models.Index(
+                fields=["status", "date_notified", "pricing"],
+                name="freight_contract_notify_idx",
+            ),
+            models.Index(
+                fields=["status", "date_completed"],
+                name="freight_contract_completed_idx",
+            ),
+            models.Index(
+                fields=["issuer", "status"], name="freight_contract_issuer_idx"
+            ),
         ]
 
     def __str__(self) -> str:
@@ -1105,11 +1303,10 @@ class Contract(models.Model):
         )
 
     def get_issue_list(self) -> list:
-        """returns current pricing issues as list of strings"""
-        if self.issues:
-            return json.loads(self.issues)
-        else:
+        """returns pricing issues found at the last price check as list of strings"""
+        if not self.issues:
             return []
+        return Pricing.format_issue_messages(self.issues, self.issue_values)
 
     def _generate_embed_description(self) -> object:
         """generates a Discord embed for this contract"""
@@ -1181,7 +1378,53 @@ class Contract(models.Model):
             desc += f"**Contract ID**: {self.contract_id}\n"
             return {"desc": desc, "color": color}
 
+    def embed_fingerprint(self) -> tuple:
+        """returns fingerprint of the content shown in embeds for this contract"""
+        return (
+            bool(FREIGHT_DISCORD_SIEGE_GREEN_WEBHOOK_URL),
+            self.contract_id,
+            self.status,
+            self.title,
+            self.volume,
+            self.reward,
+            self.collateral,
+            self.date_issued,
+            self.date_expired,
+            self.date_accepted,
+            self.pricing_id,
+            self.issues,
+            self.start_location_id,
+            self.start_location.name,
+            self.end_location_id,
+            self.end_location.name,
+            self.issuer_id,
+            self.issuer.character_name,
+            self.issuer.portrait_url(),
+            self.acceptor_id,
+            self.acceptor_corporation_id,
+            self.acceptor_name,
+        )
+
     def _generate_embed(self, for_issuer=False) -> dhooks_lite.Embed:
+        """returns Discord embed for this contract
+
+        Embeds are rendered once per content and then reused from cache.
+        """
+        return _embed_cache.get_or_render(
+            (self.embed_fingerprint(), bool(for_issuer)),
+            lambda: self._render_embed(for_issuer),
+        )
+
+    def _generate_proxy_embed(self) -> "Embed":
+        """returns Discord Proxy embed for the issuer of this contract"""
+        return _embed_cache.get_or_render(
+            (self.embed_fingerprint(), "discordproxy"),
+            lambda: json_format.ParseDict(
+                self._generate_embed(for_issuer=True).asdict(), Embed()
+            ),
+        )
+
+    def _render_embed(self, for_issuer: bool) -> dhooks_lite.Embed:
         embed_desc = self._generate_embed_description()
         if for_issuer:
             url = urljoin(site_absolute_url(), reverse("freight:contract_list_user"))
@@ -1201,8 +1444,10 @@ class Contract(models.Model):
             color=embed_desc["color"],
         )
 
-    def send_pilot_notification(self):
-        """sends pilot notification about this contract to the DISCORD webhook"""
+    def pilot_notification(self) -> Optional[WebhookMessage]:
+        """returns pilot notification about this contract for the DISCORD webhook
+        or None if no webhook is configured
+        """
         if FREIGHT_DISCORD_WEBHOOK_URL or FREIGHT_DISCORD_SIEGE_GREEN_WEBHOOK_URL:
             if FREIGHT_DISCORD_DISABLE_BRANDING:
                 username = None
@@ -1212,99 +1457,152 @@ class Contract(models.Model):
                 avatar_url = self.handler.organization.icon_url(size=AVATAR_SIZE)
 
             if FREIGHT_DISCORD_WEBHOOK_URL:
-                hook = dhooks_lite.Webhook(
-                    FREIGHT_DISCORD_WEBHOOK_URL, username=username, avatar_url=avatar_url
-                )
+                url = FREIGHT_DISCORD_WEBHOOK_URL
             elif FREIGHT_DISCORD_SIEGE_GREEN_WEBHOOK_URL:
-                hook = dhooks_lite.Webhook(
-                    FREIGHT_DISCORD_SIEGE_GREEN_WEBHOOK_URL, username=username, avatar_url=avatar_url
-                )
-            with transaction.atomic():
-                logger.info(
-                    "%s: Trying to sent pilot notification about contract %s to %s",
-                    self,
-                    self.contract_id,
-                    FREIGHT_DISCORD_WEBHOOK_URL,
-                )
-                if FREIGHT_DISCORD_MENTIONS:
-                    contents = str(FREIGHT_DISCORD_MENTIONS) + " "
-                else:
-                    contents = ""
+                url = FREIGHT_DISCORD_SIEGE_GREEN_WEBHOOK_URL
+            logger.info(
+                "%s: Trying to sent pilot notification about contract %s to %s",
+                self,
+                self.contract_id,
+                FREIGHT_DISCORD_WEBHOOK_URL,
+            )
+            if FREIGHT_DISCORD_MENTIONS:
+                contents = str(FREIGHT_DISCORD_MENTIONS) + " "
+            else:
+                contents = ""
 
-                contract_list_url = urljoin(
-                    site_absolute_url(), reverse("freight:contract_list_all")
-                )
-                if FREIGHT_DISCORD_WEBHOOK_URL:
-                    contents += (
-                        "There is a new courier contract from {} "
-                        "looking to be picked up "
-                        "[[show]({})]:"
-                    ).format(self.issuer, contract_list_url)
-
-                embed = self._generate_embed()
-                response = hook.execute(
-                    content=contents, embeds=[embed], wait_for_response=True
-                )
-                if response.status_ok:
-                    self.date_notified = now()
-                    self.save()
-                else:
-                    logger.warn(
-                        "%s: Failed to send message. HTTP code: %s",
-                        self,
-                        response.status_code,
-                    )
+            contract_list_url = urljoin(
+                site_absolute_url(), reverse("freight:contract_list_all")
+            )
+            if FREIGHT_DISCORD_WEBHOOK_URL:
+                contents += (
+                    "There is a new courier contract from {} "
+                    "looking to be picked up "
+                    "[[show]({})]:"
+                ).format(self.issuer, contract_list_url)
+
+            return WebhookMessage(
+                url=url,
+                username=username,
+                avatar_url=avatar_url,
+                content=contents,
+                embeds=[self._generate_embed()],
+            )
+
+        logger.debug("%s: FREIGHT_DISCORD_WEBHOOK_URL not configured", self)
+        return None
+
+    @classmethod
+    def pilot_digest_content(cls, count: int) -> str:
+        """returns content for a pilot notification about several contracts"""
+        if FREIGHT_DISCORD_MENTIONS:
+            contents = str(FREIGHT_DISCORD_MENTIONS) + " "
         else:
-            logger.debug("%s: FREIGHT_DISCORD_WEBHOOK_URL not configured", self)
+            contents = ""
 
-    def send_customer_notification(self, force_sent=False):
-        """sends customer notification about this contract to Discord
-        force_sent: send notification even if one has already been sent
+        if FREIGHT_DISCORD_WEBHOOK_URL:
+            contract_list_url = urljoin(
+                site_absolute_url(), reverse("freight:contract_list_all")
+            )
+            contents += (
+                "There are {} new courier contracts "
+                "looking to be picked up "
+                "[[show]({})]:"
+            ).format(count, contract_list_url)
+        return contents
+
+    def send_pilot_notification(self):
+        """sends pilot notification about this contract to the DISCORD webhook"""
+        message = self.pilot_notification()
+        if not message:
+            return
+        dispatcher = NotificationDispatcher()
+        dispatcher.add(self.pk, message)
+        if dispatcher.run():
+            self.date_notified = now()
+            self.save(update_fields=["date_notified"])
+
+    def customer_notification(
+        self, force_sent=False, state: CustomerNotificationState = None
+    ) -> Optional[tuple]:
+        """returns customer notification about this contract for Discord
+        as tuple of the status to report and the message
+        or None if there is nothing to report
+
+        force_sent: report status even if it has already been reported
+        state: customer notification state loaded in bulk for many contracts,
+        will be loaded for this contract only if not given
         """
         if (
             FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL or FREIGHT_DISCORDPROXY_ENABLED
         ) and DiscordUser:
+            if state is None:
+                state = Contract.objects.filter(
+                    pk=self.pk
+                ).customer_notification_state()
+            notified_statuses = state.notified_statuses.get(self.pk, set())
             status_to_report = None
             for status in self.Status.for_customer_notification:
                 if self.status == status and (
-                    force_sent or not self.customer_notifications.filter(status=status)
+                    force_sent or status not in notified_statuses
                 ):
                     status_to_report = status
                     break
 
             if status_to_report:
-                self._report_to_customer(status_to_report)
+                message = self._customer_message(status_to_report, state)
+                if message:
+                    return status_to_report, message
         else:
             logger.debug(
                 "%s: FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL not configured or "
                 "Discord services not installed or Discord Proxy not enabled",
                 self,
             )
+        return None
+
+    def send_customer_notification(self, force_sent=False):
+        """sends customer notification about this contract to Discord
+        force_sent: send notification even if one has already been sent
+        """
+        notification = self.customer_notification(force_sent)
+        if not notification:
+            return
+        status_to_report, message = notification
+        dispatcher = NotificationDispatcher()
+        dispatcher.add(self.pk, message)
+        if dispatcher.run():
+            ContractCustomerNotification.objects.update_or_create(
+                contract=self,
+                status=status_to_report,
+                defaults={"date_notified": now()},
+            )
 
-    def _report_to_customer(self, status_to_report):
-        issuer_user = User.objects.filter(
-            character_ownerships__character=self.issuer
-        ).first()
+    def _customer_message(self, status_to_report, state: CustomerNotificationState):
+        issuer_user = state.issuer_users.get(self.issuer_id)
         if not issuer_user:
             logger.info(
                 "%s: Could not find matching user for issuer: %s", self, self.issuer
             )
-            return
-        try:
-            discord_user_id = DiscordUser.objects.get(user=issuer_user).uid
-        except DiscordUser.DoesNotExist:
+            return None
+        discord_user_id = state.discord_uids.get(issuer_user.pk)
+        if not discord_user_id:
             logger.warning(
                 "%s: Could not find Discord user for issuer: %s", self, issuer_user
             )
-            return
+            return None
 
         if FREIGHT_DISCORDPROXY_ENABLED:
-            self._send_to_customer_via_discordproxy(status_to_report, discord_user_id)
+            return self._customer_direct_message(status_to_report, discord_user_id)
 
-        elif FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL:
-            self._send_to_customer_via_webhook(status_to_report, discord_user_id)
+        if FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL:
+            return self._customer_webhook_message(status_to_report, discord_user_id)
 
-    def _send_to_customer_via_webhook(self, status_to_report, discord_user_id):
+        return None
+
+    def _customer_webhook_message(
+        self, status_to_report, discord_user_id
+    ) -> WebhookMessage:
         if FREIGHT_DISCORD_DISABLE_BRANDING:
             username = None
             avatar_url = None
@@ -1312,11 +1610,6 @@ class Contract(models.Model):
             username = FREIGHT_APP_NAME
             avatar_url = self.handler.organization.icon_url(size=AVATAR_SIZE)
 
-        hook = dhooks_lite.Webhook(
-            FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL,
-            username=username,
-            avatar_url=avatar_url,
-        )
         logger.info(
             "%s: Trying to send customer notification"
             " about contract %s on status %s to %s",
@@ -1327,23 +1620,17 @@ class Contract(models.Model):
         )
         embed = self._generate_embed(for_issuer=True)
         contents = self._generate_contents(discord_user_id, status_to_report)
-        response = hook.execute(
-            content=contents, embeds=[embed], wait_for_response=True
+        return WebhookMessage(
+            url=FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL,
+            username=username,
+            avatar_url=avatar_url,
+            content=contents,
+            embeds=[embed],
         )
-        if response.status_ok:
-            ContractCustomerNotification.objects.update_or_create(
-                contract=self,
-                status=status_to_report,
-                defaults={"date_notified": now()},
-            )
-        else:
-            logger.warn(
-                "%s: Failed to send message. HTTP code: %s",
-                self,
-                response.status_code,
-            )
 
-    def _send_to_customer_via_discordproxy(self, status_to_report, discord_user_id):
+    def _customer_direct_message(
+        self, status_to_report, discord_user_id
+    ) -> DirectMessage:
         logger.info(
             "%s: Trying to send customer notification "
             "about contract %s on status %s to discord dm",
@@ -1351,24 +1638,16 @@ class Contract(models.Model):
             self.contract_id,
             status_to_report,
         )
-        embed_dct = self._generate_embed(for_issuer=True).asdict()
-        embed = json_format.ParseDict(embed_dct, Embed())
+        embed = self._generate_proxy_embed()
         contents = self._generate_contents(
             discord_user_id, status_to_report, include_mention=False
         )
-        client = DiscordClient(target=f"localhost:{FREIGHT_DISCORDPROXY_PORT}")
-        try:
-            client.create_direct_message(
-                user_id=discord_user_id, content=contents, embed=embed
-            )
-        except DiscordProxyException as ex:
-            logger.error("Failed to send message to Discord: %s", ex)
-        else:
-            ContractCustomerNotification.objects.update_or_create(
-                contract=self,
-                status=status_to_report,
-                defaults={"date_notified": now()},
-            )
+        return DirectMessage(
+            target=f"localhost:{FREIGHT_DISCORDPROXY_PORT}",
+            user_id=discord_user_id,
+            content=contents,
+            embed=embed,
+        )
 
     def _generate_contents(
         self, discord_user_id, status_to_report, include_mention=True
@@ -1432,3 +1711,82 @@ class ContractCustomerNotification(models.Model):
         return "{}(pk={}, contract_id={}, status={})".format(
             self.__class__.__name__, self.pk, self.contract.contract_id, self.status
         )
+
+
+class ContractDailyStatistic(models.Model):
+    """Totals of finished contracts per day used for statistics"""
+
+    day = models.DateField(db_index=True, help_text="day the contracts were finished")
+    handler = models.ForeignKey(
+        ContractHandler, on_delete=models.CASCADE, related_name="+"
+    )
+    pricing = models.ForeignKey(
+        Pricing,
+        on_delete=models.SET_NULL,
+        default=None,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    acceptor = models.ForeignKey(
+        EveCharacter,
+        on_delete=models.CASCADE,
+        default=None,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    acceptor_corporation = models.ForeignKey(
+        EveCorporationInfo,
+        on_delete=models.CASCADE,
+        default=None,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    issuer = models.ForeignKey(EveCharacter, on_delete=models.CASCADE, related_name="+")
+    contracts = models.PositiveIntegerField()
+    rewards = models.FloatField()
+    collaterals = models.FloatField()
+    volume = models.FloatField()
+
+    objects = ContractDailyStatisticManager()
+
+    class Meta:
+        default_permissions = ()
+
+    def __str__(self) -> str:
+        return "{}: {} contracts".format(self.day, self.contracts)
+
+
+class OutboxNotification(models.Model):
+    """Notification about a contract that is waiting to be sent to Discord"""
+
+    class Channel(models.TextChoices):
+        PILOT = "pilot", "pilot"
+        CUSTOMER = "customer", "customer"
+
+    contract = models.ForeignKey(
+        Contract, on_delete=models.CASCADE, related_name="outbox_notifications"
+    )
+    channel = models.CharField(max_length=16, choices=Channel.choices)
+    status = models.CharField(
+        max_length=32,
+        choices=Contract.Status.choices,
+        help_text="status of the contract this notification is about",
+    )
+    attempts = models.PositiveIntegerField(
+        default=0, help_text="number of failed attempts to send this notification"
+    )
+    next_attempt_at = models.DateTimeField(
+        db_index=True, help_text="earliest time for the next attempt to send"
+    )
+
+    objects = OutboxNotificationManager()
+
+    class Meta:
+        default_permissions = ()
+        unique_together = (("contract", "channel", "status"),)
+
+    def __str__(self) -> str:
+        return "{} - {} - {}".format(self.contract_id, self.channel, self.status)
@@ -0,0 +1,442 @@
+"""Sending of notifications to Discord"""
+
+import inspect
+import json
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import monotonic, sleep
+from typing import Any, Callable, Hashable, List, NamedTuple, Optional, Set, Tuple
+
+import dhooks_lite
+import requests
+from requests.adapters import HTTPAdapter
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from allianceauth.services.hooks import get_extension_logger
+from app_utils.logging import LoggerAddTag
+
+from . import __title__
+from .app_settings import FREIGHT_NOTIFICATIONS_MAX_WORKERS
+
+try:
+    import grpc
+    from discordproxy.discord_api_pb2 import SendDirectMessageRequest
+    from discordproxy.discord_api_pb2_grpc import DiscordApiStub
+    from discordproxy.exceptions import to_discord_proxy_exception
+except ImportError:
+    grpc = None
+
+logger = LoggerAddTag(get_extension_logger(__name__), __title__)
+
+HTTP_TOO_MANY_REQUESTS = 429
+# connect and read timeouts in seconds for requests to webhooks
+WEBHOOK_REQUEST_TIMEOUT = (5.0, 30.0)
+# timeout in seconds for requests to Discord Proxy
+DISCORDPROXY_REQUEST_TIMEOUT = 30.0
+# max number of embeds Discord accepts per message
+MAX_EMBEDS_PER_MESSAGE = 10
+# Discord limits the combined size of all embeds in one message
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+
+class RenderCache:
+    """Bounded in-memory cache for rendered parts of notifications,
+    which keeps the most recently used items
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max(int(max_size), 1)
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get_or_render(self, key: Hashable, render: Callable[[], Any]) -> Any:
+        """returns the item for given key and renders it when it is missing"""
+        with self._lock:
+            try:
+                self._items.move_to_end(key)
+                return self._items[key]
+            except KeyError:
+                pass
+        value = render()
+        with self._lock:
+            self._items[key] = value
+            if len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        """removes all items"""
+        with self._lock:
+            self._items.clear()
+
+
+def _create_webhook_session() -> requests.Session:
+    """returns HTTP session for all requests to webhooks,
+    which keeps connections to Discord open for reuse between messages
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=max(int(FREIGHT_NOTIFICATIONS_MAX_WORKERS), 1))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_webhook_session = _create_webhook_session()
+
+
+def _supports_pooled_webhook() -> bool:
+    """whether the installed dhooks-lite sends all requests through
+    Webhook._send_request_to_webhook(payload, wait_for_response),
+    which is replaced by PooledWebhook
+
+    Older and newer versions of dhooks-lite may work differently,
+    so webhooks fall back to sending without the session of this app.
+    """
+    method = getattr(dhooks_lite.Webhook, "_send_request_to_webhook", None)
+    if not callable(method) or not hasattr(dhooks_lite.Webhook, "user_agent"):
+        return False
+    try:
+        parameters = list(inspect.signature(method).parameters)
+    except (TypeError, ValueError):
+        return False
+    return parameters == ["self", "payload", "wait_for_response"]
+
+
+class PooledWebhook(dhooks_lite.Webhook):
+    """Webhook which sends its requests through the HTTP session of this app,
+    so connections to Discord are reused between messages
+
+    Replaces the internal method Webhook._send_request_to_webhook of dhooks-lite
+    and must only be used when _supports_pooled_webhook() is True.
+    """
+
+    def _send_request_to_webhook(self, payload: dict, wait_for_response: bool):
+        return _webhook_session.post(
+            url=self.url,
+            params={"wait": wait_for_response},
+            headers={
+                "Content-Type": "application/json",
+                "User-Agent": str(self.user_agent),
+            },
+            data=json.dumps(payload, cls=DjangoJSONEncoder),
+            timeout=WEBHOOK_REQUEST_TIMEOUT,
+        )
+
+
+class PooledDiscordClient:
+    """Client for sending direct messages via Discord Proxy,
+    which keeps its gRPC channel open until it is closed
+
+    Works like discordproxy.client.DiscordClient, but with a persistent channel.
+    Uses the generated gRPC stubs of Discord Proxy,
+    which is why Discord Proxy is pinned to a minor version.
+    """
+
+    def __init__(self, target: str) -> None:
+        self._channel = grpc.insecure_channel(target)
+        self._stub = DiscordApiStub(self._channel)
+
+    def create_direct_message(self, user_id: int, content: str = "", embed=None):
+        request = SendDirectMessageRequest(
+            content=content, user_id=user_id, embed=embed
+        )
+        try:
+            response = self._stub.SendDirectMessage(
+                request=request, timeout=DISCORDPROXY_REQUEST_TIMEOUT
+            )
+        except Exception as ex:
+            raise to_discord_proxy_exception(ex) from ex
+        return response.message
+
+    def close(self) -> None:
+        self._channel.close()
+
+
+class NotificationTransport:
+    """Connections for sending notifications, which are kept open for reuse
+
+    Webhooks share the HTTP session of this app, which stays open.
+    Keeps one gRPC channel per Discord Proxy target until closed.
+    """
+
+    # whether webhooks can send their requests through the session of this app
+    USE_POOLED_WEBHOOK = _supports_pooled_webhook()
+
+    def __init__(self) -> None:
+        self._discord_clients = dict()
+        self._lock = Lock()
+
+    def __enter__(self) -> "NotificationTransport":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def webhook(
+        self, url: str, username: Optional[str], avatar_url: Optional[str]
+    ) -> dhooks_lite.Webhook:
+        """returns webhook for given URL"""
+        webhook_class = (
+            PooledWebhook if self.USE_POOLED_WEBHOOK else dhooks_lite.Webhook
+        )
+        return webhook_class(url, username=username, avatar_url=avatar_url)
+
+    def discord_client(self, target: str) -> PooledDiscordClient:
+        """returns Discord Proxy client for given target"""
+        with self._lock:
+            if target not in self._discord_clients:
+                self._discord_clients[target] = PooledDiscordClient(target)
+            return self._discord_clients[target]
+
+    def close(self) -> None:
+        """closes all connections to Discord Proxy"""
+        with self._lock:
+            for client in self._discord_clients.values():
+                client.close()
+            self._discord_clients.clear()
+
+
+class WebhookMessage(NamedTuple):
+    """A message to be posted to a Discord webhook"""
+
+    url: str
+    username: Optional[str]
+    avatar_url: Optional[str]
+    content: str
+    embeds: List[dhooks_lite.Embed]
+
+    @property
+    def channel(self) -> str:
+        return self.url
+
+    def send(self, transport: NotificationTransport) -> dhooks_lite.WebhookResponse:
+        hook = transport.webhook(self.url, self.username, self.avatar_url)
+        return hook.execute(
+            content=self.content, embeds=self.embeds, wait_for_response=True
+        )
+
+
+class DirectMessage(NamedTuple):
+    """A direct message to a Discord user to be sent via Discord Proxy"""
+
+    target: str
+    user_id: int
+    content: str
+    embed: Any
+
+    @property
+    def channel(self) -> str:
+        return f"user:{self.user_id}"
+
+    def send(self, transport: NotificationTransport) -> None:
+        transport.discord_client(self.target).create_direct_message(
+            user_id=self.user_id, content=self.content, embed=self.embed
+        )
+
+
+class RateLimit:
+    """Rate limit of a Discord channel as reported by Discord in its responses"""
+
+    # seconds to wait after a rate limited response without retry information
+    DEFAULT_RETRY_AFTER = 1
+
+    def __init__(self) -> None:
+        self._blocked_until = 0.0
+
+    def wait(self) -> None:
+        """waits until the channel is no longer rate limited"""
+        delay = self._blocked_until - monotonic()
+        if delay > 0:
+            logger.debug("Waiting %.1f seconds for Discord rate limit", delay)
+            sleep(delay)
+
+    def update(self, response: dhooks_lite.WebhookResponse) -> None:
+        """updates the rate limit from the headers of a response"""
+        headers = (
+            {str(key).lower(): value for key, value in response.headers.items()}
+            if isinstance(response.headers, dict)
+            else {}
+        )
+        if response.status_code == HTTP_TOO_MANY_REQUESTS:
+            delay = _seconds_from_header(headers, "retry-after")
+            if delay is None and isinstance(response.content, dict):
+                delay = _to_seconds(response.content.get("retry_after"))
+            if delay is None:
+                delay = self.DEFAULT_RETRY_AFTER
+        elif _seconds_from_header(headers, "x-ratelimit-remaining") == 0:
+            delay = _seconds_from_header(headers, "x-ratelimit-reset-after")
+        else:
+            delay = None
+        if delay:
+            self._blocked_until = max(self._blocked_until, monotonic() + delay)
+
+
+def _seconds_from_header(headers: dict, name: str) -> Optional[float]:
+    return _to_seconds(headers.get(name))
+
+
+def _to_seconds(value) -> Optional[float]:
+    if not isinstance(value, (str, int, float)):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class NotificationDispatcher:
+    """Sends messages to Discord
+
+    Messages to the same channel are sent one after the other in the order
+    they were added and respect the rate limits reported by Discord for that channel.
+    Messages to different channels are sent in parallel by a bounded pool of threads.
+
+    Messages must be fully prepared before they are added,
+    since they are sent from other threads, which must not access the database.
+
+    When a function for creating digest contents is given, webhook messages
+    added as digest are combined into digests with up to MAX_EMBEDS_PER_MESSAGE
+    embeds and MAX_EMBED_CHARS_PER_MESSAGE characters in embeds per webhook.
+    Remaining embeds overflow into further digests.
+    """
+
+    # max number of retries for a message that was rejected due to rate limits
+    MAX_RETRIES = 3
+
+    def __init__(
+        self,
+        rate_limited: bool = True,
+        max_workers: int = FREIGHT_NOTIFICATIONS_MAX_WORKERS,
+        digest_content: Optional[Callable[[int], str]] = None,
+    ) -> None:
+        self.rate_limited = bool(rate_limited)
+        self.max_workers = max(int(max_workers), 1)
+        self.digest_content = digest_content
+        self._queues = defaultdict(list)
+        self._digests = defaultdict(list)
+
+    def add(self, key: Hashable, message, digest: bool = False) -> None:
+        """adds a message for sending, which is identified by the given key
+
+        digest: whether this webhook message can be combined into a digest
+        """
+        if digest and self.digest_content:
+            self._digests[(message.url, message.username, message.avatar_url)].append(
+                (key, message)
+            )
+        else:
+            self._queues[message.channel].append(((key,), message))
+
+    def run(self) -> Set[Hashable]:
+        """sends all added messages
+
+        Returns the keys of all messages that were sent successfully.
+        """
+        for items in self._digests.values():
+            for keys, message in self._combine_into_digests(items):
+                self._queues[message.channel].append((keys, message))
+        self._digests = defaultdict(list)
+        queues = list(self._queues.values())
+        self._queues = defaultdict(list)
+        if not queues:
+            return set()
+        max_workers = min(self.max_workers, len(queues))
+        with NotificationTransport() as transport, ThreadPoolExecutor(
+            max_workers=max_workers
+        ) as executor:
+            results = list(
+                executor.map(lambda queue: self._send_queue(queue, transport), queues)
+            )
+        return set().union(*results)
+
+    def _combine_into_digests(
+        self, items: List[Tuple[Hashable, WebhookMessage]]
+    ) -> List[Tuple[tuple, WebhookMessage]]:
+        chunks = [[]]
+        embeds_count = 0
+        embeds_chars = 0
+        for key, message in items:
+            message_chars = sum(self._embed_chars(embed) for embed in message.embeds)
+            embeds_count += len(message.embeds)
+            embeds_chars += message_chars
+            if chunks[-1] and (
+                embeds_count > MAX_EMBEDS_PER_MESSAGE
+                or embeds_chars > MAX_EMBED_CHARS_PER_MESSAGE
+            ):
+                chunks.append([])
+                embeds_count = len(message.embeds)
+                embeds_chars = message_chars
+            chunks[-1].append((key, message))
+
+        digests = []
+        for chunk in chunks:
+            keys = tuple(key for key, _ in chunk)
+            if len(chunk) == 1:
+                digests.append((keys, chunk[0][1]))
+                continue
+            first = chunk[0][1]
+            digest = WebhookMessage(
+                url=first.url,
+                username=first.username,
+                avatar_url=first.avatar_url,
+                content=self.digest_content(len(chunk)),
+                embeds=[embed for _, message in chunk for embed in message.embeds],
+            )
+            digests.append((keys, digest))
+        return digests
+
+    @staticmethod
+    def _embed_chars(embed: dhooks_lite.Embed) -> int:
+        """returns number of characters in given embed, which count against the
+        size limit of a message
+        """
+        texts = [embed.title, embed.description]
+        for field in embed.fields or []:
+            texts += [field.name, field.value]
+        if embed.footer:
+            texts.append(embed.footer.text)
+        if embed.author:
+            texts.append(embed.author.name)
+        return sum(len(text) for text in texts if text)
+
+    def _send_queue(
+        self, queue: List[Tuple[tuple, Any]], transport: NotificationTransport
+    ) -> Set[Hashable]:
+        rate_limit = RateLimit()
+        sent_keys = set()
+        for keys, message in queue:
+            if self._send(message, rate_limit, transport):
+                sent_keys.update(keys)
+        return sent_keys
+
+    def _send(
+        self, message, rate_limit: RateLimit, transport: NotificationTransport
+    ) -> bool:
+        for _ in range(self.MAX_RETRIES + 1):
+            if self.rate_limited:
+                rate_limit.wait()
+            try:
+                response = message.send(transport)
+            except Exception as ex:
+                logger.error("Failed to send message to Discord: %s", ex)
+                return False
+            if response is None:
+                return True
+            rate_limit.update(response)
+            if response.status_ok:
+                return True
+            if response.status_code != HTTP_TOO_MANY_REQUESTS:
+                logger.warning(
+                    "Failed to send message. HTTP code: %s", response.status_code
+                )
+                return False
+            logger.info("Message to Discord was rate limited. Retrying.")
+            rate_limit.wait()
+
+        logger.warning("Failed to send message due to Discord rate limits")
+        return False
@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Contract, ContractDailyStatistic, ContractHandler, Pricing
+
+
+@receiver(post_delete, sender=Pricing)
+def pricing_post_delete(sender, instance, **kwargs):
+    """Updates contracts of the route of a deleted pricing"""
+    instance._update_contracts()
+    ContractDailyStatistic.objects.clear_cache()
+
+
+@receiver(post_save, sender=ContractHandler)
+@receiver(post_delete, sender=ContractHandler)
+def contract_handler_changed(sender, **kwargs):
+    """Clears the cached contract handler"""
+    ContractHandler.objects.clear_cache()
+
+
+@receiver(post_delete, sender=ContractHandler)
+def contract_handler_deleted(sender, **kwargs):
+    """Clears the cached pending counts and statistics,
+    since the contracts and their statistics were deleted too
+    """
+    Contract.objects.clear_pending_count_cache()
+    ContractDailyStatistic.objects.clear_cache()
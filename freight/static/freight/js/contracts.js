@@ -1,21 +1,52 @@
-/* creates a dataTable object for a contracts table*/
-function createContractsDataTable(tab_name, view_url) {
+/* returns text with HTML special characters escaped */
+function escapeHtml(text) {
+    return $("<div>").text(text).html().replace(/"/g, "&quot;");
+}
+
+/* returns render function for a location column of raw contract rows */
+function renderLocation(withNotes) {
+    return function (data, type, row) {
+        if (type !== "display") {
+            return data;
+        }
+        const solarSystemName = data.split(" ", 1)[0];
+        let html = `<span class="dotted-underline" title="${escapeHtml(data)}">${escapeHtml(solarSystemName)}</span>`;
+        if (withNotes && row["title"]) {
+            html += ` <i class="far fa-envelope" title="${escapeHtml(row["title"])}"></i>`;
+        }
+        return html;
+    };
+}
+
+/* render function for the pricing check column of raw contract rows */
+function renderPricingCheck(data, type, row) {
+    if (!row["has_pricing"]) {
+        return "-";
+    }
+    if (!row["has_pricing_errors"]) {
+        return `<span class="text-success"><i class="fas fa-check" title="${escapeHtml(row["route_name"])}"></i></span>`;
+    }
+    const tooltipText = [row["route_name"]].concat(row["pricing_issues"]).join("\n");
+    return `<span class="text-danger"><i class="fas fa-exclamation-triangle" title="${escapeHtml(tooltipText)}"></i></span>`;
+}
+
+/* creates a dataTable object for a contracts table
+
+   Contracts are sorted, filtered and paged on the server
+   when an URL for the filter drop down options is given.
+*/
+function createContractsDataTable(tab_name, view_url, fdd_url = null) {
+    const serverSide = fdd_url !== null;
     const DATETIME_FORMAT_2 = "YYYY-MMM-DD HH:mm";
     const columns = [
         { data: "status" },
         {
             data: "start_location",
-            render: {
-                _: "display",
-                sort: "sort",
-            },
+            render: renderLocation(true),
         },
         {
             data: "end_location",
-            render: {
-                _: "display",
-                sort: "sort",
-            },
+            render: renderLocation(false),
         },
         {
             data: "reward",
@@ -29,7 +60,10 @@ function createContractsDataTable(tab_name, view_url) {
             data: "volume",
             render: $.fn.dataTable.render.number(",", ".", 0),
         },
-        { data: "pricing_check" },
+        {
+            data: "pricing_issues",
+            render: renderPricingCheck,
+        },
         {
             data: "date_issued",
             render: $.fn.dataTable.render.moment(moment.ISO_8601, DATETIME_FORMAT_2),
@@ -72,6 +106,9 @@ function createContractsDataTable(tab_name, view_url) {
         bootstrap: true,
         autoSize: false,
     };
+    if (serverSide) {
+        filterDropDown.ajax = fdd_url;
+    }
     const createdRow = function (row, data, dataIndex) {
         if (data["is_in_progress"]) {
             $(row).addClass("info");
@@ -86,7 +123,10 @@ function createContractsDataTable(tab_name, view_url) {
             url: view_url,
             dataSrc: "data",
             cache: false,
+            data: { raw: 1 },
         },
+        serverSide: serverSide,
+        processing: serverSide,
         columns: columns,
         columnDefs: columnDefs,
         order: order,
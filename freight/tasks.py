@@ -1,13 +1,15 @@
 from celery import chain, shared_task
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 
 from allianceauth.services.hooks import get_extension_logger
 from app_utils.logging import LoggerAddTag
 
 from . import __title__
-from .models import Contract, ContractHandler, Location
+from .app_settings import FREIGHT_PRICING_UPDATE_DELAY
+from .models import Contract, ContractHandler, Location, OutboxNotification
 
 logger = LoggerAddTag(get_extension_logger(__name__), __title__)
 
@@ -37,10 +39,30 @@ def update_contracts_esi(force_sync=False, user_pk=None) -> None:
     _get_contract_handler().update_contracts_esi(force_sync, user=_get_user(user_pk))
 
 
+SEND_NOTIFICATIONS_LOCK_KEY = "freight-send-contract-notifications"
+SEND_NOTIFICATIONS_LOCK_TIMEOUT = 3600
+
+
 @shared_task
 def send_contract_notifications(force_sent=False, rate_limited=True) -> None:
-    """Send notification about outstanding contracts that have pricing"""
-    Contract.objects.send_notifications(force_sent, rate_limited)
+    """Send pending notifications from the outbox.
+
+    force_sent: send notifications for all contracts instead,
+    even if they have already been sent
+    """
+    if force_sent:
+        Contract.objects.send_notifications(force_sent, rate_limited)
+        return
+
+    if not cache.add(
+        SEND_NOTIFICATIONS_LOCK_KEY, True, timeout=SEND_NOTIFICATIONS_LOCK_TIMEOUT
+    ):
+        logger.info("Notifications are already being sent")
+        return
+    try:
+        OutboxNotification.objects.send_pending(rate_limited)
+    finally:
+        cache.delete(SEND_NOTIFICATIONS_LOCK_KEY)
 
 
 @shared_task
@@ -60,6 +82,49 @@ def update_contracts_pricing() -> int:
     return update_count
 
 
+def _route_update_lock_key(location_id_1: int, location_id_2: int) -> str:
+    return "freight-update-contracts-pricing-{}-{}".format(location_id_1, location_id_2)
+
+
+def schedule_update_contracts_pricing_for_route(
+    location_id_1: int, location_id_2: int
+) -> None:
+    """Schedules updating pricing for contracts on a route in either direction.
+
+    Repeated calls for the same route are combined into one task,
+    until that task has started.
+    """
+    location_ids = sorted([int(location_id_1), int(location_id_2)])
+    if cache.add(
+        _route_update_lock_key(*location_ids),
+        True,
+        timeout=FREIGHT_PRICING_UPDATE_DELAY + 60,
+    ):
+        update_contracts_pricing_for_route.apply_async(
+            args=location_ids, countdown=FREIGHT_PRICING_UPDATE_DELAY
+        )
+    else:
+        logger.debug("Pricing update for route %s is already scheduled", location_ids)
+
+
+@shared_task
+def update_contracts_pricing_for_route(location_id_1: int, location_id_2: int) -> int:
+    """Updates pricing for contracts on a route in either direction"""
+    cache.delete(_route_update_lock_key(location_id_1, location_id_2))
+    update_count = (
+        Contract.objects.filter_not_completed()
+        .filter_route(location_id_1, location_id_2)
+        .update_pricing()
+    )
+    logger.info(
+        "Updated pricing for %s contracts on route %s - %s",
+        update_count,
+        location_id_1,
+        location_id_2,
+    )
+    return update_count
+
+
 @shared_task
 def update_location(location_id: int) -> None:
     """Updates the location from ESI"""
@@ -63,6 +63,15 @@ class TestContractAdmin(TestCase):
         self.assertEqual(mock_send_customer_notification.call_count, 1)
         self.assertTrue(mock_message_user.called)
 
+    def test_should_clear_pending_count_cache_when_deleting_contracts(self):
+        # given
+        obj_qs = Contract.objects.filter(pk=self.contract.pk)
+        Contract.objects.pending_count_cached()
+        # when
+        self.modeladmin.delete_queryset(MockRequest(self.user), obj_qs)
+        # then
+        self.assertEqual(Contract.objects.pending_count_cached(), 0)
+
     def test_should_open_list(self):
         # given
         self.client.force_login(self.user)
@@ -149,3 +149,36 @@ class TestPricingSave(NoSocketsTestCase):
         # then
         contract_1 = Contract.objects.get(contract_id=149409016)
         self.assertEqual(contract_1.pricing, pricing)
+
+    def test_should_update_contracts_of_previous_route_when_route_changed(self):
+        # given
+        jita = Location.objects.get(id=60003760)
+        amamake = Location.objects.get(id=1022167642188)
+        amarr = Location.objects.get(id=60008494)
+        pricing = Pricing.objects.create(
+            start_location=jita, end_location=amamake, price_base=500000000
+        )
+        # when
+        pricing.end_location = amarr
+        pricing.save()
+        # then
+        contract_1 = Contract.objects.get(contract_id=149409016)
+        self.assertIsNone(contract_1.pricing)
+
+    def test_should_update_contracts_when_pricing_deleted(self):
+        # given
+        jita = Location.objects.get(id=60003760)
+        amamake = Location.objects.get(id=1022167642188)
+        pricing = Pricing.objects.create(
+            start_location=jita,
+            end_location=amamake,
+            price_base=500000000,
+            volume_max=1,
+        )
+        self.assertTrue(Contract.objects.get(contract_id=149409016).issues)
+        # when
+        pricing.delete()
+        # then
+        contract_1 = Contract.objects.get(contract_id=149409016)
+        self.assertIsNone(contract_1.pricing)
+        self.assertEqual(contract_1.issues, 0)
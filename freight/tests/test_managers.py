@@ -1,8 +1,15 @@
 from datetime import datetime, timedelta
+from unittest import skipUnless
 from unittest.mock import Mock, patch
 
 from bravado.exception import HTTPForbidden, HTTPNotFound
+from dhooks_lite import WebhookResponse
 
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import override_settings
 from django.utils.timezone import now, utc
 
 from allianceauth.eveonline.models import EveCharacter, EveCorporationInfo
@@ -18,7 +25,17 @@ from app_utils.testing import (
     generate_invalid_pk,
 )
 
-from freight.models import Contract, EveEntity, Location, Pricing
+from freight.models import (
+    Contract,
+    ContractCustomerNotification,
+    ContractDailyStatistic,
+    ContractHandler,
+    EveEntity,
+    Location,
+    OutboxNotification,
+    Pricing,
+    _embed_cache,
+)
 
 from .testdata.factories import create_pricing
 from .testdata.helpers import (
@@ -117,6 +134,41 @@ class TestEveEntityManager(NoSocketsTestCase):
         with self.assertRaises(ObjectNotFound):
             EveEntity.objects.get_or_create_esi(id=666)
 
+    @patch(MANAGERS_PATH + ".esi")
+    def test_should_get_or_create_entities_in_bulk(self, mock_esi):
+        # given
+        mock_esi.client.Universe.post_universe_names.side_effect = (
+            TestEveEntityManager.esi_post_universe_names
+        )
+        EveEntity.objects.create(
+            id=90000001, name="Bruce Wayne", category=EveEntity.CATEGORY_CHARACTER
+        )
+        # when
+        result = EveEntity.objects.bulk_get_or_create_esi(
+            ids=[90000001, 90000002, 92000001, 666]
+        )
+        # then
+        self.assertSetEqual(set(result.keys()), {90000001, 90000002, 92000001})
+        self.assertTrue(EveEntity.objects.get(id=92000001).is_corporation)
+        self.assertEqual(mock_esi.client.Universe.post_universe_names.call_count, 1)
+        _, kwargs = mock_esi.client.Universe.post_universe_names.call_args
+        self.assertListEqual(kwargs["ids"], [666, 90000002, 92000001])
+
+    @patch(MANAGERS_PATH + ".esi")
+    def test_should_resolve_ids_one_by_one_when_bulk_request_fails(self, mock_esi):
+        # given
+        def post_universe_names(*args, **kwargs):
+            if 666 in kwargs["ids"]:
+                raise RuntimeError("Invalid ID")
+            return TestEveEntityManager.esi_post_universe_names(*args, **kwargs)
+
+        mock_esi.client.Universe.post_universe_names.side_effect = post_universe_names
+        # when
+        result = EveEntity.objects.bulk_get_or_create_esi(ids=[90000001, 666])
+        # then
+        self.assertSetEqual(set(result.keys()), {90000001})
+        self.assertTrue(EveEntity.objects.filter(id=90000001).exists())
+
 
 def get_universe_stations_station_id(*args, **kwargs) -> dict:
     if "station_id" not in kwargs:
@@ -315,6 +367,51 @@ class TestContractQuerySet(NoSocketsTestCase):
         result = Contract.objects.all().pending_count()
         self.assertEqual(result, 6)
 
+    def test_should_return_contracts_issued_by_user(self):
+        # when
+        result = Contract.objects.issued_by_user(self.user)
+        # then
+        expected = set(
+            Contract.objects.filter(
+                issuer__character_ownership__user=self.user
+            ).values_list("contract_id", flat=True)
+        )
+        self.assertTrue(expected)
+        self.assertSetEqual(set(result.values_list("contract_id", flat=True)), expected)
+
+    def test_should_look_up_characters_of_user_once(self):
+        # given
+        user = User.objects.get(pk=self.user.pk)
+        list(Contract.objects.issued_by_user(user))
+        # when
+        with self.assertNumQueries(1):
+            list(Contract.objects.issued_by_user(user))
+
+    @skipUnless("discord" in app_labels(), "requires Discord service")
+    def test_should_load_customer_notification_state_in_bulk(self):
+        # given
+        contract = Contract.objects.get(contract_id=149409016)
+        ContractCustomerNotification.objects.create(
+            contract=contract, status=contract.status, date_notified=now()
+        )
+        # when
+        with self.assertNumQueries(3):
+            state = Contract.objects.all().customer_notification_state()
+        # then
+        self.assertSetEqual(state.notified_statuses[contract.pk], {contract.status})
+        issuer_user = state.issuer_users[contract.issuer_id]
+        self.assertEqual(
+            issuer_user,
+            User.objects.get(character_ownerships__character=contract.issuer),
+        )
+        self.assertEqual(
+            state.discord_uids[issuer_user.pk], contract.issuer.character_id
+        )
+        self.assertSetEqual(
+            set(state.issuer_users.keys()),
+            set(Contract.objects.values_list("issuer_id", flat=True)),
+        )
+
 
 class TestContractManager(NoSocketsTestCase):
     @classmethod
@@ -361,7 +458,7 @@ class TestContractManager(NoSocketsTestCase):
         # when
         result = Contract.objects.update_pricing()
         # then
-        self.assertEqual(result, 7)
+        self.assertEqual(result, 6)
         contract_1 = Contract.objects.get(contract_id=149409016)
         self.assertEqual(contract_1.pricing, pricing_1)
         contract_2 = Contract.objects.get(contract_id=149409061)
@@ -369,6 +466,45 @@ class TestContractManager(NoSocketsTestCase):
         contract_3 = Contract.objects.get(contract_id=149409062)
         self.assertEqual(contract_3.pricing, pricing_3)
 
+    def test_should_not_update_unchanged_contracts(self):
+        # given
+        jita = Location.objects.get(id=60003760)
+        amamake = Location.objects.get(id=1022167642188)
+        create_pricing(
+            start_location=jita,
+            end_location=amamake,
+            price_base=500000000,
+            is_bidirectional=True,
+        )
+        Contract.objects.update_pricing()
+        # when
+        result = Contract.objects.update_pricing()
+        # then
+        self.assertEqual(result, 0)
+
+    def test_should_store_values_of_issues_when_updating_pricing(self):
+        # given
+        jita = Location.objects.get(id=60003760)
+        amamake = Location.objects.get(id=1022167642188)
+        pricing = create_pricing(
+            start_location=jita,
+            end_location=amamake,
+            price_base=500000000,
+            volume_max=1000,
+        )
+        Contract.objects.update_pricing()
+        # when
+        Pricing.objects.filter(pk=pricing.pk).update(volume_max=2000)
+        result = Contract.objects.filter(contract_id=149409016).update_pricing()
+        # then
+        self.assertEqual(result, 1)
+        contract = Contract.objects.get(contract_id=149409016)
+        self.assertEqual(contract.issue_values["volume_max"], 2000)
+        self.assertIn(
+            "exceeds the maximum allowed volume of 2,000 m3",
+            contract.get_issue_list(),
+        )
+
     def test_can_update_pricing_for_unidirectional(self):
         # given
         jita = Location.objects.get(id=60003760)
@@ -466,7 +602,7 @@ class TestContractManagerCreateFromDict(NoSocketsTestCase):
         self.assertEqual(obj.title, "demo contract")
         self.assertEqual(obj.volume, 115000)
         self.assertIsNone(obj.pricing)
-        self.assertIsNone(obj.issues)
+        self.assertEqual(obj.issues, 0)
 
     def test_can_create_in_progress(self):
         contract_dict = {
@@ -522,7 +658,7 @@ class TestContractManagerCreateFromDict(NoSocketsTestCase):
         self.assertEqual(obj.title, "demo contract")
         self.assertEqual(obj.volume, 115000)
         self.assertIsNone(obj.pricing)
-        self.assertIsNone(obj.issues)
+        self.assertEqual(obj.issues, 0)
 
     def test_can_create_finished(self):
         contract_dict = {
@@ -578,7 +714,7 @@ class TestContractManagerCreateFromDict(NoSocketsTestCase):
         self.assertEqual(obj.title, "demo contract")
         self.assertEqual(obj.volume, 115000)
         self.assertIsNone(obj.pricing)
-        self.assertIsNone(obj.issues)
+        self.assertEqual(obj.issues, 0)
 
     def test_raises_exception_on_wrong_date_types(self):
         contract_dict = {
@@ -700,6 +836,213 @@ class TestContractManagerCreateFromDict(NoSocketsTestCase):
         self.assertIsNone(obj.acceptor_corporation)
 
 
+class TestContractManagerBulkUpdateOrCreateFromDicts(NoSocketsTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.handler, cls.user = create_contract_handler_w_contracts([149409016])
+
+    @staticmethod
+    def _contract_dict(**kwargs) -> dict:
+        contract_dict = {
+            "acceptor_id": 0,
+            "assignee_id": 93000001,
+            "availability": "personal",
+            "buyout": None,
+            "collateral": 50000000.0,
+            "contract_id": 149409014,
+            "date_accepted": None,
+            "date_completed": None,
+            "date_expired": datetime(2019, 10, 30, 23, tzinfo=utc),
+            "date_issued": datetime(2019, 10, 2, 23, tzinfo=utc),
+            "days_to_complete": 3,
+            "end_location_id": 1022167642188,
+            "for_corporation": False,
+            "issuer_corporation_id": 92000002,
+            "issuer_id": 90000003,
+            "price": 0.0,
+            "reward": 25000000.0,
+            "start_location_id": 60003760,
+            "status": "outstanding",
+            "title": "demo contract",
+            "type": "courier",
+            "volume": 115000.0,
+        }
+        contract_dict.update(kwargs)
+        return contract_dict
+
+    def test_should_create_new_and_update_existing_contracts(self):
+        # given
+        contracts = [
+            self._contract_dict(contract_id=149409016, status="in_progress"),
+            self._contract_dict(contract_id=149409014),
+        ]
+        # when
+        result = Contract.objects.bulk_update_or_create_from_dicts(
+            self.handler, contracts, Mock()
+        )
+        # then
+        self.assertTrue(result)
+        self.assertEqual(
+            Contract.objects.get(contract_id=149409016).status,
+            Contract.Status.IN_PROGRESS,
+        )
+        obj = Contract.objects.get(contract_id=149409014)
+        self.assertEqual(obj.handler, self.handler)
+        self.assertEqual(obj.issuer, EveCharacter.objects.get(character_id=90000003))
+        self.assertEqual(obj.title, "demo contract")
+        self.assertEqual(Contract.objects.count(), 2)
+
+    def test_should_store_valid_contracts_when_one_fails(self):
+        # given
+        contracts = [
+            self._contract_dict(contract_id=149409014),
+            self._contract_dict(contract_id=149409015, date_issued="invalid"),
+        ]
+        # when
+        result = Contract.objects.bulk_update_or_create_from_dicts(
+            self.handler, contracts, Mock()
+        )
+        # then
+        self.assertFalse(result)
+        self.assertTrue(Contract.objects.filter(contract_id=149409014).exists())
+        self.assertFalse(Contract.objects.filter(contract_id=149409015).exists())
+
+    def test_should_store_valid_contracts_when_writing_one_fails(self):
+        # given
+        contracts = [
+            self._contract_dict(contract_id=149409020),
+            self._contract_dict(contract_id=149409021, volume=None),
+            self._contract_dict(contract_id=149409022),
+            self._contract_dict(contract_id=149409023),
+        ]
+        # when
+        result = Contract.objects.bulk_update_or_create_from_dicts(
+            self.handler, contracts, Mock(), batch_size=2
+        )
+        # then
+        self.assertFalse(result)
+        self.assertSetEqual(
+            set(
+                Contract.objects.filter(handler=self.handler).values_list(
+                    "contract_id", flat=True
+                )
+            ),
+            {149409016, 149409020, 149409022, 149409023},
+        )
+
+    def test_should_store_valid_contracts_when_one_has_invalid_ids(self):
+        for property_name in ["acceptor_id", "issuer_id", "start_location_id"]:
+            with self.subTest(property_name=property_name):
+                # given
+                Contract.objects.filter(contract_id__in=[149409014, 149409015]).delete()
+                contracts = [
+                    self._contract_dict(contract_id=149409014),
+                    self._contract_dict(
+                        contract_id=149409015, **{property_name: "invalid"}
+                    ),
+                ]
+                # when
+                result = Contract.objects.bulk_update_or_create_from_dicts(
+                    self.handler, contracts, Mock()
+                )
+                # then
+                self.assertFalse(result)
+                self.assertTrue(Contract.objects.filter(contract_id=149409014).exists())
+                self.assertFalse(
+                    Contract.objects.filter(contract_id=149409015).exists()
+                )
+
+    def test_should_write_in_batches(self):
+        # given
+        contracts = [
+            self._contract_dict(contract_id=149409020 + num) for num in range(3)
+        ]
+        # when
+        result = Contract.objects.bulk_update_or_create_from_dicts(
+            self.handler, contracts, Mock(), batch_size=1
+        )
+        # then
+        self.assertTrue(result)
+        self.assertEqual(Contract.objects.count(), 4)
+
+    @patch(MANAGERS_PATH + ".LocationManager.get_or_create_esi")
+    def test_should_fetch_from_esi_outside_of_transactions(
+        self, mock_get_or_create_esi
+    ):
+        # given
+        atomic_depth = len(connection.savepoint_ids)
+        depths_during_fetch = []
+
+        def get_or_create_esi(token, location_id):
+            depths_during_fetch.append(len(connection.savepoint_ids))
+            return Location.objects.get(id=60003760), False
+
+        mock_get_or_create_esi.side_effect = get_or_create_esi
+        contracts = [
+            self._contract_dict(contract_id=149409014, end_location_id=60000001)
+        ]
+        # when
+        result = Contract.objects.bulk_update_or_create_from_dicts(
+            self.handler, contracts, Mock()
+        )
+        # then
+        self.assertTrue(result)
+        self.assertListEqual(depths_during_fetch, [atomic_depth])
+        self.assertTrue(Contract.objects.filter(contract_id=149409014).exists())
+
+    @patch(MANAGERS_PATH + ".LocationManager.get_or_create_esi")
+    def test_should_skip_contracts_with_unknown_location(self, mock_get_or_create_esi):
+        # given
+        mock_get_or_create_esi.side_effect = RuntimeError
+        contracts = [
+            self._contract_dict(contract_id=149409014),
+            self._contract_dict(contract_id=149409015, end_location_id=60000001),
+        ]
+        # when
+        result = Contract.objects.bulk_update_or_create_from_dicts(
+            self.handler, contracts, Mock()
+        )
+        # then
+        self.assertFalse(result)
+        self.assertTrue(Contract.objects.filter(contract_id=149409014).exists())
+        self.assertFalse(Contract.objects.filter(contract_id=149409015).exists())
+
+    @patch(MANAGERS_PATH + ".EveCharacter.objects.create_character")
+    def test_should_create_unknown_acceptor_once(self, mock_create_character):
+        # given
+        def create_character(character_id):
+            return EveCharacter.objects.create(
+                character_id=character_id,
+                character_name="Dummy",
+                corporation_id=92000002,
+                corporation_name="The Planet",
+            )
+
+        mock_create_character.side_effect = create_character
+        EveEntity.objects.create(
+            id=90000987, name="Dummy", category=EveEntity.CATEGORY_CHARACTER
+        )
+        contracts = [
+            self._contract_dict(
+                contract_id=149409020 + num,
+                acceptor_id=90000987,
+                status="in_progress",
+            )
+            for num in range(3)
+        ]
+        # when
+        result = Contract.objects.bulk_update_or_create_from_dicts(
+            self.handler, contracts, Mock()
+        )
+        # then
+        self.assertTrue(result)
+        self.assertEqual(mock_create_character.call_count, 1)
+        self.assertEqual(
+            Contract.objects.filter(acceptor__character_id=90000987).count(), 3
+        )
+
+
 if "discord" in app_labels():
 
     @patch(MODELS_PATH + ".FREIGHT_HOURS_UNTIL_STALE_STATUS", 48)
@@ -716,6 +1059,9 @@ if "discord" in app_labels():
             )
             Contract.objects.update_pricing()
 
+        def setUp(self) -> None:
+            _embed_cache.clear()
+
         @patch(MANAGERS_PATH + ".FREIGHT_DISCORD_WEBHOOK_URL", "url")
         @patch(MANAGERS_PATH + ".FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL", None)
         @patch(MANAGERS_PATH + ".FREIGHT_NOTIFY_ALL_CONTRACTS", False)
@@ -726,6 +1072,28 @@ if "discord" in app_labels():
             Contract.objects.send_notifications(rate_limited=False)
             self.assertEqual(mock_webhook_execute.call_count, 8)
 
+        @patch(MANAGERS_PATH + ".FREIGHT_DISCORD_WEBHOOK_URL", "url")
+        @patch(MANAGERS_PATH + ".FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL", None)
+        @patch(MANAGERS_PATH + ".FREIGHT_NOTIFY_ALL_CONTRACTS", False)
+        @patch(MANAGERS_PATH + ".FREIGHT_DISCORD_PILOT_DIGEST", True)
+        @patch(MODELS_PATH + ".FREIGHT_DISCORD_WEBHOOK_URL", "url")
+        @patch(MODELS_PATH + ".FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL", None)
+        @patch(MODELS_PATH + ".FREIGHT_DISCORDPROXY_ENABLED", False)
+        @patch(MODELS_PATH + ".FREIGHT_DISCORD_SIEGE_GREEN_WEBHOOK_URL", None)
+        def test_send_pilot_notifications_as_digest(self, mock_webhook_execute):
+            Contract.objects.send_notifications(rate_limited=False)
+            self.assertEqual(mock_webhook_execute.call_count, 1)
+            _, kwargs = mock_webhook_execute.call_args
+            self.assertEqual(len(kwargs["embeds"]), 8)
+            self.assertIn("There are 8 new courier contracts", kwargs["content"])
+            self.assertFalse(
+                Contract.objects.filter(
+                    status=Contract.Status.OUTSTANDING,
+                    pricing__isnull=False,
+                    date_notified__isnull=True,
+                ).exists()
+            )
+
         @patch(MANAGERS_PATH + ".FREIGHT_DISCORD_WEBHOOK_URL", "url")
         @patch(MANAGERS_PATH + ".FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL", None)
         @patch(MANAGERS_PATH + ".FREIGHT_NOTIFY_ALL_CONTRACTS", True)
@@ -888,6 +1256,248 @@ if "discord" in app_labels():
             self.assertEqual(mock_webhook_execute.call_count, 0)
 
 
+@patch(MANAGERS_PATH + ".FREIGHT_DISCORD_WEBHOOK_URL", "url")
+@patch(MANAGERS_PATH + ".FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL", None)
+@patch(MANAGERS_PATH + ".FREIGHT_DISCORDPROXY_ENABLED", False)
+@patch(MANAGERS_PATH + ".FREIGHT_NOTIFY_ALL_CONTRACTS", False)
+@patch(MODELS_PATH + ".FREIGHT_DISCORD_WEBHOOK_URL", "url")
+@patch(MODELS_PATH + ".FREIGHT_DISCORD_SIEGE_GREEN_WEBHOOK_URL", None)
+@patch(MODELS_PATH + ".dhooks_lite.Webhook.execute", autospec=True)
+class TestOutboxNotificationManager(NoSocketsTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.handler, _ = create_contract_handler_w_contracts()
+        jita = Location.objects.get(id=60003760)
+        amamake = Location.objects.get(id=1022167642188)
+        create_pricing(start_location=jita, end_location=amamake, price_base=500000000)
+        Contract.objects.update_pricing()
+
+    def setUp(self) -> None:
+        _embed_cache.clear()
+        self.contract = Contract.objects.filter(
+            status=Contract.Status.OUTSTANDING, pricing__isnull=False
+        ).first()
+        self.contract.date_notified = None
+        self.contract.save()
+        OutboxNotification.objects.all().delete()
+
+    def test_should_add_pilot_notification_for_outstanding_contract(
+        self, mock_webhook_execute
+    ):
+        # when
+        result = OutboxNotification.objects.enqueue_for_contracts(
+            Contract.objects.filter(pk=self.contract.pk)
+        )
+        # then
+        self.assertEqual(result, 1)
+        obj = OutboxNotification.objects.get(contract=self.contract)
+        self.assertEqual(obj.channel, OutboxNotification.Channel.PILOT)
+        self.assertEqual(obj.status, Contract.Status.OUTSTANDING)
+
+    def test_should_not_add_notification_for_expired_contract(
+        self, mock_webhook_execute
+    ):
+        # given
+        self.contract.date_expired = now() - timedelta(hours=1)
+        self.contract.save()
+        # when
+        result = OutboxNotification.objects.enqueue_for_contracts(
+            Contract.objects.filter(pk=self.contract.pk)
+        )
+        # then
+        self.assertEqual(result, 0)
+        self.assertFalse(OutboxNotification.objects.exists())
+
+    def test_should_add_pilot_notification_when_contract_receives_pricing(
+        self, mock_webhook_execute
+    ):
+        # given
+        self.contract.pricing = None
+        self.contract.save()
+        # when
+        Contract.objects.filter(pk=self.contract.pk).update_pricing()
+        # then
+        obj = OutboxNotification.objects.get(contract=self.contract)
+        self.assertEqual(obj.channel, OutboxNotification.Channel.PILOT)
+
+    def test_should_add_customer_notification_when_contract_receives_pricing(
+        self, mock_webhook_execute
+    ):
+        # given
+        self.contract.pricing = None
+        self.contract.save()
+        # when
+        with patch(MANAGERS_PATH + ".FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL", "url"):
+            Contract.objects.filter(pk=self.contract.pk).update_pricing()
+        # then
+        self.assertSetEqual(
+            set(
+                OutboxNotification.objects.filter(contract=self.contract).values_list(
+                    "channel", flat=True
+                )
+            ),
+            {OutboxNotification.Channel.PILOT, OutboxNotification.Channel.CUSTOMER},
+        )
+
+    def test_should_send_pending_notification(self, mock_webhook_execute):
+        # given
+        OutboxNotification.objects.enqueue_for_contracts(
+            Contract.objects.filter(pk=self.contract.pk)
+        )
+        # when
+        result = OutboxNotification.objects.send_pending(rate_limited=False)
+        # then
+        self.assertEqual(result, 1)
+        self.assertEqual(mock_webhook_execute.call_count, 1)
+        self.contract.refresh_from_db()
+        self.assertIsNotNone(self.contract.date_notified)
+        self.assertFalse(OutboxNotification.objects.exists())
+
+    def test_should_retry_failed_notification_later(self, mock_webhook_execute):
+        # given
+        mock_webhook_execute.return_value = WebhookResponse(headers={}, status_code=500)
+        OutboxNotification.objects.enqueue_for_contracts(
+            Contract.objects.filter(pk=self.contract.pk)
+        )
+        # when
+        result_1 = OutboxNotification.objects.send_pending(rate_limited=False)
+        result_2 = OutboxNotification.objects.send_pending(rate_limited=False)
+        # then
+        self.assertEqual(result_1, 0)
+        self.assertEqual(result_2, 0)
+        self.assertEqual(mock_webhook_execute.call_count, 1)
+        obj = OutboxNotification.objects.get(contract=self.contract)
+        self.assertEqual(obj.attempts, 1)
+        self.assertGreater(obj.next_attempt_at, now())
+        self.contract.refresh_from_db()
+        self.assertIsNone(self.contract.date_notified)
+
+    def test_should_back_off_exponentially(self, mock_webhook_execute):
+        # given
+        mock_webhook_execute.return_value = WebhookResponse(headers={}, status_code=500)
+        OutboxNotification.objects.create(
+            contract=self.contract,
+            channel=OutboxNotification.Channel.PILOT,
+            status=Contract.Status.OUTSTANDING,
+            attempts=2,
+            next_attempt_at=now(),
+        )
+        # when
+        OutboxNotification.objects.send_pending(rate_limited=False)
+        # then
+        obj = OutboxNotification.objects.get(contract=self.contract)
+        self.assertEqual(obj.attempts, 3)
+        delay = (obj.next_attempt_at - now()).total_seconds()
+        self.assertAlmostEqual(
+            delay, OutboxNotification.objects.RETRY_BASE_DELAY * 4, delta=5
+        )
+
+    def test_should_drop_notification_after_max_attempts(self, mock_webhook_execute):
+        # given
+        mock_webhook_execute.return_value = WebhookResponse(headers={}, status_code=500)
+        OutboxNotification.objects.create(
+            contract=self.contract,
+            channel=OutboxNotification.Channel.PILOT,
+            status=Contract.Status.OUTSTANDING,
+            attempts=OutboxNotification.objects.MAX_ATTEMPTS - 1,
+            next_attempt_at=now(),
+        )
+        # when
+        OutboxNotification.objects.send_pending(rate_limited=False)
+        # then
+        self.assertFalse(OutboxNotification.objects.exists())
+
+    def test_should_drop_notification_when_status_has_changed(
+        self, mock_webhook_execute
+    ):
+        # given
+        OutboxNotification.objects.enqueue_for_contracts(
+            Contract.objects.filter(pk=self.contract.pk)
+        )
+        self.contract.status = Contract.Status.IN_PROGRESS
+        self.contract.save()
+        # when
+        result = OutboxNotification.objects.send_pending(rate_limited=False)
+        # then
+        self.assertEqual(result, 0)
+        self.assertEqual(mock_webhook_execute.call_count, 0)
+        self.assertFalse(OutboxNotification.objects.exists())
+
+    def test_should_add_notifications_for_contracts_with_new_status_from_sync(
+        self, mock_webhook_execute
+    ):
+        # given
+        contract_dict = {
+            "acceptor_id": 0,
+            "assignee_id": 93000001,
+            "availability": "personal",
+            "buyout": None,
+            "collateral": 50000000.0,
+            "contract_id": 149409099,
+            "date_accepted": None,
+            "date_completed": None,
+            "date_expired": now() + timedelta(days=3),
+            "date_issued": now() - timedelta(hours=1),
+            "days_to_complete": 3,
+            "end_location_id": 1022167642188,
+            "for_corporation": False,
+            "issuer_corporation_id": 92000002,
+            "issuer_id": 90000003,
+            "price": 0.0,
+            "reward": 25000000.0,
+            "start_location_id": 60003760,
+            "status": "outstanding",
+            "title": "demo contract",
+            "type": "courier",
+            "volume": 115000.0,
+        }
+        # when
+        Contract.objects.bulk_update_or_create_from_dicts(
+            self.handler, [contract_dict], Mock()
+        )
+        # then
+        obj = OutboxNotification.objects.get(contract__contract_id=149409099)
+        self.assertEqual(obj.channel, OutboxNotification.Channel.PILOT)
+
+    def test_should_not_add_notifications_for_contracts_with_same_status_from_sync(
+        self, mock_webhook_execute
+    ):
+        # given
+        contract = Contract.objects.get(pk=self.contract.pk)
+        contract_dict = {
+            "acceptor_id": 0,
+            "assignee_id": 93000001,
+            "availability": "personal",
+            "buyout": None,
+            "collateral": contract.collateral,
+            "contract_id": contract.contract_id,
+            "date_accepted": None,
+            "date_completed": None,
+            "date_expired": contract.date_expired,
+            "date_issued": contract.date_issued,
+            "days_to_complete": 3,
+            "end_location_id": contract.end_location_id,
+            "for_corporation": False,
+            "issuer_corporation_id": contract.issuer_corporation.corporation_id,
+            "issuer_id": contract.issuer.character_id,
+            "price": 0.0,
+            "reward": contract.reward,
+            "start_location_id": contract.start_location_id,
+            "status": "outstanding",
+            "title": "changed",
+            "type": "courier",
+            "volume": contract.volume,
+        }
+        # when
+        Contract.objects.bulk_update_or_create_from_dicts(
+            self.handler, [contract_dict], Mock()
+        )
+        # then
+        self.assertFalse(OutboxNotification.objects.exists())
+
+
+@override_settings(CELERY_ALWAYS_EAGER=True, CELERY_EAGER_PROPAGATES_EXCEPTIONS=True)
 class TestPricingManager(NoSocketsTestCase):
     @classmethod
     def setUpClass(cls):
@@ -935,3 +1545,196 @@ class TestPricingManager(NoSocketsTestCase):
     def test_get_or_default_with_none(self):
         expected = self.p1
         self.assertEqual(Pricing.objects.get_or_default(None), expected)
+
+
+class TestContractHandlerManager(NoSocketsTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.handler, _ = create_contract_handler_w_contracts([149409016])
+
+    def setUp(self) -> None:
+        ContractHandler.objects.clear_cache()
+
+    def test_should_return_handler_from_cache(self):
+        # given
+        ContractHandler.objects.get_cached()
+        # when
+        with self.assertNumQueries(0):
+            handler = ContractHandler.objects.get_cached()
+            organization_name = handler.organization.name
+        # then
+        self.assertEqual(handler, self.handler)
+        self.assertEqual(organization_name, self.handler.organization.name)
+
+    def test_should_clear_cache_when_handler_is_saved(self):
+        # given
+        ContractHandler.objects.get_cached()
+        self.handler.price_per_volume_modifier = 2.5
+        # when
+        self.handler.save()
+        # then
+        handler = ContractHandler.objects.get_cached()
+        self.assertEqual(handler.price_per_volume_modifier, 2.5)
+
+    def test_should_price_without_queries(self):
+        # given
+        pricing = create_pricing(
+            start_location=Location.objects.get(id=60003760),
+            end_location=Location.objects.get(id=1022167642188),
+            price_per_volume=100,
+            use_price_per_volume_modifier=True,
+        )
+        ContractHandler.objects.get_cached()
+        # when
+        with self.assertNumQueries(0):
+            pricing.get_calculated_price(volume=1000, collateral=0)
+            pricing.get_contract_price_check_issues(volume=1000, collateral=0)
+
+
+class TestContractManagerPendingCountCached(NoSocketsTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.handler, cls.user = create_contract_handler_w_contracts(
+            [149409016, 149409061, 149409062, 149409063, 149409064, 149409006]
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_should_return_pending_count(self):
+        # when
+        result = Contract.objects.pending_count_cached()
+        # then
+        self.assertEqual(result, Contract.objects.all().pending_count())
+
+    def test_should_return_pending_count_for_user(self):
+        # given
+        user_2 = AuthUtils.create_user("Lex Luthor")
+        # when
+        result_1 = Contract.objects.pending_count_cached(user=self.user)
+        result_2 = Contract.objects.pending_count_cached(user=user_2)
+        # then
+        self.assertEqual(
+            result_1, Contract.objects.issued_by_user(self.user).pending_count()
+        )
+        self.assertEqual(result_2, 0)
+
+    def test_should_return_count_from_cache(self):
+        # given
+        expected = Contract.objects.pending_count_cached()
+        # when
+        with self.assertNumQueries(0):
+            result = Contract.objects.pending_count_cached()
+        # then
+        self.assertEqual(result, expected)
+
+    def test_should_return_new_count_after_contracts_are_stored(self):
+        # given
+        Contract.objects.pending_count_cached()
+        contract = Contract.objects.filter(status=Contract.Status.OUTSTANDING).first()
+        contract_dict = {
+            "acceptor_id": 0,
+            "assignee_id": 93000001,
+            "availability": "personal",
+            "buyout": None,
+            "collateral": contract.collateral,
+            "contract_id": contract.contract_id,
+            "date_accepted": None,
+            "date_completed": None,
+            "date_expired": contract.date_expired,
+            "date_issued": contract.date_issued,
+            "days_to_complete": 3,
+            "end_location_id": contract.end_location_id,
+            "for_corporation": False,
+            "issuer_corporation_id": contract.issuer_corporation.corporation_id,
+            "issuer_id": contract.issuer.character_id,
+            "price": 0.0,
+            "reward": contract.reward,
+            "start_location_id": contract.start_location_id,
+            "status": "deleted",
+            "title": "",
+            "type": "courier",
+            "volume": contract.volume,
+        }
+        # when
+        Contract.objects.bulk_update_or_create_from_dicts(
+            self.handler, [contract_dict], Mock()
+        )
+        # then
+        self.assertEqual(
+            Contract.objects.pending_count_cached(),
+            Contract.objects.all().pending_count(),
+        )
+
+    def test_should_return_new_count_after_contract_handler_is_deleted(self):
+        # given
+        Contract.objects.pending_count_cached()
+        # when
+        ContractHandler.objects.all().delete()
+        # then
+        self.assertEqual(Contract.objects.pending_count_cached(), 0)
+
+
+class TestContractDailyStatisticManager(NoSocketsTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.handler, _ = create_contract_handler_w_contracts()
+        cls.finished_contracts = Contract.objects.filter(
+            status=Contract.Status.FINISHED
+        )
+
+    def test_should_create_statistics_for_finished_contracts(self):
+        # when
+        ContractDailyStatistic.objects.update_for_contracts(Contract.objects.all())
+        # then
+        totals = ContractDailyStatistic.objects.aggregate(
+            contracts=Sum("contracts"), rewards=Sum("rewards"), volume=Sum("volume")
+        )
+        expected = self.finished_contracts.aggregate(
+            contracts=Count("id"), rewards=Sum("reward"), volume=Sum("volume")
+        )
+        self.assertDictEqual(totals, expected)
+
+    def test_should_replace_statistics_when_updated_again(self):
+        # given
+        ContractDailyStatistic.objects.update_for_contracts(Contract.objects.all())
+        expected = ContractDailyStatistic.objects.count()
+        # when
+        ContractDailyStatistic.objects.update_for_contracts(Contract.objects.all())
+        # then
+        self.assertEqual(ContractDailyStatistic.objects.count(), expected)
+        self.assertEqual(
+            ContractDailyStatistic.objects.aggregate(Sum("contracts"))[
+                "contracts__sum"
+            ],
+            self.finished_contracts.count(),
+        )
+
+    def test_should_ignore_contracts_not_finished(self):
+        # when
+        ContractDailyStatistic.objects.update_for_contracts(
+            Contract.objects.exclude(status=Contract.Status.FINISHED)
+        )
+        # then
+        self.assertFalse(ContractDailyStatistic.objects.exists())
+
+    def test_should_update_statistics_when_pricing_of_contracts_changes(self):
+        # given
+        ContractDailyStatistic.objects.update_for_contracts(Contract.objects.all())
+        pricing = create_pricing(
+            start_location=Location.objects.get(id=60003760),
+            end_location=Location.objects.get(id=1022167642188),
+            price_base=500000000,
+        )
+        # when
+        Contract.objects.update_pricing()
+        # then
+        self.assertEqual(
+            ContractDailyStatistic.objects.filter(pricing=pricing).aggregate(
+                Sum("contracts")
+            )["contracts__sum"],
+            self.finished_contracts.filter(pricing=pricing).count(),
+        )
@@ -1,10 +1,13 @@
 import datetime as dt
+from unittest import skipUnless
 from unittest.mock import Mock, patch
 
 from dhooks_lite import Embed
 
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now
 from esi.errors import TokenExpiredError, TokenInvalidError
 from esi.models import Token
@@ -26,11 +29,13 @@ from freight.app_settings import (
 from freight.models import (
     Contract,
     ContractCustomerNotification,
+    ContractDailyStatistic,
     ContractHandler,
     EveEntity,
     Freight,
     Location,
     Pricing,
+    _embed_cache,
 )
 
 from .testdata.factories import create_pricing
@@ -360,6 +365,50 @@ class TestPricing(NoSocketsTestCase):
         with self.assertRaises(ValidationError):
             p.clean()
 
+    def test_should_calculate_prices_in_bulk_like_single_prices(self):
+        # given
+        p = Pricing(price_base=20, price_per_volume=50, price_per_collateral_percent=2)
+        volumes = [10, None, 0, 1234.5]
+        collaterals = [1000, 500, None, 99999]
+        # when
+        result = p.get_calculated_prices(volumes, collaterals)
+        # then
+        expected = [
+            p.get_calculated_price(volume, collateral)
+            for volume, collateral in zip(volumes, collaterals)
+        ]
+        self.assertListEqual(result, expected)
+
+    def test_should_return_price_checks_as_bit_flags(self):
+        # given
+        p = Pricing(price_base=500, volume_max=100, collateral_min=1000)
+        # when
+        prices, issues = p.get_contract_price_checks(
+            volumes=[50, 200, None],
+            collaterals=[2000, 500, None],
+            rewards=[500, 400, None],
+        )
+        # then
+        self.assertListEqual(prices, [500, 500, 500])
+        self.assertListEqual(
+            issues,
+            [
+                0,
+                Pricing.ISSUE_VOLUME_ABOVE_MAX
+                | Pricing.ISSUE_COLLATERAL_BELOW_MIN
+                | Pricing.ISSUE_REWARD_BELOW_PRICE,
+                0,
+            ],
+        )
+        self.assertListEqual(
+            p.issue_messages(issues[1], prices[1]),
+            [
+                "exceeds the maximum allowed volume of 100 m3",
+                "below the minimum required collateral of 1,000 ISK",
+                "reward is below the calculated price of 500 ISK",
+            ],
+        )
+
     def test_is_fix_price(self):
         self.assertTrue(Pricing(price_base=50000000).is_fix_price())
         self.assertFalse(
@@ -497,6 +546,7 @@ class TestContract(NoSocketsTestCase):
         )
 
     def setUp(self):
+        _embed_cache.clear()
         # create contracts
         self.pricing = create_pricing(
             start_location=self.jita, end_location=self.amamake, price_base=500000000
@@ -569,8 +619,37 @@ class TestContract(NoSocketsTestCase):
 
     def test_get_issues_list(self):
         self.assertListEqual(self.contract.get_issue_list(), [])
-        self.contract.issues = '["one", "two"]'
-        self.assertListEqual(self.contract.get_issue_list(), ["one", "two"])
+        self.contract.pricing.volume_max = 1000
+        self.contract.issues = (
+            Pricing.ISSUE_VOLUME_ABOVE_MAX | Pricing.ISSUE_REWARD_BELOW_PRICE
+        )
+        price = self.contract.pricing.get_calculated_price(
+            self.contract.volume, self.contract.collateral
+        )
+        self.contract.issue_values = self.contract.pricing.issue_values(
+            self.contract.issues, price
+        )
+        self.assertListEqual(
+            self.contract.get_issue_list(),
+            [
+                "exceeds the maximum allowed volume of 1,000 m3",
+                "reward is below the calculated price of {:,.0f} ISK".format(price),
+            ],
+        )
+
+    def test_get_issues_list_should_show_values_from_time_of_check(self):
+        # given
+        self.contract.issues = Pricing.ISSUE_VOLUME_ABOVE_MAX
+        self.contract.issue_values = {"volume_max": 1000}
+        # when
+        self.contract.pricing.volume_max = 2000
+        self.contract.pricing = None
+        # then
+        self.assertTrue(self.contract.has_pricing_errors)
+        self.assertListEqual(
+            self.contract.get_issue_list(),
+            ["exceeds the maximum allowed volume of 1,000 m3"],
+        )
 
     def test_generate_embed_w_pricing(self):
         x = self.contract._generate_embed()
@@ -578,7 +657,7 @@ class TestContract(NoSocketsTestCase):
         self.assertEqual(x.color, Contract.EMBED_COLOR_PASSED)
 
     def test_generate_embed_w_pricing_issues(self):
-        self.contract.issues = ["we have issues"]
+        self.contract.issues = Pricing.ISSUE_VOLUME_ABOVE_MAX
         x = self.contract._generate_embed()
         self.assertIsInstance(x, Embed)
         self.assertEqual(x.color, Contract.EMBED_COLOR_FAILED)
@@ -588,6 +667,49 @@ class TestContract(NoSocketsTestCase):
         x = self.contract._generate_embed()
         self.assertIsInstance(x, Embed)
 
+    @patch(MODULE_PATH + ".FREIGHT_DISCORD_SIEGE_GREEN_WEBHOOK_URL", None)
+    def test_generate_embed_should_reuse_rendered_embed(self):
+        # given
+        first = self.contract._generate_embed()
+        contract = Contract.objects.get(pk=self.contract.pk)
+        # when
+        second = contract._generate_embed()
+        # then
+        self.assertIs(first, second)
+
+    @patch(MODULE_PATH + ".FREIGHT_DISCORD_SIEGE_GREEN_WEBHOOK_URL", None)
+    def test_generate_embed_should_render_again_when_content_changed(self):
+        # given
+        first = self.contract._generate_embed()
+        self.contract.status = Contract.Status.IN_PROGRESS
+        # when
+        second = self.contract._generate_embed()
+        # then
+        self.assertIsNot(first, second)
+        self.assertIn("IN_PROGRESS", second.title)
+
+    @patch(MODULE_PATH + ".FREIGHT_DISCORD_SIEGE_GREEN_WEBHOOK_URL", None)
+    def test_generate_embed_should_render_again_when_issuer_was_renamed(self):
+        # given
+        self.contract._generate_embed()
+        EveCharacter.objects.filter(pk=self.contract.issuer.pk).update(
+            character_name="Dick Grayson"
+        )
+        contract = Contract.objects.get(pk=self.contract.pk)
+        # when
+        embed = contract._generate_embed()
+        # then
+        self.assertEqual(embed.author.name, "Dick Grayson")
+        self.assertIn("Dick Grayson", embed.description)
+
+    @patch(MODULE_PATH + ".FREIGHT_DISCORD_SIEGE_GREEN_WEBHOOK_URL", None)
+    def test_generate_embed_should_differ_for_issuer(self):
+        # when
+        embed_pilot = self.contract._generate_embed()
+        embed_issuer = self.contract._generate_embed(for_issuer=True)
+        # then
+        self.assertNotEqual(embed_pilot.url, embed_issuer.url)
+
 
 @patch(MODULE_PATH + ".dhooks_lite.Webhook.execute", spec=True)
 class TestContractSendPilotNotification(NoSocketsTestCase):
@@ -597,6 +719,9 @@ class TestContractSendPilotNotification(NoSocketsTestCase):
         cls.handler, _ = create_contract_handler_w_contracts()
         cls.contract = Contract.objects.get(contract_id=149409005)
 
+    def setUp(self) -> None:
+        _embed_cache.clear()
+
     @patch(MODULE_PATH + ".FREIGHT_DISCORD_WEBHOOK_URL", None)
     def test_aborts_without_webhook_url(self, mock_webhook_execute):
         mock_webhook_execute.return_value.status_ok = True
@@ -731,11 +856,10 @@ if DiscordUser:
 
         @patch(MODULE_PATH + ".FREIGHT_DISCORDPROXY_ENABLED", False)
         @patch(MODULE_PATH + ".FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL", "url")
-        @patch(MODULE_PATH + ".User.objects")
-        def test_aborts_without_issuer(self, mock_objects, mock_webhook_execute):
+        def test_aborts_without_issuer(self, mock_webhook_execute):
             # given
             mock_webhook_execute.return_value.status_ok = True
-            mock_objects.filter.return_value.first.return_value = None
+            CharacterOwnership.objects.filter(character=self.contract_1.issuer).delete()
             # when
             self.contract_1.send_customer_notification()
             # then
@@ -817,11 +941,12 @@ if DiscordUser:
 
         @patch(MODULE_PATH + ".FREIGHT_DISCORDPROXY_ENABLED", False)
         @patch(MODULE_PATH + ".FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL", "url")
-        @patch(MODULE_PATH + ".DiscordUser.objects")
-        def test_aborts_without_Discord_user(self, mock_objects, mock_webhook_execute):
+        def test_aborts_without_Discord_user(self, mock_webhook_execute):
             # given
             mock_webhook_execute.return_value.status_ok = True
-            mock_objects.get.side_effect = DiscordUser.DoesNotExist
+            DiscordUser.objects.filter(
+                user__character_ownerships__character=self.contract_1.issuer
+            ).delete()
             # when
             self.contract_1.send_customer_notification()
             # then
@@ -846,7 +971,7 @@ if DiscordUser and DiscordClient:
 
         @patch(MODULE_PATH + ".FREIGHT_DISCORDPROXY_ENABLED", True)
         @patch(MODULE_PATH + ".FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL", None)
-        @patch(MODULE_PATH + ".DiscordClient", spec=True)
+        @patch("freight.notifications.PooledDiscordClient", spec=True)
         def test_can_send_status_via_grpc(self, mock_DiscordClient):
             # when
             self.contract_1.send_customer_notification()
@@ -863,7 +988,7 @@ if DiscordUser and DiscordClient:
 
         @patch(MODULE_PATH + ".FREIGHT_DISCORDPROXY_ENABLED", True)
         @patch(MODULE_PATH + ".FREIGHT_DISCORD_CUSTOMERS_WEBHOOK_URL", None)
-        @patch(MODULE_PATH + ".DiscordClient", spec=True)
+        @patch("freight.notifications.PooledDiscordClient", spec=True)
         def test_can_handle_grpc_error(self, mock_DiscordClient):
             # given
             my_exception = to_discord_proxy_exception(create_rpc_error())
@@ -1123,21 +1248,16 @@ class TestContractsSync(NoSocketsTestCase):
         return BravadoOperationStub(contracts_data)
 
     @patch(PATCH_FREIGHT_OPERATION_MODE, FREIGHT_OPERATION_MODE_MY_ALLIANCE)
-    @patch(MODULE_PATH + ".Contract.objects.update_or_create_from_dict")
+    @patch("freight.managers.ContractManagerBase._defaults_from_dict")
     @patch(MODULE_PATH + ".Token")
     @patch(MODULE_PATH + ".esi")
     def test_abort_when_exception_occurs_during_contract_creation(
         self,
         mock_esi,
         mock_Token,
-        mock_Contracts_objects_update_or_create_from_dict,
+        mock_defaults_from_dict,
     ):
-        def func_Contracts_objects_update_or_create_from_dict(*args, **kwargs):
-            raise RuntimeError("Test exception")
-
-        mock_Contracts_objects_update_or_create_from_dict.side_effect = (
-            func_Contracts_objects_update_or_create_from_dict
-        )
+        mock_defaults_from_dict.side_effect = RuntimeError("Test exception")
         mock_Contracts = mock_esi.client.Contracts
         mock_Contracts.get_corporations_corporation_id_contracts.side_effect = (
             self.esi_get_corporations_corporation_id_contracts
@@ -1159,6 +1279,7 @@ class TestContractsSync(NoSocketsTestCase):
 
         handler.refresh_from_db()
         self.assertEqual(handler.last_error, ContractHandler.ERROR_UNKNOWN)
+        self.assertIsNone(handler.version_hash)
 
     @patch(PATCH_FREIGHT_OPERATION_MODE, FREIGHT_OPERATION_MODE_MY_ALLIANCE)
     @patch(MODULE_PATH + ".Token")
@@ -1197,17 +1318,122 @@ class TestContractsSync(NoSocketsTestCase):
             contract_ids, [149409005, 149409014, 149409006, 149409015]
         )
 
-        # 2nd run should not update anything, but reset last_sync
-        Contract.objects.all().delete()
+        # 2nd run should not update unchanged contracts, but reset last_sync
+        Contract.objects.update(title="dummy")
         handler.last_sync = None
         handler.last_error = ContractHandler.ERROR_UNKNOWN
         handler.save()
         self.assertTrue(handler.update_contracts_esi())
-        self.assertEqual(Contract.objects.count(), 0)
+        self.assertFalse(Contract.objects.exclude(title="dummy").exists())
         handler.refresh_from_db()
         self.assertEqual(handler.last_error, ContractHandler.ERROR_NONE)
         self.assertIsNotNone(handler.last_sync)
 
+    @patch(PATCH_FREIGHT_OPERATION_MODE, FREIGHT_OPERATION_MODE_MY_ALLIANCE)
+    @patch(MODULE_PATH + ".Token")
+    @patch(MODULE_PATH + ".esi")
+    def test_should_store_changed_contracts_only(self, mock_esi, mock_Token):
+        # given
+        mock_Contracts = mock_esi.client.Contracts
+        mock_Contracts.get_corporations_corporation_id_contracts.side_effect = (
+            self.esi_get_corporations_corporation_id_contracts
+        )
+        mock_Token.objects.filter.return_value.require_scopes.return_value.require_valid.return_value.first.return_value = Mock(
+            spec=Token
+        )
+        self.user = AuthUtils.add_permission_to_user_by_name(
+            "freight.setup_contract_handler", self.user
+        )
+        handler = ContractHandler.objects.create(
+            organization=self.alliance,
+            character=self.main_ownership,
+            operation_mode=FREIGHT_OPERATION_MODE_MY_ALLIANCE,
+        )
+        self.assertTrue(handler.update_contracts_esi())
+        Contract.objects.update(title="dummy")
+        Contract.objects.filter(contract_id=149409005).update(version_hash="")
+        Contract.objects.filter(contract_id=149409014).delete()
+        # when
+        self.assertTrue(handler.update_contracts_esi())
+        # then
+        changed_ids = Contract.objects.exclude(title="dummy").values_list(
+            "contract_id", flat=True
+        )
+        self.assertCountEqual(changed_ids, [149409005, 149409014])
+        handler.refresh_from_db()
+        self.assertEqual(handler.last_error, ContractHandler.ERROR_NONE)
+
+    @patch(PATCH_FREIGHT_OPERATION_MODE, FREIGHT_OPERATION_MODE_MY_ALLIANCE)
+    @patch(MODULE_PATH + ".Token")
+    @patch(MODULE_PATH + ".esi")
+    def test_should_skip_sync_when_all_contracts_are_unchanged(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        mock_Contracts = mock_esi.client.Contracts
+        mock_Contracts.get_corporations_corporation_id_contracts.side_effect = (
+            self.esi_get_corporations_corporation_id_contracts
+        )
+        mock_Token.objects.filter.return_value.require_scopes.return_value.require_valid.return_value.first.return_value = Mock(
+            spec=Token
+        )
+        self.user = AuthUtils.add_permission_to_user_by_name(
+            "freight.setup_contract_handler", self.user
+        )
+        handler = ContractHandler.objects.create(
+            organization=self.alliance,
+            character=self.main_ownership,
+            operation_mode=FREIGHT_OPERATION_MODE_MY_ALLIANCE,
+        )
+        self.assertTrue(handler.update_contracts_esi())
+        handler.refresh_from_db()
+        self.assertIsNotNone(handler.version_hash)
+        Contract.objects.update(title="dummy", version_hash="")
+        # when
+        self.assertTrue(handler.update_contracts_esi())
+        # then
+        self.assertFalse(Contract.objects.exclude(title="dummy").exists())
+        handler.refresh_from_db()
+        self.assertEqual(handler.last_error, ContractHandler.ERROR_NONE)
+
+    @patch(PATCH_FREIGHT_OPERATION_MODE, FREIGHT_OPERATION_MODE_MY_CORPORATION)
+    @patch(MODULE_PATH + ".Token")
+    @patch(MODULE_PATH + ".esi")
+    def test_should_update_contracts_with_unresolved_acceptor(
+        self, mock_esi, mock_Token
+    ):
+        # given
+        mock_Contracts = mock_esi.client.Contracts
+        mock_Contracts.get_corporations_corporation_id_contracts.side_effect = (
+            self.esi_get_corporations_corporation_id_contracts
+        )
+        mock_Token.objects.filter.return_value.require_scopes.return_value.require_valid.return_value.first.return_value = Mock(
+            spec=Token
+        )
+        self.user = AuthUtils.add_permission_to_user_by_name(
+            "freight.setup_contract_handler", self.user
+        )
+        handler = ContractHandler.objects.create(
+            organization=self.corporation,
+            character=self.main_ownership,
+            operation_mode=FREIGHT_OPERATION_MODE_MY_CORPORATION,
+        )
+        self.assertTrue(handler.update_contracts_esi())
+        contract = Contract.objects.filter(acceptor__isnull=False).first()
+        Contract.objects.update(title="dummy")
+        Contract.objects.filter(pk=contract.pk).update(
+            acceptor=None, acceptor_corporation=None
+        )
+        # when
+        self.assertTrue(handler.update_contracts_esi())
+        # then
+        changed_ids = Contract.objects.exclude(title="dummy").values_list(
+            "contract_id", flat=True
+        )
+        self.assertListEqual(list(changed_ids), [contract.contract_id])
+        contract.refresh_from_db()
+        self.assertIsNotNone(contract.acceptor)
+
     @patch(PATCH_FREIGHT_OPERATION_MODE, FREIGHT_OPERATION_MODE_MY_CORPORATION)
     @patch(MODULE_PATH + ".notify")
     @patch(MODULE_PATH + ".Token")
@@ -1394,6 +1620,39 @@ class TestContractsSync(NoSocketsTestCase):
         handler.refresh_from_db()
         self.assertEqual(handler.last_error, ContractHandler.ERROR_UNKNOWN)
 
+    @patch(MODULE_PATH + ".esi")
+    def test_should_fetch_affiliations_of_unknown_characters_in_bulk(self, mock_esi):
+        # given
+        mock_esi.client.Character.post_characters_affiliation.return_value = (
+            BravadoOperationStub(
+                [
+                    {"character_id": 90000998, "corporation_id": 92000001},
+                    {
+                        "character_id": 90000999,
+                        "corporation_id": 92000002,
+                        "alliance_id": 93000001,
+                    },
+                ]
+            )
+        )
+        # when
+        result = ContractHandler._fetch_character_affiliations(
+            {90000001, 90000998, 90000999}
+        )
+        # then
+        self.assertDictEqual(
+            result,
+            {
+                90000001: (92000001, 93000001),
+                90000998: (92000001, None),
+                90000999: (92000002, 93000001),
+            },
+        )
+        mock_esi.client.Character.post_characters_affiliation.assert_called_once_with(
+            characters=[90000998, 90000999]
+        )
+        self.assertFalse(EveCharacter.objects.filter(character_id=90000999).exists())
+
     @patch(PATCH_FREIGHT_OPERATION_MODE, FREIGHT_OPERATION_MODE_MY_ALLIANCE)
     def test_operation_mode_friendly(self):
         handler = ContractHandler.objects.create(
@@ -1521,6 +1780,7 @@ class TestContractCustomerNotification(NoSocketsTestCase):
         )
 
     def setUp(self):
+        _embed_cache.clear()
         # create contracts
         self.pricing = create_pricing(
             start_location=self.location_1,
@@ -1581,3 +1841,62 @@ class TestFreight(NoSocketsTestCase):
             Freight.category_for_operation_mode(FREIGHT_OPERATION_MODE_CORP_PUBLIC),
             EveEntity.CATEGORY_CORPORATION,
         )
+
+
+@skipUnless(
+    connection.vendor in {"sqlite", "mysql"}, "query plans for SQLite and MySQL only"
+)
+class TestContractIndexes(NoSocketsTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        _, cls.user = create_contract_handler_w_contracts()
+
+    def assertUsesIndex(self, qs, index_name: str):
+        self.assertIn(index_name, qs.explain())
+
+    def assertQueriesUseIndex(self, func, index_name: str):
+        """asserts that one of the queries run by func uses the given index"""
+        with CaptureQueriesContext(connection) as context:
+            func()
+        plans = list()
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                if not query["sql"].startswith("SELECT"):
+                    continue
+                cursor.execute(
+                    "{} {}".format(connection.ops.explain_query_prefix(), query["sql"])
+                )
+                plans.append(str(cursor.fetchall()))
+        self.assertTrue(
+            any(index_name in plan for plan in plans),
+            f"No query uses {index_name}: {plans}",
+        )
+
+    def test_pending_count_uses_index(self):
+        self.assertQueriesUseIndex(
+            Contract.objects.all().pending_count, "freight_contract_pending_idx"
+        )
+
+    @patch("freight.managers.FREIGHT_DISCORD_WEBHOOK_URL", "url")
+    @patch("freight.managers.FREIGHT_NOTIFY_ALL_CONTRACTS", False)
+    @patch("freight.managers.ContractQuerySet.sent_pilot_notifications")
+    def test_pilot_notifications_use_index(self, mock_sent_pilot_notifications):
+        self.assertQueriesUseIndex(
+            lambda: Contract.objects._sent_pilot_notifications(
+                force_sent=False, rate_limited=False
+            ),
+            "freight_contract_notify_idx",
+        )
+
+    def test_finished_contracts_for_statistics_use_index(self):
+        self.assertQueriesUseIndex(
+            lambda: ContractDailyStatistic.objects.update_days([now().date()]),
+            "freight_contract_completed_idx",
+        )
+
+    def test_contracts_issued_by_user_use_index(self):
+        qs = Contract.objects.issued_by_user(self.user).filter(
+            status=Contract.Status.OUTSTANDING
+        )
+        self.assertUsesIndex(qs, "freight_contract_issuer_idx")
@@ -0,0 +1,459 @@
+from unittest import skipIf
+from unittest.mock import Mock, patch
+
+from dhooks_lite import Embed, Webhook, WebhookResponse
+
+from app_utils.testing import NoSocketsTestCase
+
+from freight.notifications import (
+    DISCORDPROXY_REQUEST_TIMEOUT,
+    MAX_EMBED_CHARS_PER_MESSAGE,
+    WEBHOOK_REQUEST_TIMEOUT,
+    DirectMessage,
+    NotificationDispatcher,
+    NotificationTransport,
+    PooledDiscordClient,
+    PooledWebhook,
+    RateLimit,
+    RenderCache,
+    WebhookMessage,
+    _supports_pooled_webhook,
+    grpc,
+)
+
+MODULE_PATH = "freight.notifications"
+
+
+def create_webhook_message(url="https://www.example.com/hook", content="content"):
+    return WebhookMessage(
+        url=url, username=None, avatar_url=None, content=content, embeds=[]
+    )
+
+
+def ok_response():
+    return WebhookResponse(headers={}, status_code=200)
+
+
+class TestRenderCache(NoSocketsTestCase):
+    def test_should_render_item_once(self):
+        # given
+        cache = RenderCache(max_size=10)
+        render = Mock(return_value="rendered")
+        # when
+        first = cache.get_or_render("key", render)
+        second = cache.get_or_render("key", render)
+        # then
+        self.assertEqual(first, "rendered")
+        self.assertEqual(second, "rendered")
+        self.assertEqual(render.call_count, 1)
+
+    def test_should_evict_least_recently_used_item(self):
+        # given
+        cache = RenderCache(max_size=2)
+        cache.get_or_render("a", lambda: 1)
+        cache.get_or_render("b", lambda: 2)
+        cache.get_or_render("a", lambda: 1)
+        # when
+        cache.get_or_render("c", lambda: 3)
+        # then
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get_or_render("a", lambda: 99), 1)
+        self.assertEqual(cache.get_or_render("b", lambda: 99), 99)
+
+    def test_should_clear_items(self):
+        # given
+        cache = RenderCache(max_size=10)
+        cache.get_or_render("a", lambda: 1)
+        # when
+        cache.clear()
+        # then
+        self.assertEqual(len(cache), 0)
+
+
+@patch(MODULE_PATH + ".sleep")
+class TestRateLimit(NoSocketsTestCase):
+    def test_should_not_wait_by_default(self, mock_sleep):
+        # given
+        rate_limit = RateLimit()
+        # when
+        rate_limit.wait()
+        # then
+        self.assertFalse(mock_sleep.called)
+
+    def test_should_wait_for_retry_after_when_rate_limited(self, mock_sleep):
+        # given
+        rate_limit = RateLimit()
+        response = WebhookResponse(headers={"Retry-After": "2.5"}, status_code=429)
+        # when
+        rate_limit.update(response)
+        rate_limit.wait()
+        # then
+        self.assertAlmostEqual(mock_sleep.call_args[0][0], 2.5, places=1)
+
+    def test_should_wait_for_retry_after_from_content(self, mock_sleep):
+        # given
+        rate_limit = RateLimit()
+        response = WebhookResponse(
+            headers={}, status_code=429, content={"retry_after": 3}
+        )
+        # when
+        rate_limit.update(response)
+        rate_limit.wait()
+        # then
+        self.assertAlmostEqual(mock_sleep.call_args[0][0], 3, places=1)
+
+    def test_should_wait_for_reset_when_no_requests_remaining(self, mock_sleep):
+        # given
+        rate_limit = RateLimit()
+        response = WebhookResponse(
+            headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "1.5"},
+            status_code=204,
+        )
+        # when
+        rate_limit.update(response)
+        rate_limit.wait()
+        # then
+        self.assertAlmostEqual(mock_sleep.call_args[0][0], 1.5, places=1)
+
+    def test_should_not_wait_when_requests_remaining(self, mock_sleep):
+        # given
+        rate_limit = RateLimit()
+        response = WebhookResponse(
+            headers={"X-RateLimit-Remaining": "4", "X-RateLimit-Reset-After": "1.5"},
+            status_code=204,
+        )
+        # when
+        rate_limit.update(response)
+        rate_limit.wait()
+        # then
+        self.assertFalse(mock_sleep.called)
+
+
+class TestNotificationTransport(NoSocketsTestCase):
+    def test_should_support_pooled_webhook_with_installed_dhooks_lite(self):
+        # fails when dhooks-lite changes how it sends requests to webhooks
+        self.assertTrue(_supports_pooled_webhook())
+
+    def test_should_return_pooled_webhook(self):
+        # given
+        with NotificationTransport() as transport:
+            # when
+            hook = transport.webhook("https://www.example.com/hook-1", "Bot", None)
+        # then
+        self.assertIsInstance(hook, PooledWebhook)
+        self.assertEqual(hook.username, "Bot")
+
+    @patch(MODULE_PATH + ".NotificationTransport.USE_POOLED_WEBHOOK", False)
+    def test_should_return_normal_webhook_when_pooling_is_not_supported(self):
+        # given
+        with NotificationTransport() as transport:
+            # when
+            hook = transport.webhook("https://www.example.com/hook-1", None, None)
+        # then
+        self.assertNotIsInstance(hook, PooledWebhook)
+        self.assertIsInstance(hook, Webhook)
+
+    @patch(MODULE_PATH + ".PooledDiscordClient")
+    def test_should_reuse_discord_client_for_same_target(
+        self, mock_PooledDiscordClient
+    ):
+        # given
+        mock_PooledDiscordClient.side_effect = lambda target: Mock()
+        with NotificationTransport() as transport:
+            # when
+            client_1 = transport.discord_client("localhost:50051")
+            client_2 = transport.discord_client("localhost:50051")
+            client_3 = transport.discord_client("localhost:50052")
+            # then
+            self.assertIs(client_1, client_2)
+            self.assertIsNot(client_1, client_3)
+
+    @patch(MODULE_PATH + ".PooledDiscordClient")
+    def test_should_close_all_connections(self, mock_PooledDiscordClient):
+        # given
+        transport = NotificationTransport()
+        client = transport.discord_client("localhost:50051")
+        # when
+        transport.close()
+        # then
+        self.assertTrue(client.close.called)
+
+    @patch(MODULE_PATH + "._webhook_session.post")
+    def test_should_send_webhook_request_with_session(self, mock_post):
+        # given
+        mock_post.return_value.ok = True
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.headers = {}
+        mock_post.return_value.json.return_value = {"id": "1"}
+        with NotificationTransport() as transport:
+            hook = transport.webhook("https://www.example.com/hook", None, None)
+            # when
+            response = hook.execute(content="test", wait_for_response=True)
+        # then
+        self.assertEqual(response.status_code, 200)
+        _, kwargs = mock_post.call_args
+        self.assertEqual(kwargs["url"], "https://www.example.com/hook")
+        self.assertIn('"content": "test"', kwargs["data"])
+        self.assertEqual(kwargs["timeout"], WEBHOOK_REQUEST_TIMEOUT)
+
+
+@skipIf(grpc is None, "Discord Proxy not installed")
+@patch(MODULE_PATH + ".DiscordApiStub")
+@patch(MODULE_PATH + ".grpc")
+class TestPooledDiscordClient(NoSocketsTestCase):
+    def test_should_send_direct_message_with_timeout(
+        self, mock_grpc, mock_DiscordApiStub
+    ):
+        # given
+        client = PooledDiscordClient("localhost:50051")
+        # when
+        client.create_direct_message(user_id=1001, content="test")
+        # then
+        _, kwargs = mock_DiscordApiStub.return_value.SendDirectMessage.call_args
+        self.assertEqual(kwargs["timeout"], DISCORDPROXY_REQUEST_TIMEOUT)
+        self.assertEqual(kwargs["request"].user_id, 1001)
+
+    def test_should_keep_channel_open_until_closed(
+        self, mock_grpc, mock_DiscordApiStub
+    ):
+        # given
+        client = PooledDiscordClient("localhost:50051")
+        client.create_direct_message(user_id=1001, content="test 1")
+        client.create_direct_message(user_id=1001, content="test 2")
+        # when
+        client.close()
+        # then
+        self.assertEqual(mock_grpc.insecure_channel.call_count, 1)
+        self.assertTrue(mock_grpc.insecure_channel.return_value.close.called)
+
+
+@patch(MODULE_PATH + ".sleep")
+@patch(MODULE_PATH + ".dhooks_lite.Webhook.execute", autospec=True)
+class TestNotificationDispatcher(NoSocketsTestCase):
+    def test_should_send_messages_to_all_channels(self, mock_execute, mock_sleep):
+        # given
+        mock_execute.return_value = ok_response()
+        dispatcher = NotificationDispatcher(max_workers=2)
+        dispatcher.add(1, create_webhook_message("https://www.example.com/hook-1"))
+        dispatcher.add(2, create_webhook_message("https://www.example.com/hook-2"))
+        dispatcher.add(
+            3,
+            DirectMessage(
+                target="localhost:50051", user_id=42, content="x", embed=None
+            ),
+        )
+        # when
+        with patch(MODULE_PATH + ".PooledDiscordClient") as mock_PooledDiscordClient:
+            result = dispatcher.run()
+        # then
+        self.assertSetEqual(result, {1, 2, 3})
+        self.assertEqual(mock_execute.call_count, 2)
+        client = mock_PooledDiscordClient.return_value
+        self.assertEqual(client.create_direct_message.call_count, 1)
+        self.assertTrue(client.close.called)
+        self.assertFalse(mock_sleep.called)
+
+    def test_should_send_messages_to_same_channel_in_order(
+        self, mock_execute, mock_sleep
+    ):
+        # given
+        mock_execute.return_value = ok_response()
+        dispatcher = NotificationDispatcher()
+        for num in range(3):
+            dispatcher.add(num, create_webhook_message(content=str(num)))
+        # when
+        result = dispatcher.run()
+        # then
+        self.assertSetEqual(result, {0, 1, 2})
+        contents = [
+            call_args[1]["content"] for call_args in mock_execute.call_args_list
+        ]
+        self.assertListEqual(contents, ["0", "1", "2"])
+
+    def test_should_retry_after_rate_limited_response(self, mock_execute, mock_sleep):
+        # given
+        mock_execute.side_effect = [
+            WebhookResponse(headers={"Retry-After": "2"}, status_code=429),
+            ok_response(),
+        ]
+        dispatcher = NotificationDispatcher()
+        dispatcher.add(1, create_webhook_message())
+        # when
+        result = dispatcher.run()
+        # then
+        self.assertSetEqual(result, {1})
+        self.assertEqual(mock_execute.call_count, 2)
+        self.assertTrue(mock_sleep.called)
+
+    def test_should_give_up_after_max_retries(self, mock_execute, mock_sleep):
+        # given
+        mock_execute.return_value = WebhookResponse(
+            headers={"Retry-After": "1"}, status_code=429
+        )
+        dispatcher = NotificationDispatcher()
+        dispatcher.add(1, create_webhook_message())
+        # when
+        result = dispatcher.run()
+        # then
+        self.assertSetEqual(result, set())
+        self.assertEqual(
+            mock_execute.call_count, NotificationDispatcher.MAX_RETRIES + 1
+        )
+
+    def test_should_report_failed_messages(self, mock_execute, mock_sleep):
+        # given
+        def execute(hook, **kwargs):
+            if hook.url.endswith("1"):
+                return WebhookResponse(headers={}, status_code=404)
+            if hook.url.endswith("2"):
+                raise OSError("Test")
+            return ok_response()
+
+        mock_execute.side_effect = execute
+        dispatcher = NotificationDispatcher()
+        dispatcher.add(1, create_webhook_message("https://www.example.com/hook-1"))
+        dispatcher.add(2, create_webhook_message("https://www.example.com/hook-2"))
+        dispatcher.add(3, create_webhook_message("https://www.example.com/hook-3"))
+        # when
+        result = dispatcher.run()
+        # then
+        self.assertSetEqual(result, {3})
+
+    def test_should_wait_proactively_when_rate_limited(self, mock_execute, mock_sleep):
+        # given
+        mock_execute.side_effect = [
+            WebhookResponse(
+                headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "2"},
+                status_code=200,
+            ),
+            ok_response(),
+        ]
+        dispatcher = NotificationDispatcher(rate_limited=True)
+        dispatcher.add(1, create_webhook_message())
+        dispatcher.add(2, create_webhook_message())
+        # when
+        dispatcher.run()
+        # then
+        self.assertEqual(mock_sleep.call_count, 1)
+
+    def test_should_not_wait_proactively_when_not_rate_limited(
+        self, mock_execute, mock_sleep
+    ):
+        # given
+        mock_execute.side_effect = [
+            WebhookResponse(
+                headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "2"},
+                status_code=200,
+            ),
+            ok_response(),
+        ]
+        dispatcher = NotificationDispatcher(rate_limited=False)
+        dispatcher.add(1, create_webhook_message())
+        dispatcher.add(2, create_webhook_message())
+        # when
+        dispatcher.run()
+        # then
+        self.assertFalse(mock_sleep.called)
+
+    def test_should_combine_messages_into_digests(self, mock_execute, mock_sleep):
+        # given
+        mock_execute.return_value = ok_response()
+        dispatcher = NotificationDispatcher(
+            digest_content=lambda count: f"{count} contracts"
+        )
+        for num in range(12):
+            message = create_webhook_message(content=str(num))._replace(
+                embeds=[Embed(description=str(num))]
+            )
+            dispatcher.add(num, message, digest=True)
+        # when
+        result = dispatcher.run()
+        # then
+        self.assertSetEqual(result, set(range(12)))
+        self.assertEqual(mock_execute.call_count, 2)
+        first_kwargs = mock_execute.call_args_list[0][1]
+        self.assertEqual(first_kwargs["content"], "10 contracts")
+        self.assertEqual(len(first_kwargs["embeds"]), 10)
+        second_kwargs = mock_execute.call_args_list[1][1]
+        self.assertEqual(second_kwargs["content"], "2 contracts")
+        self.assertListEqual(
+            [embed.description for embed in second_kwargs["embeds"]], ["10", "11"]
+        )
+
+    def test_should_split_digests_by_size_of_embeds(self, mock_execute, mock_sleep):
+        # given
+        mock_execute.return_value = ok_response()
+        dispatcher = NotificationDispatcher(
+            digest_content=lambda count: f"{count} contracts"
+        )
+        description = "x" * (MAX_EMBED_CHARS_PER_MESSAGE // 3)
+        for num in range(4):
+            message = create_webhook_message()._replace(
+                embeds=[Embed(title=str(num), description=description)]
+            )
+            dispatcher.add(num, message, digest=True)
+        # when
+        result = dispatcher.run()
+        # then
+        self.assertSetEqual(result, set(range(4)))
+        self.assertEqual(mock_execute.call_count, 2)
+        first_kwargs = mock_execute.call_args_list[0][1]
+        self.assertEqual(first_kwargs["content"], "2 contracts")
+        self.assertListEqual(
+            [embed.title for embed in first_kwargs["embeds"]], ["0", "1"]
+        )
+        second_kwargs = mock_execute.call_args_list[1][1]
+        self.assertListEqual(
+            [embed.title for embed in second_kwargs["embeds"]], ["2", "3"]
+        )
+
+    def test_should_keep_single_message_when_combining_into_digests(
+        self, mock_execute, mock_sleep
+    ):
+        # given
+        mock_execute.return_value = ok_response()
+        dispatcher = NotificationDispatcher(
+            digest_content=lambda count: f"{count} contracts"
+        )
+        dispatcher.add(1, create_webhook_message(content="single"), digest=True)
+        # when
+        dispatcher.run()
+        # then
+        self.assertEqual(mock_execute.call_args[1]["content"], "single")
+
+    def test_should_not_combine_messages_without_digest_content(
+        self, mock_execute, mock_sleep
+    ):
+        # given
+        mock_execute.return_value = ok_response()
+        dispatcher = NotificationDispatcher()
+        for num in range(3):
+            dispatcher.add(num, create_webhook_message(), digest=True)
+        # when
+        dispatcher.run()
+        # then
+        self.assertEqual(mock_execute.call_count, 3)
+
+    def test_should_report_all_keys_of_failed_digest(self, mock_execute, mock_sleep):
+        # given
+        mock_execute.return_value = WebhookResponse(headers={}, status_code=400)
+        dispatcher = NotificationDispatcher(
+            digest_content=lambda count: f"{count} contracts"
+        )
+        for num in range(3):
+            dispatcher.add(num, create_webhook_message(), digest=True)
+        # when
+        result = dispatcher.run()
+        # then
+        self.assertSetEqual(result, set())
+        self.assertEqual(mock_execute.call_count, 1)
+
+    def test_should_return_empty_set_when_nothing_to_send(
+        self, mock_execute, mock_sleep
+    ):
+        # given
+        dispatcher = NotificationDispatcher()
+        # when
+        result = dispatcher.run()
+        # then
+        self.assertSetEqual(result, set())
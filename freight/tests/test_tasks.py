@@ -1,21 +1,27 @@
 from unittest.mock import patch
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.test import override_settings
 from esi.errors import TokenInvalidError
 
 from app_utils.testing import NoSocketsTestCase, generate_invalid_pk
 
+from freight.models import Contract
 from freight.tasks import (
+    SEND_NOTIFICATIONS_LOCK_KEY,
     run_contracts_sync,
+    schedule_update_contracts_pricing_for_route,
     send_contract_notifications,
     update_contracts_esi,
     update_contracts_pricing,
+    update_contracts_pricing_for_route,
     update_location,
     update_locations,
 )
 
+from .testdata.factories import create_pricing
 from .testdata.helpers import create_contract_handler_w_contracts
 
 MODULE_PATH = "freight.tasks"
@@ -61,11 +67,30 @@ class TestUpdateContractsEsi(NoSocketsTestCase):
         self.assertIsNone(kwargs["user"])
 
 
+@patch(MODULE_PATH + ".OutboxNotification.objects.send_pending")
 @patch(MODULE_PATH + ".Contract.objects.send_notifications")
 class TestSendContractNotifications(NoSocketsTestCase):
-    def test_normal_run(self, mock_send_notifications):
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_normal_run(self, mock_send_notifications, mock_send_pending):
         send_contract_notifications()
+        self.assertTrue(mock_send_pending.called)
+        self.assertFalse(mock_send_notifications.called)
+
+    def test_should_send_for_all_contracts_when_forced(
+        self, mock_send_notifications, mock_send_pending
+    ):
+        send_contract_notifications(force_sent=True)
         self.assertTrue(mock_send_notifications.called)
+        self.assertFalse(mock_send_pending.called)
+
+    def test_should_not_run_when_already_running(
+        self, mock_send_notifications, mock_send_pending
+    ):
+        cache.set(SEND_NOTIFICATIONS_LOCK_KEY, True)
+        send_contract_notifications()
+        self.assertFalse(mock_send_pending.called)
 
 
 @override_settings(CELERY_ALWAYS_EAGER=True, CELERY_EAGER_PROPAGATES_EXCEPTIONS=True)
@@ -81,13 +106,58 @@ class TestRunContractsSync(NoSocketsTestCase):
 
 
 class TestUpdateContractsPricing(NoSocketsTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+
     def test_normal_run(self):
         # given
         create_contract_handler_w_contracts([149409016])
+        contract = Contract.objects.get(contract_id=149409016)
+        create_pricing(
+            start_location=contract.start_location,
+            end_location=contract.end_location,
+        )
         # when
         result = update_contracts_pricing()
         # then
         self.assertEqual(result, 1)
+        contract.refresh_from_db()
+        self.assertIsNotNone(contract.pricing)
+
+    @patch(MODULE_PATH + ".update_contracts_pricing_for_route")
+    def test_should_combine_repeated_updates_for_same_route(self, mock_task):
+        # when
+        schedule_update_contracts_pricing_for_route(60003760, 1022167642188)
+        schedule_update_contracts_pricing_for_route(1022167642188, 60003760)
+        # then
+        self.assertEqual(mock_task.apply_async.call_count, 1)
+        _, kwargs = mock_task.apply_async.call_args
+        self.assertListEqual(kwargs["args"], [60003760, 1022167642188])
+
+    def test_should_update_contracts_of_route_only(self):
+        # given
+        create_contract_handler_w_contracts([149409016, 149409062])
+        contract = Contract.objects.get(contract_id=149409016)
+        for obj in Contract.objects.all():
+            create_pricing(
+                start_location=obj.start_location, end_location=obj.end_location
+            )
+        # when
+        result = update_contracts_pricing_for_route(
+            contract.end_location_id, contract.start_location_id
+        )
+        # then
+        self.assertEqual(result, 1)
+        contract.refresh_from_db()
+        self.assertIsNotNone(contract.pricing)
+
+    def test_should_not_count_unchanged_contracts(self):
+        # given
+        create_contract_handler_w_contracts([149409016])
+        # when
+        result = update_contracts_pricing()
+        # then
+        self.assertEqual(result, 0)
 
 
 @override_settings(CELERY_ALWAYS_EAGER=True, CELERY_EAGER_PROPAGATES_EXCEPTIONS=True)
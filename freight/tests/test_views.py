@@ -1,9 +1,15 @@
+import datetime
+import json
 from http import HTTPStatus
 from unittest.mock import Mock, patch
 
+from django.contrib.admin.sites import AdminSite
 from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.db.models import Q
 from django.test import RequestFactory, TestCase
 from django.urls import reverse
+from django.utils.timezone import localdate
 from esi.models import Token
 
 from allianceauth.eveonline.models import EveCharacter
@@ -11,11 +17,12 @@ from allianceauth.tests.auth_utils import AuthUtils
 from app_utils.testing import NoSocketsTestCase, add_new_token, json_response_to_python
 
 from freight import constants, views
+from freight.admin import ContractAdmin
 from freight.app_settings import (
     FREIGHT_OPERATION_MODE_MY_ALLIANCE,
     FREIGHT_OPERATION_MODE_MY_CORPORATION,
 )
-from freight.models import Contract, ContractHandler, Location
+from freight.models import Contract, ContractDailyStatistic, ContractHandler, Location
 
 from .testdata.factories import create_pricing
 from .testdata.helpers import create_contract_handler_w_contracts
@@ -23,6 +30,10 @@ from .testdata.helpers import create_contract_handler_w_contracts
 MODULE_PATH = "freight.views"
 
 
+def streaming_json_response_to_python(response):
+    return json.loads(b"".join(response.streaming_content).decode("utf-8"))
+
+
 def json_response_to_python_dict(response) -> dict:
     return {x["id"]: x for x in json_response_to_python(response)["data"]}
 
@@ -56,6 +67,73 @@ class TestCalculator(NoSocketsTestCase):
         response = views.calculator(request)
         self.assertEqual(response.status_code, HTTPStatus.OK)
 
+    def test_should_return_quotes_for_many_cargos(self):
+        # given
+        pricing = create_pricing(
+            start_location=Location.objects.get(id=60008494),
+            end_location=Location.objects.get(id=1022167642188),
+            price_base=50000000,
+            price_per_volume=150,
+            volume_max=320000,
+        )
+        data = {
+            "pricing": pricing.pk,
+            "cargos": [
+                {"volume": 1000, "collateral": 0},
+                {"volume": 400000, "collateral": 1000000000},
+            ],
+        }
+        request = self.factory.post(
+            reverse("freight:calculator_quotes"),
+            data=data,
+            content_type="application/json",
+        )
+        request.user = self.user
+        # when
+        response = views.calculator_quotes(request)
+        # then
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        quotes = json_response_to_python(response)["quotes"]
+        self.assertEqual(quotes[0]["price"], 51000000)
+        self.assertListEqual(quotes[0]["issues"], [])
+        self.assertEqual(quotes[1]["price"], 110000000)
+        self.assertListEqual(
+            quotes[1]["issues"],
+            ["exceeds the maximum allowed volume of 320,000 m3"],
+        )
+
+    def test_should_reject_invalid_quote_request(self):
+        # given
+        request = self.factory.post(
+            reverse("freight:calculator_quotes"),
+            data={"pricing": self.pricing.pk, "cargos": [{"volume": -1}]},
+            content_type="application/json",
+        )
+        request.user = self.user
+        # when
+        response = views.calculator_quotes(request)
+        # then
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_should_reject_non_finite_numbers_in_quote_request(self):
+        for number in ["Infinity", "NaN", "1e400", '"inf"', '"nan"']:
+            with self.subTest(number=number):
+                for field in ["volume", "collateral"]:
+                    # given
+                    request = self.factory.post(
+                        reverse("freight:calculator_quotes"),
+                        data=(
+                            f'{{"pricing": {self.pricing.pk}, '
+                            f'"cargos": [{{"{field}": {number}}}]}}'
+                        ),
+                        content_type="application/json",
+                    )
+                    request.user = self.user
+                    # when
+                    response = views.calculator_quotes(request)
+                    # then
+                    self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
     def test_calculator_no_access_without_permission(self):
         request = self.factory.get(reverse("freight:calculator"))
         request.user = AuthUtils.create_user("Lex Luthor")
@@ -115,10 +193,204 @@ class TestContractList(TestCase):
         # then
         all_contract_ids = set(Contract.objects.values_list("contract_id", flat=True))
         contract_ids_in_response = {
-            obj["contract_id"] for obj in json_response_to_python(response)["data"]
+            obj["contract_id"]
+            for obj in streaming_json_response_to_python(response)["data"]
         }
         self.assertSetEqual(contract_ids_in_response, all_contract_ids)
 
+    def test_should_stream_contracts(self):
+        # given
+        request = self.factory.get(
+            reverse("freight:contract_list_data", args={constants.CONTRACT_LIST_ALL})
+        )
+        request.user = self.user_1
+        # when
+        response = views.contract_list_data(request, constants.CONTRACT_LIST_ALL)
+        # then
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/json")
+        data = streaming_json_response_to_python(response)["data"]
+        self.assertEqual(len(data), Contract.objects.count())
+
+    def test_should_return_raw_contracts(self):
+        # given
+        request = self.factory.get(
+            reverse("freight:contract_list_data", args={constants.CONTRACT_LIST_ALL}),
+            {"raw": "1"},
+        )
+        request.user = self.user_1
+        # when
+        response = views.contract_list_data(request, constants.CONTRACT_LIST_ALL)
+        # then
+        data = {
+            obj["contract_id"]: obj
+            for obj in streaming_json_response_to_python(response)["data"]
+        }
+        self.assertEqual(len(data), Contract.objects.count())
+        contract = Contract.objects.filter(pricing=self.pricing).first()
+        obj = data[contract.contract_id]
+        self.assertEqual(obj["start_location"], contract.start_location.name)
+        self.assertEqual(obj["start_location_id"], contract.start_location_id)
+        self.assertEqual(obj["end_location"], contract.end_location.name)
+        self.assertEqual(obj["pricing_id"], self.pricing.pk)
+        self.assertEqual(obj["route_name"], self.pricing.name)
+        self.assertListEqual(obj["pricing_issues"], contract.get_issue_list())
+        self.assertNotIn("pricing_check", obj)
+        self.assertNotIn("<span", str(obj))
+
+    def _server_side_request(self, **params):
+        columns = {
+            f"columns[{idx}][data]": name
+            for idx, name in enumerate(
+                ["status", "start_location", "reward", "issuer", "route_name"]
+            )
+        }
+        query = {"draw": "1", **columns, **params}
+        request = self.factory.get(
+            reverse("freight:contract_list_data", args=[constants.CONTRACT_LIST_ALL]),
+            query,
+        )
+        request.user = self.user_1
+        return views.contract_list_data(request, constants.CONTRACT_LIST_ALL)
+
+    def test_should_return_one_page_of_contracts_in_server_side_mode(self):
+        # when
+        response = self._server_side_request(start="2", length="5")
+        # then
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        data = json_response_to_python(response)
+        total = Contract.objects.count()
+        self.assertEqual(data["draw"], 1)
+        self.assertEqual(data["recordsTotal"], total)
+        self.assertEqual(data["recordsFiltered"], total)
+        expected = list(
+            Contract.objects.order_by("-date_issued", "-pk").values_list(
+                "contract_id", flat=True
+            )[2:7]
+        )
+        self.assertListEqual([obj["contract_id"] for obj in data["data"]], expected)
+
+    def test_should_return_raw_contracts_in_server_side_mode(self):
+        # when
+        response = self._server_side_request(raw="1", length="5")
+        # then
+        data = json_response_to_python(response)
+        self.assertEqual(len(data["data"]), 5)
+        for obj in data["data"]:
+            self.assertIsInstance(obj["start_location"], str)
+            self.assertIn("pricing_issues", obj)
+
+    def test_should_order_contracts_in_server_side_mode(self):
+        # when
+        response = self._server_side_request(
+            **{"order[0][column]": "2", "order[0][dir]": "asc", "length": "-1"}
+        )
+        # then
+        data = json_response_to_python(response)
+        rewards = [obj["reward"] for obj in data["data"]]
+        self.assertEqual(len(rewards), Contract.objects.count())
+        self.assertListEqual(rewards, sorted(rewards))
+
+    def test_should_filter_contracts_by_column_in_server_side_mode(self):
+        # when
+        response = self._server_side_request(
+            **{"columns[0][search][value]": "^outstanding$"}
+        )
+        # then
+        data = json_response_to_python(response)
+        expected = set(
+            Contract.objects.filter(status=Contract.Status.OUTSTANDING).values_list(
+                "contract_id", flat=True
+            )
+        )
+        self.assertEqual(data["recordsFiltered"], len(expected))
+        self.assertSetEqual({obj["contract_id"] for obj in data["data"]}, expected)
+
+    def test_should_ignore_invalid_column_filter_in_server_side_mode(self):
+        for name, value in [
+            ("reward", "abc"),
+            ("volume", "1,000"),
+            ("date_issued", "2019-13-45"),
+            ("date_expired", "tomorrow"),
+        ]:
+            with self.subTest(name=name, value=value):
+                # when
+                response = self._server_side_request(
+                    **{"columns[5][data]": name, "columns[5][search][value]": value}
+                )
+                # then
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                data = json_response_to_python(response)
+                self.assertEqual(data["recordsFiltered"], Contract.objects.count())
+
+    def test_should_filter_contracts_by_numeric_column_in_server_side_mode(self):
+        # given
+        contract = Contract.objects.first()
+        # when
+        response = self._server_side_request(
+            **{"columns[2][search][value]": f"^{contract.reward:.0f}$"}
+        )
+        # then
+        data = json_response_to_python(response)
+        expected = set(
+            Contract.objects.filter(reward=contract.reward).values_list(
+                "contract_id", flat=True
+            )
+        )
+        self.assertSetEqual({obj["contract_id"] for obj in data["data"]}, expected)
+
+    def test_should_filter_contracts_by_route_in_server_side_mode(self):
+        # given
+        route_name = self.pricing.name.replace("-", "\\-")
+        # when
+        response = self._server_side_request(
+            **{"columns[4][search][value]": f"^{route_name}$"}
+        )
+        # then
+        data = json_response_to_python(response)
+        expected = set(
+            Contract.objects.filter(pricing=self.pricing).values_list(
+                "contract_id", flat=True
+            )
+        )
+        self.assertTrue(expected)
+        self.assertSetEqual({obj["contract_id"] for obj in data["data"]}, expected)
+
+    def test_should_search_contracts_in_server_side_mode(self):
+        # when
+        response = self._server_side_request(**{"search[value]": "amamake"})
+        # then
+        data = json_response_to_python(response)
+        expected = set(
+            Contract.objects.filter(
+                Q(start_location__name__icontains="amamake")
+                | Q(end_location__name__icontains="amamake")
+            ).values_list("contract_id", flat=True)
+        )
+        self.assertTrue(expected)
+        self.assertSetEqual({obj["contract_id"] for obj in data["data"]}, expected)
+
+    def test_should_return_filter_drop_down_options(self):
+        # given
+        request = self.factory.get(
+            reverse(
+                "freight:contract_list_fdd_data", args=[constants.CONTRACT_LIST_ALL]
+            ),
+            {"columns": "route_name,status,invalid"},
+        )
+        request.user = self.user_1
+        # when
+        response = views.contract_list_fdd_data(request, constants.CONTRACT_LIST_ALL)
+        # then
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        data = json_response_to_python(response)
+        self.assertListEqual(data["route_name"], [self.pricing.name])
+        self.assertListEqual(
+            data["status"],
+            sorted(set(Contract.objects.values_list("status", flat=True))),
+        )
+        self.assertNotIn("invalid", data)
+
     # TODO
     """ issue with setting permission
     def test_active_access_with_permission(self):
@@ -139,7 +411,7 @@ class TestContractList(TestCase):
         response = views.contract_list_data(request, constants.CONTRACT_LIST_ACTIVE)
         # then
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        data = json_response_to_python(response)["data"]
+        data = streaming_json_response_to_python(response)["data"]
         contract_ids = {x["contract_id"] for x in data}
         self.assertSetEqual(
             contract_ids,
@@ -199,7 +471,7 @@ class TestContractList(TestCase):
         )
         request.user = self.user_2
         response = views.contract_list_data(request, constants.CONTRACT_LIST_USER)
-        data = json_response_to_python(response)["data"]
+        data = streaming_json_response_to_python(response)["data"]
         self.assertListEqual(data, [])
 
     def test_data_user_no_access_without_permission_2(self):
@@ -208,7 +480,7 @@ class TestContractList(TestCase):
         )
         request.user = self.user_2
         response = views.contract_list_data(request, constants.CONTRACT_LIST_ACTIVE)
-        data = json_response_to_python(response)["data"]
+        data = streaming_json_response_to_python(response)["data"]
         self.assertListEqual(data, [])
 
     def test_data_user_no_access_without_permission_3(self):
@@ -217,7 +489,7 @@ class TestContractList(TestCase):
         )
         request.user = self.user_2
         response = views.contract_list_data(request, constants.CONTRACT_LIST_ALL)
-        data = json_response_to_python(response)["data"]
+        data = streaming_json_response_to_python(response)["data"]
         self.assertListEqual(data, [])
 
     def test_data_user(self):
@@ -229,7 +501,7 @@ class TestContractList(TestCase):
         response = views.contract_list_data(request, constants.CONTRACT_LIST_USER)
         self.assertEqual(response.status_code, HTTPStatus.OK)
 
-        data = json_response_to_python(response)["data"]
+        data = streaming_json_response_to_python(response)["data"]
         contract_ids = {x["contract_id"] for x in data}
         self.assertSetEqual(
             contract_ids,
@@ -370,6 +642,9 @@ class TestStatistics(NoSocketsTestCase):
         Contract.objects.update_pricing()
         cls.factory = RequestFactory()
 
+    def setUp(self) -> None:
+        cache.clear()
+
     def test_should_open_statistics_page(self):
         # given
         request = self.factory.get(reverse("freight:statistics"))
@@ -473,6 +748,146 @@ class TestStatistics(NoSocketsTestCase):
             ],
         )
 
+    def test_should_not_scan_characters_without_contracts(self):
+        # given
+        for num in range(5):
+            EveCharacter.objects.create(
+                character_id=90100000 + num,
+                character_name=f"Dummy {num}",
+                corporation_id=92000001,
+                corporation_name="Wayne Enterprise",
+                corporation_ticker="WYE",
+            )
+        request = self.factory.get(reverse("freight:statistics_pilots_data"))
+        request.user = self.user
+        views.statistics_pilots_data(request)  # load permissions of user
+        cache.clear()
+        # when
+        with self.assertNumQueries(2):
+            response = views.statistics_pilots_data(request)
+        # then
+        data = json_response_to_python(response)["data"]
+        self.assertListEqual([obj["name"] for obj in data], ["Bruce Wayne"])
+
+    def test_should_load_route_names_with_pricings(self):
+        # given
+        request = self.factory.get(reverse("freight:statistics_routes_data"))
+        request.user = self.user
+        views.statistics_routes_data(request)  # load permissions of user
+        cache.clear()
+        # when
+        with self.assertNumQueries(2):
+            response = views.statistics_routes_data(request)
+        # then
+        data = json_response_to_python(response)["data"]
+        self.assertListEqual([obj["name"] for obj in data], ["Jita <-> Amamake"])
+
+    def test_should_return_statistics_per_period(self):
+        # given
+        request = self.factory.get(
+            reverse("freight:statistics_routes_data"), {"period": "month"}
+        )
+        request.user = self.user
+        # when
+        response = views.statistics_routes_data(request)
+        # then
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        data = json_response_to_python(response)["data"]
+        self.assertTrue(data)
+        for obj in data:
+            self.assertEqual(datetime.date.fromisoformat(obj["period"]).day, 1)
+        self.assertEqual(sum(obj["contracts"] for obj in data), 3)
+
+    def test_should_return_statistics_for_time_frame(self):
+        # given
+        request = self.factory.get(
+            reverse("freight:statistics_customer_data"),
+            {"from": "2000-01-01", "to": "2000-12-31"},
+        )
+        request.user = self.user
+        # when
+        response = views.statistics_customer_data(request)
+        # then
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertListEqual(json_response_to_python(response)["data"], [])
+
+    def test_should_return_error_for_invalid_parameters(self):
+        for params in [{"period": "year"}, {"from": "invalid"}]:
+            with self.subTest(params=params):
+                # given
+                request = self.factory.get(
+                    reverse("freight:statistics_pilots_data"), params
+                )
+                request.user = self.user
+                # when
+                response = views.statistics_pilots_data(request)
+                # then
+                self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_should_return_statistics_from_cache(self):
+        # given
+        request = self.factory.get(reverse("freight:statistics_pilots_data"))
+        request.user = self.user
+        expected = json_response_to_python(views.statistics_pilots_data(request))
+        # when
+        with self.assertNumQueries(0):
+            response = views.statistics_pilots_data(request)
+        # then
+        self.assertDictEqual(json_response_to_python(response), expected)
+
+    def test_should_not_return_outdated_statistics_from_cache(self):
+        # given
+        request = self.factory.get(reverse("freight:statistics_pilots_data"))
+        request.user = self.user
+        views.statistics_pilots_data(request)
+        contract = Contract.objects.filter(status=Contract.Status.FINISHED).first()
+        contract.delete()
+        # when
+        ContractDailyStatistic.objects.update_days([localdate(contract.date_completed)])
+        response = views.statistics_pilots_data(request)
+        # then
+        data = json_response_to_python(response)["data"]
+        self.assertEqual(data[0]["contracts"], 2)
+
+    def _statistics_contracts(self) -> dict:
+        results = dict()
+        for name in [
+            "statistics_routes_data",
+            "statistics_pilots_data",
+            "statistics_pilot_corporations_data",
+            "statistics_customer_data",
+        ]:
+            request = self.factory.get(reverse(f"freight:{name}"))
+            request.user = self.user
+            response = getattr(views, name)(request)
+            data = json_response_to_python(response)["data"]
+            results[name] = sum(obj["contracts"] for obj in data)
+        return results
+
+    def test_should_remove_contracts_deleted_in_admin_from_statistics(self):
+        # given
+        self._statistics_contracts()  # fill cache
+        model_admin = ContractAdmin(model=Contract, admin_site=AdminSite())
+        request = self.factory.get("/")
+        finished_contracts = Contract.objects.filter(status=Contract.Status.FINISHED)
+        # when
+        model_admin.delete_model(request, finished_contracts.first())
+        # then
+        self.assertEqual(set(self._statistics_contracts().values()), {2})
+        # when
+        model_admin.delete_queryset(request, finished_contracts)
+        # then
+        self.assertEqual(set(self._statistics_contracts().values()), {0})
+
+    def test_should_remove_contracts_of_deleted_handler_from_statistics(self):
+        # given
+        self._statistics_contracts()  # fill cache
+        # when
+        ContractHandler.objects.all().delete()
+        # then
+        self.assertEqual(set(self._statistics_contracts().values()), {0})
+        self.assertFalse(ContractDailyStatistic.objects.exists())
+
 
 class TestAddLocation(TestCase):
     @classmethod
@@ -15,6 +15,7 @@ urlpatterns = [
     path("add_location_2", views.add_location_2, name="add_location_2"),
     path("calculator", views.calculator, name="calculator"),
     path("calculator/<int:pricing_pk>", views.calculator, name="calculator"),
+    path("calculator_quotes", views.calculator_quotes, name="calculator_quotes"),
     path("contract_list_all", views.contract_list_all, name="contract_list_all"),
     path("contract_list_user", views.contract_list_user, name="contract_list_user"),
     path(
@@ -22,6 +23,11 @@ urlpatterns = [
         views.contract_list_data,
         name="contract_list_data",
     ),
+    path(
+        "contract_list_fdd_data/<str:category>",
+        views.contract_list_fdd_data,
+        name="contract_list_fdd_data",
+    ),
     path("statistics", views.statistics, name="statistics"),
     path(
         "statistics_routes_data",
@@ -1,15 +1,24 @@
 import datetime
+import json
+import math
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
-from django.db.models import Count, Q, Sum
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, DateField, F, Q, Sum
+from django.db.models.functions import Coalesce, Trunc
 from django.forms import HiddenInput
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils.html import format_html
-from django.utils.timezone import now
+from django.utils.timezone import localdate, now
 from django.utils.translation import gettext_lazy as _
+from django.views.decorators.http import require_POST
 from esi.decorators import token_required
 from esi.models import Token
 
@@ -26,24 +35,58 @@ from .app_settings import (
 )
 from .forms import CalculatorForm
 from .helpers import update_or_create_eve_entity_from_evecharacter
-from .models import Contract, ContractHandler, EveEntity, Freight, Location, Pricing
+from .models import (
+    Contract,
+    ContractDailyStatistic,
+    ContractHandler,
+    EveEntity,
+    Freight,
+    Location,
+    Pricing,
+)
 
 logger = LoggerAddTag(get_extension_logger(__name__), __title__)
 
 ADD_LOCATION_TOKEN_TAG = "freight_add_location_token"
 
+# model fields for ordering and filtering the columns of the contract list
+CONTRACT_LIST_FIELDS = {
+    "status": "status",
+    "start_location": "start_location__name",
+    "end_location": "end_location__name",
+    "reward": "reward",
+    "collateral": "collateral",
+    "volume": "volume",
+    "date_issued": "date_issued",
+    "date_expired": "date_expired",
+    "issuer": "issuer__character_name",
+    "date_accepted": "date_accepted",
+    "acceptor": "acceptor_display_name",
+}
+
+# periods for which statistics can be grouped
+STATISTICS_PERIODS = ["day", "week", "month"]
+
+# model fields for the global search of the contract list
+CONTRACT_LIST_SEARCH_FIELDS = [
+    "start_location__name",
+    "end_location__name",
+    "issuer__character_name",
+    "acceptor_display_name",
+    "title",
+]
+
 
 def add_common_context(request, context: dict) -> dict:
     """adds the common context used by all view"""
-    pending_user_count = (
-        Contract.objects.all().issued_by_user(request.user).pending_count()
-    )
     operation_mode = Freight.operation_mode_friendly(FREIGHT_OPERATION_MODE)
     new_context = {
         **{
             "app_title": FREIGHT_APP_NAME,
-            "pending_all_count": Contract.objects.all().pending_count(),
-            "pending_user_count": pending_user_count,
+            "pending_all_count": Contract.objects.pending_count_cached(),
+            "pending_user_count": Contract.objects.pending_count_cached(
+                user=request.user
+            ),
             "setup_contract_handler_label": f"Setup {operation_mode}",
         },
         **context,
@@ -85,9 +128,14 @@ def contract_list_all(request):
 
 @login_required
 @permission_required("freight.basic_access")
-def contract_list_data(request, category: str) -> JsonResponse:
-    """Return list of outstanding contracts for contract_list AJAX call."""
-    contracts_data = list()
+def contract_list_data(request, category: str):
+    """Return list of outstanding contracts for contract_list AJAX call.
+
+    Returns only one page of contracts in DataTables server-side processing mode,
+    i.e. when the request has a draw parameter.
+    Otherwise all contracts are streamed to keep memory usage low.
+    Rows contain only primitive values and no HTML when the request has a raw parameter.
+    """
     contracts_qs = Contract.objects.select_related(
         "acceptor",
         "acceptor_corporation",
@@ -98,94 +146,325 @@ def contract_list_data(request, category: str) -> JsonResponse:
         "pricing__start_location",
         "pricing__end_location",
     ).contract_list_filter(category=category, user=request.user)
-    for contract in contracts_qs:
-        if contract.has_pricing:
-            route_name = contract.pricing.name
-            if not contract.has_pricing_errors:
-                tooltip_text = route_name
-                icon_html = format_html(
-                    '<span class="{}"><i class="fas fa-check" title="{}"></i></span>',
-                    "text-success",
-                    tooltip_text,
-                )
-            else:
-                tooltip_text = "{}\n{}".format(
-                    route_name, "\n".join(contract.get_issue_list())
-                )
-                icon_html = format_html(
-                    (
-                        '<span class="{}">'
-                        '<i class="fas fa-exclamation-triangle" title="{}"></i>'
-                        "</span>"
-                    ),
-                    "text-danger",
-                    tooltip_text,
-                )
+    if request.GET.get("raw"):
+        make_row = _contract_list_row_raw
+    else:
+        make_row = _contract_list_row
+    if "draw" in request.GET:
+        return _contract_list_data_server_side(request, contracts_qs, make_row)
 
-            pricing_check = icon_html
-        else:
-            route_name = ""
-            pricing_check = "-"
+    return StreamingHttpResponse(
+        _stream_contract_list_rows(contracts_qs, make_row),
+        content_type="application/json",
+    )
 
-        if contract.title or settings.DEBUG:
-            if settings.DEBUG:
-                title = "{}{}".format(
-                    f"{contract.title} " if contract.title else "", contract.contract_id
-                )
-            else:
-                title = contract.title
 
-            notes = format_html('<i class="far fa-envelope" title="{}"></i>', title)
+def _stream_contract_list_rows(
+    contracts_qs, make_row: Callable[[Contract], dict]
+) -> Iterator[str]:
+    """Yield JSON for the contract list row by row."""
+    yield '{"data": ['
+    separator = ""
+    for contract in contracts_qs.iterator(
+        chunk_size=constants.CONTRACT_LIST_STREAM_CHUNK_SIZE
+    ):
+        yield separator + json.dumps(make_row(contract), cls=DjangoJSONEncoder)
+        separator = ","
+    yield "]}"
+
+
+def _contract_list_row(contract: Contract) -> dict:
+    """Return row of the contract list for a contract."""
+    if contract.has_pricing:
+        route_name = contract.pricing.name
+        if not contract.has_pricing_errors:
+            tooltip_text = route_name
+            icon_html = format_html(
+                '<span class="{}"><i class="fas fa-check" title="{}"></i></span>',
+                "text-success",
+                tooltip_text,
+            )
         else:
-            notes = ""
+            tooltip_text = "{}\n{}".format(
+                route_name, "\n".join(contract.get_issue_list())
+            )
+            icon_html = format_html(
+                (
+                    '<span class="{}">'
+                    '<i class="fas fa-exclamation-triangle" title="{}"></i>'
+                    "</span>"
+                ),
+                "text-danger",
+                tooltip_text,
+            )
+
+        pricing_check = icon_html
+    else:
+        route_name = ""
+        pricing_check = "-"
+
+    title = _contract_list_title(contract)
+    if title:
+        notes = format_html('<i class="far fa-envelope" title="{}"></i>', title)
+    else:
+        notes = ""
 
-        start_location_html = format_html(
-            '<span class="dotted-underline" title="{}">{}</span> {}',
-            contract.start_location,
-            contract.start_location.solar_system_name,
-            notes,
+    start_location_html = format_html(
+        '<span class="dotted-underline" title="{}">{}</span> {}',
+        contract.start_location,
+        contract.start_location.solar_system_name,
+        notes,
+    )
+    end_location_html = format_html(
+        '<span class="dotted-underline" title="{}">{}</span>',
+        contract.end_location,
+        contract.end_location.solar_system_name,
+    )
+    try:
+        issuer_character_name = contract.issuer.character_name
+    except AttributeError:
+        issuer_character_name = None
+    return {
+        "contract_id": contract.contract_id,
+        "status": str(contract.status),
+        "start_location": {
+            "display": start_location_html,
+            "sort": contract.start_location.name,
+        },
+        "end_location": {
+            "display": end_location_html,
+            "sort": contract.end_location.name,
+        },
+        "reward": contract.reward,
+        "collateral": contract.collateral,
+        "volume": contract.volume,
+        "date_issued": contract.date_issued.isoformat(),
+        "date_expired": contract.date_expired.isoformat(),
+        "issuer": issuer_character_name,
+        "date_accepted": (
+            contract.date_accepted.isoformat() if contract.date_accepted else None
+        ),
+        "acceptor": contract.acceptor_name,
+        "has_pricing": contract.has_pricing,
+        "has_pricing_errors": contract.has_pricing_errors,
+        "pricing_check": pricing_check,
+        "route_name": route_name,
+        "is_in_progress": contract.is_in_progress,
+        "is_failed": contract.is_failed,
+        "is_completed": contract.is_completed,
+    }
+
+
+def _contract_list_row_raw(contract: Contract) -> dict:
+    """Return row of the contract list for a contract with primitive values only.
+
+    The HTML for this row is rendered by the client.
+    """
+    try:
+        issuer_character_name = contract.issuer.character_name
+    except AttributeError:
+        issuer_character_name = None
+    return {
+        "contract_id": contract.contract_id,
+        "status": str(contract.status),
+        "title": _contract_list_title(contract),
+        "start_location_id": contract.start_location_id,
+        "start_location": contract.start_location.name,
+        "end_location_id": contract.end_location_id,
+        "end_location": contract.end_location.name,
+        "reward": contract.reward,
+        "collateral": contract.collateral,
+        "volume": contract.volume,
+        "date_issued": contract.date_issued.isoformat(),
+        "date_expired": contract.date_expired.isoformat(),
+        "issuer": issuer_character_name,
+        "date_accepted": (
+            contract.date_accepted.isoformat() if contract.date_accepted else None
+        ),
+        "acceptor": contract.acceptor_name,
+        "pricing_id": contract.pricing_id,
+        "pricing_issues": contract.get_issue_list(),
+        "has_pricing": contract.has_pricing,
+        "has_pricing_errors": contract.has_pricing_errors,
+        "route_name": contract.pricing.name if contract.pricing_id else "",
+        "is_in_progress": contract.is_in_progress,
+        "is_failed": contract.is_failed,
+        "is_completed": contract.is_completed,
+    }
+
+
+def _contract_list_title(contract: Contract) -> str:
+    """Return title of a contract as shown in the contract list."""
+    if settings.DEBUG:
+        return "{}{}".format(
+            f"{contract.title} " if contract.title else "", contract.contract_id
         )
-        end_location_html = format_html(
-            '<span class="dotted-underline" title="{}">{}</span>',
-            contract.end_location,
-            contract.end_location.solar_system_name,
+    return contract.title or ""
+
+
+def _contract_list_data_server_side(
+    request, contracts_qs, make_row: Callable[[Contract], dict]
+) -> JsonResponse:
+    """Return one page of contracts for a DataTables server-side request."""
+    params = request.GET
+    try:
+        draw = int(params["draw"])
+        start = max(int(params.get("start", 0)), 0)
+        length = int(params.get("length", constants.CONTRACT_LIST_MAX_PAGE_LENGTH))
+        order_column = int(params.get("order[0][column]", -1))
+    except ValueError:
+        return JsonResponse({"error": "Invalid parameters"}, status=400)
+
+    if length < 0 or length > constants.CONTRACT_LIST_MAX_PAGE_LENGTH:
+        length = constants.CONTRACT_LIST_MAX_PAGE_LENGTH
+
+    columns = _datatables_columns(params)
+    records_total = contracts_qs.count()
+    contracts_qs = _annotate_contract_list(contracts_qs)
+    search_value = params.get("search[value]", "").strip()
+    if search_value:
+        query = Q()
+        for field in CONTRACT_LIST_SEARCH_FIELDS:
+            query |= Q(**{f"{field}__icontains": search_value})
+        contracts_qs = contracts_qs.filter(query)
+
+    for name, value in columns.values():
+        if value:
+            contracts_qs = _filter_contract_list_column(contracts_qs, name, value)
+
+    records_filtered = contracts_qs.count()
+    try:
+        order_field = CONTRACT_LIST_FIELDS[columns[order_column][0]]
+    except KeyError:
+        contracts_qs = contracts_qs.order_by("-date_issued", "-pk")
+    else:
+        if params.get("order[0][dir]") == "desc":
+            contracts_qs = contracts_qs.order_by(
+                F(order_field).desc(nulls_last=True), "-pk"
+            )
+        else:
+            contracts_qs = contracts_qs.order_by(
+                F(order_field).asc(nulls_first=True), "pk"
+            )
+
+    contracts_data = [
+        make_row(contract) for contract in contracts_qs[start : start + length]
+    ]
+    return JsonResponse(
+        {
+            "draw": draw,
+            "recordsTotal": records_total,
+            "recordsFiltered": records_filtered,
+            "data": contracts_data,
+        }
+    )
+
+
+@login_required
+@permission_required("freight.basic_access")
+def contract_list_fdd_data(request, category: str) -> JsonResponse:
+    """Return options of the filter drop downs of the contract list,
+    when it is in server-side mode.
+    """
+    contracts_qs = _annotate_contract_list(
+        Contract.objects.contract_list_filter(category=category, user=request.user)
+    )
+    columns = request.GET.get("columns", "").split(",")
+    result = {}
+    for column in columns:
+        if column == "route_name":
+            options = {
+                pricing.name for pricing in _contract_list_pricings(contracts_qs)
+            }
+        elif column in CONTRACT_LIST_FIELDS:
+            field = CONTRACT_LIST_FIELDS[column]
+            options = set(
+                contracts_qs.exclude(**{f"{field}__isnull": True})
+                .order_by()
+                .values_list(field, flat=True)
+                .distinct()
+            )
+        else:
+            continue
+        result[column] = sorted(options)
+    return JsonResponse(result)
+
+
+def _annotate_contract_list(contracts_qs):
+    """Add annotations needed for filtering and ordering the contract list."""
+    return contracts_qs.annotate(
+        acceptor_display_name=Coalesce(
+            "acceptor__character_name", "acceptor_corporation__corporation_name"
         )
+    )
+
+
+def _datatables_columns(params) -> Dict[int, Tuple[str, str]]:
+    """Return data name and search value for each column of a DataTables request."""
+    columns = {}
+    for key, value in params.items():
+        match = re.fullmatch(r"columns\[(\d+)\]\[data\]", key)
+        if match:
+            idx = int(match.group(1))
+            search_value = params.get(f"columns[{idx}][search][value]", "")
+            columns[idx] = (value, _unescape_exact_match(search_value))
+    return columns
+
+
+def _unescape_exact_match(value: str) -> str:
+    """Return plain value from an exact match regex as sent by the filter drop downs,
+    e.g. "^Jita \\- Amamake$" becomes "Jita - Amamake".
+    """
+    if len(value) >= 2 and value.startswith("^") and value.endswith("$"):
+        value = value[1:-1]
+    return re.sub(r"\\(.)", r"\1", value)
+
+
+def _filter_contract_list_column(contracts_qs, name: str, value: str):
+    """Return contracts filtered by the value of a column of the contract list."""
+    if name == "route_name":
+        pricing_pks = [
+            pricing.pk
+            for pricing in _contract_list_pricings(contracts_qs)
+            if pricing.name == value
+        ]
+        return contracts_qs.filter(pricing__in=pricing_pks)
+
+    try:
+        field = CONTRACT_LIST_FIELDS[name]
+    except KeyError:
+        return contracts_qs
+    try:
+        value = _contract_list_field_value(field, value)
+    except ValidationError:
+        logger.debug("Ignoring invalid filter value for %s: %s", name, value)
+        return contracts_qs
+    return contracts_qs.filter(**{field: value})
+
+
+def _contract_list_field_value(field: str, value: str) -> Any:
+    """Return value converted to the type of given contract field.
+
+    Raises ValidationError for values which do not fit the field.
+    """
+    model = Contract
+    model_field = None
+    for part in field.split("__"):
         try:
-            issuer_character_name = contract.issuer.character_name
-        except AttributeError:
-            issuer_character_name = None
-        contracts_data.append(
-            {
-                "contract_id": contract.contract_id,
-                "status": str(contract.status),
-                "start_location": {
-                    "display": start_location_html,
-                    "sort": contract.start_location.name,
-                },
-                "end_location": {
-                    "display": end_location_html,
-                    "sort": contract.end_location.name,
-                },
-                "reward": contract.reward,
-                "collateral": contract.collateral,
-                "volume": contract.volume,
-                "date_issued": contract.date_issued.isoformat(),
-                "date_expired": contract.date_expired.isoformat(),
-                "issuer": issuer_character_name,
-                "date_accepted": contract.date_accepted.isoformat()
-                if contract.date_accepted
-                else None,
-                "acceptor": contract.acceptor_name,
-                "has_pricing": contract.has_pricing,
-                "has_pricing_errors": contract.has_pricing_errors,
-                "pricing_check": pricing_check,
-                "route_name": route_name,
-                "is_in_progress": contract.is_in_progress,
-                "is_failed": contract.is_failed,
-                "is_completed": contract.is_completed,
-            }
+            model_field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return value  # annotations contain text only
+        model = model_field.related_model
+    return model_field.to_python(value)
+
+
+def _contract_list_pricings(contracts_qs) -> List[Pricing]:
+    """Return pricings used by given contracts."""
+    return list(
+        Pricing.objects.select_related("start_location", "end_location").filter(
+            pk__in=contracts_qs.order_by().values("pricing_id")
         )
-    return JsonResponse({"data": contracts_data})
+    )
 
 
 @login_required
@@ -225,7 +504,7 @@ def calculator(request, pricing_pk=None):
         volume = None
         expires_on = None
 
-    handler = ContractHandler.objects.select_related("organization").first()
+    handler = ContractHandler.objects.get_cached()
     if handler:
         organization_name = handler.organization.name
         availability = handler.get_availability_text_for_contracts()
@@ -251,6 +530,61 @@ def calculator(request, pricing_pk=None):
     )
 
 
+@login_required
+@permission_required("freight.use_calculator")
+@require_POST
+def calculator_quotes(request) -> JsonResponse:
+    """returns quotes for many cargos on the same route
+
+    Expects a JSON object with the pricing of the route and a list of cargos, e.g.
+    ``{"pricing": 1, "cargos": [{"volume": 10000, "collateral": 500000000}]}``
+    """
+    try:
+        data = json.loads(request.body)
+        pricing = Pricing.objects.get(pk=int(data["pricing"]), is_active=True)
+        cargos = data["cargos"]
+        if len(cargos) > constants.CALCULATOR_MAX_QUOTES:
+            raise ValueError("too many cargos")
+        volumes = [_finite_float_or_none(cargo.get("volume")) for cargo in cargos]
+        collaterals = [
+            _finite_float_or_none(cargo.get("collateral")) for cargo in cargos
+        ]
+        prices, issues_list = pricing.get_contract_price_checks(volumes, collaterals)
+        if not all(math.isfinite(price) for price in prices):
+            raise ValueError("price is out of range")
+    except (
+        AttributeError,
+        KeyError,
+        TypeError,
+        ValueError,
+        Pricing.DoesNotExist,
+    ) as ex:
+        return JsonResponse({"error": f"Invalid request: {ex}"}, status=400)
+
+    quotes = [
+        {
+            "volume": volume,
+            "collateral": collateral,
+            "price": math.ceil(price / 1000000) * 1000000,
+            "issues": pricing.issue_messages(issues, price),
+        }
+        for volume, collateral, price, issues in zip(
+            volumes, collaterals, prices, issues_list
+        )
+    ]
+    return JsonResponse({"pricing": pricing.pk, "quotes": quotes})
+
+
+def _finite_float_or_none(value) -> Optional[float]:
+    """converts given value to float and rejects infinite and NaN values"""
+    if value is None:
+        return None
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"{value} is not a finite number")
+    return number
+
+
 @login_required
 @permission_required("freight.setup_contract_handler")
 @token_required(scopes=ContractHandler.get_esi_scopes())
@@ -405,159 +739,187 @@ def statistics(request):
 @permission_required("freight.view_statistics")
 def statistics_routes_data(request):
     """returns totals for statistics as JSON"""
-    cutoff_date = now() - datetime.timedelta(days=FREIGHT_STATISTICS_MAX_DAYS)
-    finished_contracts = Q(contracts__status=Contract.Status.FINISHED) & Q(
-        contracts__date_completed__gte=cutoff_date
-    )
-    route_totals = (
-        Pricing.objects.annotate(
-            contracts_count=Count("contracts", filter=finished_contracts)
-        )
-        .select_related("start_location", "end_location")
-        .annotate(rewards=Sum("contracts__reward", filter=finished_contracts))
-        .annotate(collaterals=Sum("contracts__collateral", filter=finished_contracts))
-        .annotate(volume=Sum("contracts__volume", filter=finished_contracts))
-        .annotate(
-            pilots=Count(
-                "contracts__acceptor", distinct=True, filter=finished_contracts
-            )
-        )
-        .annotate(
-            customers=Count(
-                "contracts__issuer", distinct=True, filter=finished_contracts
-            )
-        )
-    )
-    totals = [
-        {
-            "name": route.name,
-            "contracts": route.contracts_count,
-            "rewards": route.rewards,
-            "collaterals": route.collaterals,
-            "volume": route.volume,
-            "pilots": route.pilots,
-            "customers": route.customers,
-        }
-        for route in route_totals
-        if route.contracts_count > 0
-    ]
-    return JsonResponse({"data": totals})
+    return _statistics_data(request, "routes", _route_totals)
 
 
 @login_required
 @permission_required("freight.view_statistics")
 def statistics_pilots_data(request):
     """returns totals for statistics as JSON"""
-    cutoff_date = now() - datetime.timedelta(days=FREIGHT_STATISTICS_MAX_DAYS)
-    finished_contracts = Q(contracts_acceptor__status=Contract.Status.FINISHED) & Q(
-        contracts_acceptor__date_completed__gte=cutoff_date
-    )
-    pilot_totals = (
-        EveCharacter.objects.exclude(contracts_acceptor__isnull=True)
-        .annotate(
-            contracts_count=Count("contracts_acceptor", filter=finished_contracts)
-        )
-        .annotate(rewards=Sum("contracts_acceptor__reward", filter=finished_contracts))
-        .annotate(
-            collaterals=Sum("contracts_acceptor__collateral", filter=finished_contracts)
-        )
-        .annotate(volume=Sum("contracts_acceptor__volume", filter=finished_contracts))
-    )
-    totals = [
-        {
-            "name": pilot.character_name,
-            "corporation": pilot.corporation_name,
-            "contracts": pilot.contracts_count,
-            "rewards": pilot.rewards,
-            "collaterals": pilot.collaterals,
-            "volume": pilot.volume,
-        }
-        for pilot in pilot_totals
-        if pilot.contracts_count > 0
-    ]
-    return JsonResponse({"data": totals})
+    return _statistics_data(request, "pilots", _pilot_totals)
 
 
 @login_required
 @permission_required("freight.view_statistics")
 def statistics_pilot_corporations_data(request):
     """returns totals for statistics as JSON"""
-    cutoff_date = now() - datetime.timedelta(days=FREIGHT_STATISTICS_MAX_DAYS)
-    finished_contracts = Q(
-        contracts_acceptor_corporation__status=Contract.Status.FINISHED
-    ) & Q(contracts_acceptor_corporation__date_completed__gte=cutoff_date)
-
-    corporation_totals = (
-        EveCorporationInfo.objects.exclude(contracts_acceptor_corporation__isnull=True)
-        .select_related("alliance")
-        .annotate(
-            contracts_count=Count(
-                "contracts_acceptor_corporation", filter=finished_contracts
-            )
-        )
-        .annotate(
-            rewards=Sum(
-                "contracts_acceptor_corporation__reward", filter=finished_contracts
-            )
-        )
-        .annotate(
-            collaterals=Sum(
-                "contracts_acceptor_corporation__collateral", filter=finished_contracts
-            )
-        )
-        .annotate(
-            volume=Sum(
-                "contracts_acceptor_corporation__volume", filter=finished_contracts
-            )
-        )
-    )
-    totals = list()
-    for corporation in corporation_totals:
-        if corporation.contracts_count > 0:
-            alliance = (
-                corporation.alliance.alliance_name if corporation.alliance else ""
-            )
-            totals.append(
-                {
-                    "name": corporation.corporation_name,
-                    "alliance": alliance,
-                    "contracts": corporation.contracts_count,
-                    "rewards": corporation.rewards,
-                    "collaterals": corporation.collaterals,
-                    "volume": corporation.volume,
-                }
-            )
-    return JsonResponse({"data": totals})
+    return _statistics_data(request, "pilot_corporations", _pilot_corporation_totals)
 
 
 @login_required
 @permission_required("freight.view_statistics")
 def statistics_customer_data(request):
     """returns totals for statistics as JSON"""
-    cutoff_date = now() - datetime.timedelta(days=FREIGHT_STATISTICS_MAX_DAYS)
-    finished_contracts = Q(contracts_issuer__status=Contract.Status.FINISHED) & Q(
-        contracts_issuer__date_completed__gte=cutoff_date
-    )
-    customer_totals = (
-        EveCharacter.objects.exclude(contracts_issuer__isnull=True)
-        .annotate(contracts_count=Count("contracts_issuer", filter=finished_contracts))
-        .annotate(rewards=Sum("contracts_issuer__reward", filter=finished_contracts))
-        .annotate(
-            collaterals=Sum("contracts_issuer__collateral", filter=finished_contracts)
+    return _statistics_data(request, "customers", _customer_totals)
+
+
+def _statistics_data(
+    request, name: str, calc_totals: Callable[[Any, List[str]], List[dict]]
+) -> JsonResponse:
+    """returns statistics as JSON, which are served from cache if possible
+
+    Supports these optional query parameters:
+    - from: first day as ISO date, defaults to FREIGHT_STATISTICS_MAX_DAYS ago
+    - to: last day as ISO date, defaults to today
+    - period: one of "day", "week", "month" to get totals for each period
+    """
+    try:
+        date_to = _parse_statistics_date(request.GET.get("to"), localdate())
+        date_from = _parse_statistics_date(
+            request.GET.get("from"),
+            localdate(now() - datetime.timedelta(days=FREIGHT_STATISTICS_MAX_DAYS)),
         )
-        .annotate(volume=Sum("contracts_issuer__volume", filter=finished_contracts))
+        period = request.GET.get("period") or None
+        if period and period not in STATISTICS_PERIODS:
+            raise ValueError(f"period must be one of: {', '.join(STATISTICS_PERIODS)}")
+    except ValueError as ex:
+        return JsonResponse({"error": f"Invalid request: {ex}"}, status=400)
+
+    cache_key = ContractDailyStatistic.objects.cache_key(
+        name, date_from, date_to, period
     )
-    totals = list()
-    for customer in customer_totals:
-        if customer.contracts_count > 0:
-            totals.append(
-                {
-                    "name": customer.character_name,
-                    "corporation": customer.corporation_name,
-                    "contracts": customer.contracts_count,
-                    "rewards": customer.rewards,
-                    "collaterals": customer.collaterals,
-                    "volume": customer.volume,
-                }
+    totals = cache.get(cache_key)
+    if totals is None:
+        statistics_qs = ContractDailyStatistic.objects.filter(
+            day__gte=date_from, day__lte=date_to
+        )
+        if period:
+            statistics_qs = statistics_qs.annotate(
+                period=Trunc("day", period, output_field=DateField())
             )
+            totals = calc_totals(statistics_qs, ["period"])
+            for row in totals:
+                row["period"] = row["period"].isoformat()
+        else:
+            totals = calc_totals(statistics_qs, [])
+        cache.set(
+            cache_key, totals, timeout=ContractDailyStatistic.objects.CACHE_TIMEOUT
+        )
     return JsonResponse({"data": totals})
+
+
+def _parse_statistics_date(value: str, default: datetime.date) -> datetime.date:
+    """returns date from ISO string or given default if value is empty"""
+    if not value:
+        return default
+    return datetime.date.fromisoformat(value)
+
+
+def _route_totals(statistics_qs, group_by: List[str]) -> List[dict]:
+    """returns totals per route"""
+    route_totals = _sum_contract_statistics(
+        statistics_qs.filter(pricing_id__isnull=False)
+        .values(*group_by, "pricing_id")
+        .order_by(*group_by, "pricing_id")
+    ).annotate(
+        pilots=Count("acceptor", distinct=True),
+        customers=Count("issuer", distinct=True),
+    )
+    pricings = Pricing.objects.select_related("start_location", "end_location").in_bulk(
+        [row["pricing_id"] for row in route_totals]
+    )
+    return [
+        {
+            **{field: row[field] for field in group_by},
+            "name": pricings[row["pricing_id"]].name,
+            "contracts": row["contracts_count"],
+            "rewards": row["rewards_total"],
+            "collaterals": row["collaterals_total"],
+            "volume": row["volume_total"],
+            "pilots": row["pilots"],
+            "customers": row["customers"],
+        }
+        for row in route_totals
+    ]
+
+
+def _pilot_totals(statistics_qs, group_by: List[str]) -> List[dict]:
+    """returns totals per pilot"""
+    pilot_totals = _sum_contract_statistics(
+        statistics_qs.filter(acceptor__isnull=False)
+        .values(*group_by, "acceptor_id")
+        .order_by(*group_by, "acceptor_id")
+    )
+    pilots = EveCharacter.objects.in_bulk([row["acceptor_id"] for row in pilot_totals])
+    return [
+        {
+            **{field: row[field] for field in group_by},
+            "name": pilots[row["acceptor_id"]].character_name,
+            "corporation": pilots[row["acceptor_id"]].corporation_name,
+            "contracts": row["contracts_count"],
+            "rewards": row["rewards_total"],
+            "collaterals": row["collaterals_total"],
+            "volume": row["volume_total"],
+        }
+        for row in pilot_totals
+    ]
+
+
+def _pilot_corporation_totals(statistics_qs, group_by: List[str]) -> List[dict]:
+    """returns totals per pilot corporation"""
+    corporation_totals = _sum_contract_statistics(
+        statistics_qs.filter(acceptor_corporation__isnull=False)
+        .values(*group_by, "acceptor_corporation_id")
+        .order_by(*group_by, "acceptor_corporation_id")
+    )
+    corporations = EveCorporationInfo.objects.select_related("alliance").in_bulk(
+        [row["acceptor_corporation_id"] for row in corporation_totals]
+    )
+    totals = list()
+    for row in corporation_totals:
+        corporation = corporations[row["acceptor_corporation_id"]]
+        alliance = corporation.alliance.alliance_name if corporation.alliance else ""
+        totals.append(
+            {
+                **{field: row[field] for field in group_by},
+                "name": corporation.corporation_name,
+                "alliance": alliance,
+                "contracts": row["contracts_count"],
+                "rewards": row["rewards_total"],
+                "collaterals": row["collaterals_total"],
+                "volume": row["volume_total"],
+            }
+        )
+    return totals
+
+
+def _customer_totals(statistics_qs, group_by: List[str]) -> List[dict]:
+    """returns totals per customer"""
+    customer_totals = _sum_contract_statistics(
+        statistics_qs.values(*group_by, "issuer_id").order_by(*group_by, "issuer_id")
+    )
+    customers = EveCharacter.objects.in_bulk(
+        [row["issuer_id"] for row in customer_totals]
+    )
+    return [
+        {
+            **{field: row[field] for field in group_by},
+            "name": customers[row["issuer_id"]].character_name,
+            "corporation": customers[row["issuer_id"]].corporation_name,
+            "contracts": row["contracts_count"],
+            "rewards": row["rewards_total"],
+            "collaterals": row["collaterals_total"],
+            "volume": row["volume_total"],
+        }
+        for row in customer_totals
+    ]
+
+
+def _sum_contract_statistics(statistics_qs):
+    """returns totals of grouped daily contract statistics"""
+    return statistics_qs.annotate(
+        contracts_count=Sum("contracts"),
+        rewards_total=Sum("rewards"),
+        collaterals_total=Sum("collaterals"),
+        volume_total=Sum("volume"),
+    )